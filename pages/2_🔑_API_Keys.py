@@ -1,11 +1,19 @@
 import streamlit as st
 import pandas as pd
 from datetime import datetime
-from utils.api_monitors import get_cached_balances, calculate_api_stats, ping_all_apis
+from utils.api_monitors import (
+    get_cached_balances, invalidate_cached_balances, calculate_api_stats, iter_ping_results, format_rate_limits
+)
 import sys
 import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from auth import check_password
+from utils.collector import BALANCES_SNAPSHOT
+from utils.snapshot_store import get_snapshot_store, SNAPSHOT_MAX_AGE
+from utils.balance_history import get_balance_history, total_burn, BALANCE_BURN_WINDOW_HOURS
+from utils.probe_budget import get_probe_budget
+from utils.rate_limits import get_rate_limits
+from utils.latency import latency_summary, LATENCY_WINDOWS
 
 st.set_page_config(page_title="API Keys Monitor", page_icon="🔑", layout="wide")
 
@@ -33,6 +41,136 @@ def recreate_ping_display(ping_status: str, ping_time: float) -> str:
     else:
         return "🔴 Failed"
 
+def format_runway(hours) -> str:
+    """Human readable time-to-empty"""
+    if hours is None:
+        return "∞"
+    if hours < 48:
+        return f"{hours:.1f} h"
+    return f"{hours / 24:.1f} days"
+
+def render_spend_forecast(history):
+    """Burn rate, runway and balance history from the recorded checks"""
+    rates = history.burn_rates()
+    if not rates:
+        st.info(f"No balance checks recorded in the last {BALANCE_BURN_WINDOW_HOURS:g}h - history builds up with every balance check")
+        return
+    
+    total = total_burn(rates)
+    rate_per_day = total["rate_per_hour"] * 24 if total["rate_per_hour"] is not None else None
+    
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        st.metric(
+            label="Burn Rate",
+            value=f"${rate_per_day:.2f}/day" if rate_per_day is not None else "-",
+            help=f"Spend over the last {BALANCE_BURN_WINDOW_HOURS:g}h (top-ups excluded)"
+        )
+    with col2:
+        st.metric(
+            label="Runway",
+            value=format_runway(total["runway_hours"]),
+            help="Time until all DeepSeek balances are empty at the current burn rate"
+        )
+    with col3:
+        st.metric(
+            label="Monthly Forecast",
+            value=f"${rate_per_day * 30:.2f}" if rate_per_day is not None else "-",
+            help="Projected spend over 30 days at the current burn rate"
+        )
+    
+    df_rates = pd.DataFrame([
+        {
+            "Service": key,
+            "Balance": f"${rate['balance']:.2f}",
+            f"Spent ({BALANCE_BURN_WINDOW_HOURS:g}h)": f"${rate['spend']:.2f}",
+            "Burn Rate": f"${rate['rate_per_hour'] * 24:.2f}/day" if rate["rate_per_hour"] is not None else "-",
+            "Runway": format_runway(rate["runway_hours"]),
+            "Last Check": datetime.fromtimestamp(rate["last_ts"]).strftime("%Y-%m-%d %H:%M")
+        }
+        for key, rate in rates.items()
+    ])
+    st.dataframe(df_rates, use_container_width=True, hide_index=True)
+    
+    hourly = history.hourly(since_hours=24 * 30)
+    if hourly:
+        df_hourly = pd.DataFrame(hourly)
+        df_hourly["hour"] = pd.to_datetime(df_hourly["hour"], unit="s")
+        st.line_chart(df_hourly.pivot(index="hour", columns="key", values="balance"))
+
+def render_latency_stats():
+    """Ping latency percentiles and error rate over a sliding window"""
+    col1, col2, col3 = st.columns(3)
+    with col1:
+        window = st.radio("Window", list(LATENCY_WINDOWS), index=1, horizontal=True, key="latency_window")
+    with col2:
+        metrics = {"Total": "total", "Time to first token": "ttft", "Connect": "connect"}
+        metric = st.radio("Metric", list(metrics), horizontal=True, key="latency_metric")
+    with col3:
+        # Auth checks and completions are tracked apart so percentiles never mix the two
+        tiers = {"Completion": "completion", "Auth check": "auth"}
+        tier = st.radio("Probe", list(tiers), horizontal=True, key="latency_tier")
+    rows = latency_summary(LATENCY_WINDOWS[window], metrics[metric], tiers[tier])
+    if not rows:
+        st.info(f"No {tier.lower()} pings in this window - run 🏓 Test Ping to collect latency samples")
+        return
+    
+    def ms(value):
+        return f"{value / 1000:.2f}s" if value is not None else "-"
+    
+    df_latency = pd.DataFrame([
+        {
+            "Service": row["service"],
+            "Type": row["provider"],
+            "Probe": tier,
+            "Pings": row["samples"] + row["errors"],
+            "Error Rate": f"{row['error_rate']:.0%}",
+            "p50": ms(row["p50_ms"]),
+            "p95": ms(row["p95_ms"]),
+            "p99": ms(row["p99_ms"])
+        }
+        for row in rows
+    ])
+    st.dataframe(df_latency, use_container_width=True, hide_index=True)
+
+def render_ping_result(result):
+    """One row of the ping test results"""
+    col1, col2, col3, col4 = st.columns([3, 2, 2, 3])
+    
+    with col1:
+        st.write(f"**{result['service']}**")
+    
+    with col2:
+        ping_status = result.get('ping_status', 'unknown')
+        if ping_status == 'success':
+            st.success("✅ Success")
+        elif ping_status == 'timeout':
+            st.error("🔴 Timeout")
+        elif ping_status == 'quota_exceeded':
+            st.warning("🟡 Quota exceeded")
+        else:
+            st.error(f"❌ {ping_status}")
+    
+    with col3:
+        ping_time = result.get('ping_time', 0)
+        if ping_time > 0:
+            st.metric("Response time", f"{ping_time}s")
+            if result.get('ping_ttft') is not None:
+                st.caption(f"TTFT {result['ping_ttft']}s · connect {result['ping_connect_time']}s")
+            elif result.get('ping_probe') == "auth":
+                st.caption("Auth check · no tokens spent")
+        else:
+            st.write("-")
+    
+    with col4:
+        ping_response = result.get('ping_response', '')
+        if ping_response:
+            st.code(ping_response[:50] + "..." if len(ping_response) > 50 else ping_response)
+        elif result.get('ping_error'):
+            st.error(result['ping_error'][:50] + "..." if len(result['ping_error']) > 50 else result['ping_error'])
+        else:
+            st.write("-")
+
 # Header with navigation
 col1, col2, col3 = st.columns([1, 4, 1])
 
@@ -58,6 +196,7 @@ col1, col2, col3, col4 = st.columns([3, 1, 1, 1])
 with col2:
     if st.button("🔄 Refresh All", use_container_width=True):
         st.cache_data.clear()
+        invalidate_cached_balances()
         # Clear ping results on full refresh
         if 'ping_results' in st.session_state:
             del st.session_state['ping_results']
@@ -79,10 +218,17 @@ with col4:
 # Handle ping test separately
 if test_ping:
     st.markdown("## 🏓 Ping Test Results")
+    summary_placeholder = st.empty()
     
     with st.spinner(f"🚀 Testing APIs in parallel..."):
         start_time = datetime.now()
-        ping_results = ping_all_apis()
+        ping_results = []
+        
+        # Rows appear as each key answers - fastest first
+        for result in iter_ping_results():
+            ping_results.append(result)
+            render_ping_result(result)
+        
         end_time = datetime.now()
         total_time = (end_time - start_time).total_seconds()
         
@@ -93,49 +239,26 @@ if test_ping:
         # Count actual tests performed
         actual_count = len([r for r in ping_results if r.get('ping_status') != 'not_configured'])
         
-        st.success(f"✅ All {actual_count} ping tests completed in {total_time:.2f} seconds (parallel execution)")
-        
-        # Display ping results in a nice format
-        for result in ping_results:
-            col1, col2, col3, col4 = st.columns([3, 2, 2, 3])
-            
-            with col1:
-                st.write(f"**{result['service']}**")
-            
-            with col2:
-                ping_status = result.get('ping_status', 'unknown')
-                if ping_status == 'success':
-                    st.success("✅ Success")
-                elif ping_status == 'timeout':
-                    st.error("🔴 Timeout")
-                elif ping_status == 'quota_exceeded':
-                    st.warning("🟡 Quota exceeded")
-                else:
-                    st.error(f"❌ {ping_status}")
-            
-            with col3:
-                ping_time = result.get('ping_time', 0)
-                if ping_time > 0:
-                    st.metric("Response time", f"{ping_time}s")
-                else:
-                    st.write("-")
-            
-            with col4:
-                ping_response = result.get('ping_response', '')
-                if ping_response:
-                    st.code(ping_response[:50] + "..." if len(ping_response) > 50 else ping_response)
-                elif result.get('ping_error'):
-                    st.error(result['ping_error'][:50] + "..." if len(result['ping_error']) > 50 else result['ping_error'])
-                else:
-                    st.write("-")
+        summary_placeholder.success(f"✅ All {actual_count} ping tests completed in {total_time:.2f} seconds (parallel execution)")
+        budget = get_probe_budget().snapshot()
+        if budget["limit"] and budget["used"]:
+            st.caption(f"Ping tokens today: {budget['used']:,} / {budget['limit']:,}")
         
         st.divider()
 
 # Show loading state
 with st.spinner("Checking API balances..."):
     try:
-        # Get API balance data
-        api_results = get_cached_balances()
+        # Get API balance data (from the collector's snapshot when configured)
+        snapshot_store = get_snapshot_store()
+        snapshot = snapshot_store.latest(BALANCES_SNAPSHOT) if snapshot_store else None
+        if snapshot:
+            api_results = snapshot["payload"]
+            st.caption(f"Balances collected at {snapshot['collected_at'].strftime('%Y-%m-%d %H:%M:%S')} by the background collector")
+            if snapshot["age"] > SNAPSHOT_MAX_AGE:
+                st.warning(f"⚠️ Snapshot is {snapshot['age'] / 60:.0f} min old - is the collector running?")
+        else:
+            api_results = get_cached_balances()
         
         # Merge with stored ping results if available
         if 'ping_results' in st.session_state:
@@ -168,6 +291,11 @@ with st.spinner("Checking API balances..."):
                             ping_result.get('ping_status', 'not_tested'),
                             ping_result.get('ping_time', 0)
                         )
+                        # Pings carry fresher rate-limit headers than the cached balance check
+                        rate_limits = get_rate_limits(service_name)
+                        if rate_limits:
+                            api_result['_rate_limits'] = rate_limits
+                            api_result.update(format_rate_limits(rate_limits))
         
         # Calculate statistics
         stats = calculate_api_stats(api_results)
@@ -230,10 +358,24 @@ with st.spinner("Checking API balances..."):
                 "Granted": st.column_config.TextColumn("Granted", width="small"),
                 "Topped Up": st.column_config.TextColumn("Topped Up", width="small"),
                 "Ping Test": st.column_config.TextColumn("Ping Test", width="small"),
+                "Requests Left": st.column_config.TextColumn("Requests Left", width="small", help="Remaining requests in the provider's rate-limit window"),
+                "Tokens Left": st.column_config.TextColumn("Tokens Left", width="small", help="Remaining tokens in the provider's rate-limit window"),
+                "Limit Resets": st.column_config.TextColumn("Limit Resets", width="small", help="Time until the rate-limit window (or a 429 back-off) resets"),
+                "Health": st.column_config.TextColumn("Health", width="small", help="Circuit breaker - failing keys are paused with backoff"),
                 "Error": st.column_config.TextColumn("Error", width="medium")
             }
         )
         
+        # Spend forecast from the recorded balance history
+        balance_history = get_balance_history()
+        if balance_history:
+            st.markdown("## 📉 Spend Forecast")
+            render_spend_forecast(balance_history)
+        
+        # Latency distribution of all ping tests run in this process
+        with st.expander("📊 Ping Latency", expanded=False):
+            render_latency_stats()
+        
         # Gemini details only (simplified)
         gemini_results = [r for r in api_results if r.get("_api_type") == "gemini"]
         if gemini_results and gemini_results[0].get("Status") != "not_configured":
@@ -1,12 +1,18 @@
 import streamlit as st
-import psycopg2
 import os
 from dotenv import load_dotenv
 from typing import List, Tuple, Optional, Dict
 from datetime import datetime
 import sys
+import pandas as pd
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from auth import check_password
+from utils.processing_stats import (
+    PLATFORMS, fetch_all_platforms, platform_data_from_snapshot, refresh_platform, PROCESSING_CACHE_TTL
+)
+from utils.collector import PROCESSING_SNAPSHOT
+from utils.snapshot_store import get_snapshot_store, SNAPSHOT_MAX_AGE
+from utils.query_metrics import get_query_records, summarize_query_records
 
 # Load environment variables
 load_dotenv()
@@ -17,383 +23,175 @@ st.set_page_config(page_title="Processing", page_icon="⚙️", layout="wide")
 if not check_password():
     st.stop()
 
-# Header with navigation and refresh
-col1, col2, col3, col4 = st.columns([1, 3, 1, 1])
-
-with col1:
-    if st.button("🏠 Home", use_container_width=True, help="Return to main page"):
-        st.switch_page("app.py")
-
-with col2:
-    st.title("⚙️ Processing")
-    st.markdown("Processing statistics for social media platforms")
-
-with col3:
-    if st.button("🔄 Refresh", use_container_width=True, help="Reload data from databases"):
-        st.rerun()
-
-with col4:
-    if st.button("🚪 Logout", use_container_width=True, help="Click to logout"):
-        from auth import cookie_controller
-        st.session_state["password_correct"] = False
-        cookie_controller.remove("auth_token")
-        st.rerun()
-
-# Show last update time
-last_update = datetime.now()
-st.caption(f"Last updated: {last_update.strftime('%Y-%m-%d %H:%M:%S')}")
-
-st.markdown("---")
-
-# Database connection functions
-def get_youtube_data() -> Dict:
-    """Get YouTube data from database"""
-    try:
-        conn = psycopg2.connect(os.getenv("YOUTUBE_DATABASE_URL"))
-        cur = conn.cursor()
-        
-        # Get distinct channel names
-        cur.execute("""
-            SELECT DISTINCT channel_name 
-            FROM videos 
-            WHERE channel_name IS NOT NULL 
-            ORDER BY channel_name
-        """)
-        channels = [row[0] for row in cur.fetchall()]
-        
-        # Get total processing days count
-        cur.execute("""
-            SELECT COUNT(*) as total_days
-            FROM videos 
-            WHERE date IS NOT NULL
-        """)
-        total_days = cur.fetchone()[0]
-        
-        # Get processed dates for display
-        cur.execute("""
-            SELECT DISTINCT DATE(date) as process_date
-            FROM videos 
-            WHERE date IS NOT NULL 
-            ORDER BY process_date DESC
-        """)
-        dates = [row[0] for row in cur.fetchall()]
-        
-        # Get channel statistics
-        cur.execute("""
-            SELECT channel_name, COUNT(*) as video_count
-            FROM videos 
-            WHERE channel_name IS NOT NULL
-            GROUP BY channel_name
-            ORDER BY video_count DESC
-        """)
-        channel_stats = {row[0]: row[1] for row in cur.fetchall()}
-        
-        cur.close()
-        conn.close()
-        
-        return {
-            "channels": channels,
-            "dates": dates,
-            "total_days": total_days,
-            "channel_stats": channel_stats,
-            "error": None
-        }
-    except Exception as e:
-        return {
-            "channels": [],
-            "dates": [],
-            "total_days": 0,
-            "channel_stats": {},
-            "error": f"Connection error: {str(e)}"
-        }
-
-def get_twitter_data() -> Dict:
-    """Get Twitter data from database"""
-    try:
-        conn = psycopg2.connect(os.getenv("TWITTER_DATABASE_URL"))
-        cur = conn.cursor()
-        
-        # Get distinct twitter names
-        cur.execute("""
-            SELECT DISTINCT twitter_name 
-            FROM daily_summaries 
-            WHERE twitter_name IS NOT NULL 
-            ORDER BY twitter_name
-        """)
-        users = [row[0] for row in cur.fetchall()]
-        
-        # Get total processing days count
-        cur.execute("""
-            SELECT COUNT(*) as total_days
-            FROM daily_summaries 
-            WHERE summary_date IS NOT NULL
-        """)
-        total_days = cur.fetchone()[0]
-        
-        # Get processed dates for display
-        cur.execute("""
-            SELECT DISTINCT DATE(summary_date) as process_date
-            FROM daily_summaries 
-            WHERE summary_date IS NOT NULL 
-            ORDER BY process_date DESC
-        """)
-        dates = [row[0] for row in cur.fetchall()]
-        
-        # Get user statistics
-        cur.execute("""
-            SELECT twitter_name, COUNT(*) as tweet_count
-            FROM daily_summaries 
-            WHERE twitter_name IS NOT NULL
-            GROUP BY twitter_name
-            ORDER BY tweet_count DESC
-        """)
-        user_stats = {row[0]: row[1] for row in cur.fetchall()}
-        
-        cur.close()
-        conn.close()
-        
-        return {
-            "users": users,
-            "dates": dates,
-            "total_days": total_days,
-            "user_stats": user_stats,
-            "error": None
-        }
-    except Exception as e:
-        return {
-            "users": [],
-            "dates": [],
-            "total_days": 0,
-            "user_stats": {},
-            "error": f"Connection error: {str(e)}"
-        }
-
-def get_telegram_data() -> Dict:
-    """Get Telegram data from database"""
-    try:
-        conn = psycopg2.connect(os.getenv("TELEGRAM_DATABASE_URL"))
-        cur = conn.cursor()
-        
-        # Get distinct group names
-        cur.execute("""
-            SELECT DISTINCT group_name 
-            FROM daily_summaries 
-            WHERE group_name IS NOT NULL 
-            ORDER BY group_name
-        """)
-        groups = [row[0] for row in cur.fetchall()]
-        
-        # Get total processing days count
-        cur.execute("""
-            SELECT COUNT(*) as total_days
-            FROM daily_summaries 
-            WHERE summary_date IS NOT NULL
-        """)
-        total_days = cur.fetchone()[0]
-        
-        # Get processed dates for display
-        cur.execute("""
-            SELECT DISTINCT DATE(summary_date) as process_date
-            FROM daily_summaries 
-            WHERE summary_date IS NOT NULL 
-            ORDER BY process_date DESC
-        """)
-        dates = [row[0] for row in cur.fetchall()]
-        
-        # Get group statistics
-        cur.execute("""
-            SELECT group_name, COUNT(*) as message_count
-            FROM daily_summaries 
-            WHERE group_name IS NOT NULL
-            GROUP BY group_name
-            ORDER BY message_count DESC
-        """)
-        group_stats = {row[0]: row[1] for row in cur.fetchall()}
-        
-        cur.close()
-        conn.close()
-        
-        return {
-            "groups": groups,
-            "dates": dates,
-            "total_days": total_days,
-            "group_stats": group_stats,
-            "error": None
-        }
-    except Exception as e:
-        return {
-            "groups": [],
-            "dates": [],
-            "total_days": 0,
-            "group_stats": {},
-            "error": f"Connection error: {str(e)}"
-        }
-
-# Get data from databases
-youtube_data = get_youtube_data()
-twitter_data = get_twitter_data()
-telegram_data = get_telegram_data()
-
-# Summary section with compact cards
-st.subheader("Summary")
-col1, col2, col3 = st.columns(3)
-
-# YouTube card
-with col1:
+def render_card_header(platform: str, title: str, data: Dict, show_refresh: bool = True):
+    """Render card title with a per-platform refresh button and data age"""
+    col_title, col_refresh = st.columns([4, 1])
+    with col_title:
+        st.subheader(title)
+    if show_refresh:
+        col_refresh.button(
+            "🔄",
+            key=f"refresh_{platform}",
+            help=f"Reload {title} data from database",
+            on_click=refresh_platform,
+            args=(platform,)
+        )
+
+    if data["fetched_at"]:
+        source = " (from rollup)" if data.get("source") == "rollup" else ""
+        st.caption(
+            f"Updated: {data['fetched_at'].strftime('%Y-%m-%d %H:%M:%S')}{source}"
+            f" in {data.get('fetch_time', 0):.2f}s"
+        )
+    if data["stale_error"]:
+        st.warning(f"⚠️ Stale - showing cached data, refresh failed: {data['stale_error']}")
+
+
+def render_summary_card(platform: str, source: Dict, data: Dict, show_refresh: bool = True):
+    """Render the compact summary card for one source"""
     with st.container(border=True):
-        st.subheader("YouTube")
+        render_card_header(platform, source["label"], data, show_refresh)
         
-        if youtube_data["error"]:
-            st.error(youtube_data["error"])
+        if data["error"]:
+            st.error(data["error"])
         else:
             col_a, col_b = st.columns(2)
             with col_a:
-                st.metric(label="Channels", value=len(youtube_data["channels"]))
+                st.metric(label=source["items_label"], value=len(data[source["items_key"]]))
             with col_b:
-                st.metric(label="Days", value=youtube_data["total_days"])
+                st.metric(label="Days", value=data["total_days"])
             
-            if not youtube_data["channels"]:
+            if not data[source["items_key"]]:
                 st.info("No data yet")
 
-# Twitter card
-with col2:
-    with st.container(border=True):
-        st.subheader("Twitter")
-        
-        if twitter_data["error"]:
-            st.error(twitter_data["error"])
-        else:
-            col_a, col_b = st.columns(2)
-            with col_a:
-                st.metric(label="Users", value=len(twitter_data["users"]))
-            with col_b:
-                st.metric(label="Days", value=twitter_data["total_days"])
-            
-            if not twitter_data["users"]:
-                st.info("No data yet")
 
-# Telegram card
-with col3:
-    with st.container(border=True):
-        st.subheader("Telegram")
-        
-        if telegram_data["error"]:
-            st.error(telegram_data["error"])
-        else:
-            col_a, col_b = st.columns(2)
-            with col_a:
-                st.metric(label="Groups", value=len(telegram_data["groups"]))
-            with col_b:
-                st.metric(label="Days", value=telegram_data["total_days"])
-            
-            if not telegram_data["groups"]:
-                st.info("No data yet")
+def render_details(source: Dict, data: Dict):
+    """Render the detailed dates and per-name statistics for one source"""
+    with st.expander(f"{source['label']} Details", expanded=True):
+        if data["error"]:
+            st.error(data["error"])
+            return
 
-# Detailed sections
-st.markdown("---")
-st.subheader("Detailed Information")
-
-# YouTube details
-with st.expander("YouTube Details", expanded=True):
-    if youtube_data["error"]:
-        st.error(youtube_data["error"])
-    else:
         col1, col2 = st.columns([1, 2])
         
         with col1:
             st.markdown("### Processed Dates")
-            if youtube_data["dates"]:
-                st.markdown(f"**Date range:** {youtube_data['dates'][-1]} to {youtube_data['dates'][0]}")
-                st.markdown(f"**Total days:** {youtube_data['total_days']}")
+            if data["dates"]:
+                st.markdown(f"**Date range:** {data['dates'][-1]} to {data['dates'][0]}")
+                st.markdown(f"**Total days:** {data['total_days']}")
                 
                 # Show recent dates
                 st.markdown("**Recent dates:**")
-                for date in youtube_data["dates"][:5]:
+                for date in data["dates"][:5]:
                     st.markdown(f"- {date}")
-                if len(youtube_data["dates"]) > 5:
-                    st.caption(f"... and {len(youtube_data['dates']) - 5} more")
+                if len(data["dates"]) > 5:
+                    st.caption(f"... and {len(data['dates']) - 5} more")
             else:
                 st.info("No processed dates yet")
         
         with col2:
-            st.markdown("### Channel Statistics")
-            if youtube_data["channel_stats"]:
+            st.markdown(f"### {source['item_label']} Statistics")
+            stats = data[source["stats_key"]]
+            if stats:
                 # Create DataFrame for display
-                import pandas as pd
                 df = pd.DataFrame(
-                    [(k, v) for k, v in youtube_data["channel_stats"].items()],
-                    columns=["Channel", "Videos"]
+                    [(k, v) for k, v in stats.items()],
+                    columns=[source["item_label"], source["count_label"]]
                 )
                 st.dataframe(df, use_container_width=True, hide_index=True)
             else:
-                st.info("No channel data yet")
+                st.info(f"No {source['item_label'].lower()} data yet")
 
-# Twitter details
-with st.expander("Twitter Details", expanded=True):
-    if twitter_data["error"]:
-        st.error(twitter_data["error"])
-    else:
-        col1, col2 = st.columns([1, 2])
-        
-        with col1:
-            st.markdown("### Processed Dates")
-            if twitter_data["dates"]:
-                st.markdown(f"**Date range:** {twitter_data['dates'][-1]} to {twitter_data['dates'][0]}")
-                st.markdown(f"**Total days:** {twitter_data['total_days']}")
-                
-                # Show recent dates
-                st.markdown("**Recent dates:**")
-                for date in twitter_data["dates"][:5]:
-                    st.markdown(f"- {date}")
-                if len(twitter_data["dates"]) > 5:
-                    st.caption(f"... and {len(twitter_data['dates']) - 5} more")
-            else:
-                st.info("No processed dates yet")
-        
-        with col2:
-            st.markdown("### User Statistics")
-            if twitter_data["user_stats"]:
-                # Create DataFrame for display
-                import pandas as pd
-                df = pd.DataFrame(
-                    [(k, v) for k, v in twitter_data["user_stats"].items()],
-                    columns=["User", "Summaries"]
-                )
-                st.dataframe(df, use_container_width=True, hide_index=True)
-            else:
-                st.info("No user data yet")
 
-# Telegram details
-with st.expander("Telegram Details", expanded=True):
-    if telegram_data["error"]:
-        st.error(telegram_data["error"])
+# Header with navigation
+col1, col2, col3 = st.columns([1, 4, 1])
+
+with col1:
+    if st.button("🏠 Home", use_container_width=True, help="Return to main page"):
+        st.switch_page("app.py")
+
+with col2:
+    st.title("⚙️ Processing")
+    st.markdown("Processing statistics for social media platforms")
+
+with col3:
+    if st.button("🚪 Logout", use_container_width=True, help="Click to logout"):
+        from auth import cookie_controller
+        st.session_state["password_correct"] = False
+        cookie_controller.remove("auth_token")
+        st.rerun()
+
+# Read the collector's snapshot when configured, otherwise query all sources concurrently
+snapshot_store = get_snapshot_store()
+snapshot = snapshot_store.latest(PROCESSING_SNAPSHOT) if snapshot_store else None
+
+if snapshot:
+    platform_data = platform_data_from_snapshot(snapshot["payload"])
+    st.caption(f"Snapshot collected at {snapshot['collected_at'].strftime('%Y-%m-%d %H:%M:%S')} by the background collector")
+    if snapshot["age"] > SNAPSHOT_MAX_AGE:
+        st.warning(f"⚠️ Snapshot is {snapshot['age'] / 60:.0f} min old - is the collector running?")
+else:
+    platform_data = fetch_all_platforms()
+    # Stats are cached per platform and refreshed in the background when stale
+    st.caption(f"Data is cached for {PROCESSING_CACHE_TTL / 60:g} min - use 🔄 on a card to reload it now")
+
+st.markdown("---")
+
+# Summary section with compact cards, three per row
+st.subheader("Summary")
+platforms = list(PLATFORMS)
+for row_start in range(0, len(platforms), 3):
+    columns = st.columns(3)
+    for column, platform in zip(columns, platforms[row_start:row_start + 3]):
+        with column:
+            render_summary_card(platform, PLATFORMS[platform], platform_data[platform],
+                                show_refresh=snapshot is None)
+
+# Detailed sections
+st.markdown("---")
+st.subheader("Detailed Information")
+
+for platform in platforms:
+    render_details(PLATFORMS[platform], platform_data[platform])
+
+# Query performance (history is process-wide, newest first)
+st.markdown("---")
+with st.expander("Query performance", expanded=False):
+    query_records = get_query_records()
+    if query_records:
+        st.markdown("### By query")
+        st.dataframe(
+            pd.DataFrame(summarize_query_records(query_records)),
+            use_container_width=True,
+            hide_index=True,
+            column_config={
+                "source": st.column_config.TextColumn("Source"),
+                "query": st.column_config.TextColumn("Query"),
+                "runs": st.column_config.NumberColumn("Runs"),
+                "errors": st.column_config.NumberColumn("Errors"),
+                "last_ms": st.column_config.NumberColumn("Last (ms)"),
+                "avg_ms": st.column_config.NumberColumn("Avg (ms)"),
+                "max_ms": st.column_config.NumberColumn("Max (ms)"),
+                "last_rows": st.column_config.NumberColumn("Rows"),
+                "last_bytes": st.column_config.NumberColumn("Bytes")
+            }
+        )
+
+        st.markdown("### Recent queries")
+        st.dataframe(
+            pd.DataFrame(query_records),
+            use_container_width=True,
+            hide_index=True,
+            column_config={
+                "source": st.column_config.TextColumn("Source"),
+                "query": st.column_config.TextColumn("Query"),
+                "started_at": st.column_config.TextColumn("Started"),
+                "duration_ms": st.column_config.NumberColumn("Duration (ms)"),
+                "rows": st.column_config.NumberColumn("Rows"),
+                "bytes_fetched": st.column_config.NumberColumn("Bytes"),
+                "error": st.column_config.TextColumn("Error")
+            }
+        )
     else:
-        col1, col2 = st.columns([1, 2])
-        
-        with col1:
-            st.markdown("### Processed Dates")
-            if telegram_data["dates"]:
-                st.markdown(f"**Date range:** {telegram_data['dates'][-1]} to {telegram_data['dates'][0]}")
-                st.markdown(f"**Total days:** {telegram_data['total_days']}")
-                
-                # Show recent dates
-                st.markdown("**Recent dates:**")
-                for date in telegram_data["dates"][:5]:
-                    st.markdown(f"- {date}")
-                if len(telegram_data["dates"]) > 5:
-                    st.caption(f"... and {len(telegram_data['dates']) - 5} more")
-            else:
-                st.info("No processed dates yet")
-        
-        with col2:
-            st.markdown("### Group Statistics")
-            if telegram_data["group_stats"]:
-                # Create DataFrame for display
-                import pandas as pd
-                df = pd.DataFrame(
-                    [(k, v) for k, v in telegram_data["group_stats"].items()],
-                    columns=["Group", "Summaries"]
-                )
-                st.dataframe(df, use_container_width=True, hide_index=True)
-            else:
-                st.info("No group data yet")
\ No newline at end of file
+        st.info("No queries recorded yet - stats are served from cache")
+
@@ -0,0 +1,44 @@
+"""
+Burn rate and runway from the recorded balance history
+"""
+
+import time
+
+import pytest
+
+from utils.balance_history import BalanceHistory, total_burn
+
+
+@pytest.fixture
+def history(tmp_path):
+    return BalanceHistory(str(tmp_path / "history.db"))
+
+
+def test_burn_rate_and_runway(history):
+    now = time.time()
+    history.record("Key 1", 10.0, now - 4 * 3600)
+    history.record("Key 1", 8.0, now - 2 * 3600)
+    # Top-ups aren't spend
+    history.record("Key 1", 20.0, now - 3600)
+    history.record("Key 1", 18.0, now)
+
+    rate = history.burn_rates()["Key 1"]
+    assert rate["balance"] == 18.0
+    assert rate["spend"] == 4.0
+    assert rate["rate_per_hour"] == pytest.approx(1.0, rel=1e-3)
+    assert rate["runway_hours"] == pytest.approx(18.0, rel=1e-3)
+
+
+def test_keys_not_checked_in_window_are_left_out(history):
+    now = time.time()
+    # Rotated out two days ago
+    history.record("Old Key", 50.0, now - 49 * 3600)
+    history.record("Old Key", 50.0, now - 48 * 3600)
+    history.record("Key 1", 10.0, now - 2 * 3600)
+    history.record("Key 1", 8.0, now)
+
+    rates = history.burn_rates(window_hours=24)
+    assert list(rates) == ["Key 1"]
+    total = total_burn(rates)
+    assert total["balance"] == 8.0
+    assert total["runway_hours"] == pytest.approx(8.0, rel=1e-3)
@@ -0,0 +1,134 @@
+"""
+Failure classification and state machine of the per-key circuit breakers
+"""
+
+import asyncio
+
+import pytest
+
+from utils import circuit_breaker
+from utils.circuit_breaker import (
+    BREAKER_BACKOFF, BREAKER_MAX_BACKOFF, CLOSED, HALF_OPEN, OPEN, CircuitBreaker, failure_kind
+)
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(circuit_breaker, "time", fake)
+    return fake
+
+
+@pytest.mark.parametrize("result, kind", [
+    ({"status": "invalid_key"}, "invalid_key"),
+    ({"status": "active", "ping_status": "quota_exceeded"}, "quota_exceeded"),
+    ({"status": "error", "error": "Request timeout"}, "timeout"),
+    ({"status": "error", "error": "HTTP 401"}, "invalid_key"),
+    ({"status": "error", "error": "HTTP 403"}, "invalid_key"),
+    ({"status": "error", "error": "HTTP 429"}, "quota_exceeded"),
+    ({"status": "error", "error": "HTTP 500"}, None),
+    ({"status": "error", "error": None}, None),
+    ({"status": "active", "ping_status": "success"}, None),
+    ({"status": "insufficient"}, None),
+    ({}, None),
+])
+def test_failure_kind(result, kind):
+    assert failure_kind(result) == kind
+
+
+def test_open_half_open_closed(clock):
+    breaker = CircuitBreaker("key")
+    assert breaker.allow()
+
+    breaker.record("timeout")
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+    assert breaker.retry_in() == BREAKER_BACKOFF["timeout"]
+
+    clock.now += BREAKER_BACKOFF["timeout"]
+    # One probe once the backoff is over
+    assert breaker.allow()
+    assert breaker.state == HALF_OPEN
+    assert not breaker.allow()
+
+    breaker.record(None)
+    assert breaker.state == CLOSED
+    assert breaker.failures == 0
+    assert breaker.allow()
+
+
+def test_backoff_doubles_up_to_max(clock):
+    breaker = CircuitBreaker("key")
+    backoff = BREAKER_BACKOFF["quota_exceeded"]
+
+    breaker.record("quota_exceeded")
+    assert breaker.retry_in() == backoff
+
+    clock.now += backoff
+    assert breaker.allow()
+    breaker.record("quota_exceeded")
+    assert breaker.retry_in() == 2 * backoff
+
+    for _ in range(20):
+        breaker.record("quota_exceeded")
+    assert breaker.retry_in() == BREAKER_MAX_BACKOFF
+    assert breaker.snapshot() == {
+        "state": OPEN,
+        "failures": 22,
+        "last_failure": "quota_exceeded",
+        "retry_in": round(BREAKER_MAX_BACKOFF)
+    }
+
+
+def test_release_returns_probe(clock):
+    breaker = CircuitBreaker("key")
+    breaker.record("invalid_key")
+    clock.now += BREAKER_BACKOFF["invalid_key"]
+
+    assert breaker.allow()
+    assert not breaker.allow()
+    # The probe never completed - another caller may try
+    breaker.release()
+    assert breaker.state == HALF_OPEN
+    assert breaker.allow()
+
+
+def test_balance_success_keeps_ping_backoff(clock, monkeypatch):
+    from utils import api_monitors
+
+    monkeypatch.setattr(circuit_breaker, "_breakers", {})
+    monkeypatch.setattr(api_monitors, "get_probe_budget", lambda: None)
+    checker = api_monitors.APIBalanceChecker()
+
+    async def balance(key, key_name):
+        return {"service": key_name, "status": "active"}
+
+    async def ping(key, key_name):
+        return {"ping_status": "quota_exceeded"}
+
+    async def round_trip():
+        await checker._guarded("deepseek", "Key", "balance", balance, "sk-test", "Key")
+        return await checker._guarded("deepseek", "Key", "ping", ping, "sk-test", "Key")
+
+    backoff = BREAKER_BACKOFF["quota_exceeded"]
+    for failures in range(1, 5):
+        result = asyncio.run(round_trip())
+        assert "skipped" not in result
+        ping_breaker = circuit_breaker.get_breaker("Key", "ping")
+        assert ping_breaker.failures == failures
+        assert ping_breaker.retry_in() == min(backoff * 2 ** (failures - 1), BREAKER_MAX_BACKOFF)
+        assert circuit_breaker.get_breaker("Key", "balance").state == CLOSED
+        assert circuit_breaker.key_breaker_snapshot("Key")["check"] == "ping"
+
+        # Balance checks go on while pings are paused
+        clock.now += 1
+        assert asyncio.run(round_trip())["skipped"]
+        clock.now += ping_breaker.retry_in()
@@ -0,0 +1,64 @@
+"""
+Process-wide pool registry
+"""
+
+import threading
+
+import pytest
+
+from utils import db_pool
+
+
+class SlowPool:
+    """Stands in for ConnectionPool - "unreachable" URLs hang until released"""
+
+    opening = threading.Event()
+    release = threading.Event()
+
+    def __init__(self, database_url, connect_timeout=None, statement_timeout_ms=None):
+        if database_url == "unreachable":
+            self.opening.set()
+            self.release.wait(5)
+            raise db_pool.psycopg2.OperationalError("timeout expired")
+        self.database_url = database_url
+        self.closed = False
+
+
+@pytest.fixture
+def pools(monkeypatch):
+    SlowPool.opening.clear()
+    SlowPool.release.clear()
+    monkeypatch.setattr(db_pool, "ConnectionPool", SlowPool)
+    monkeypatch.setattr(db_pool, "_pools", {})
+    monkeypatch.setattr(db_pool, "_pool_locks", {})
+    yield
+    SlowPool.release.set()
+
+
+def test_unreachable_database_does_not_block_other_pools(pools):
+    errors = []
+
+    def open_unreachable():
+        try:
+            db_pool.get_pool("unreachable")
+        except db_pool.psycopg2.OperationalError as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=open_unreachable)
+    thread.start()
+    assert SlowPool.opening.wait(5)
+
+    # Created while the other pool is still connecting
+    assert db_pool.get_pool("postgres://good").database_url == "postgres://good"
+    assert thread.is_alive()
+
+    SlowPool.release.set()
+    thread.join(5)
+    assert len(errors) == 1
+    assert all(key[0] != "unreachable" for key in db_pool._pools)
+
+
+def test_pool_is_reused(pools):
+    first = db_pool.get_pool("postgres://good", connect_timeout=3)
+    assert db_pool.get_pool("postgres://good", connect_timeout=3) is first
+    assert db_pool.get_pool("postgres://good", connect_timeout=4) is not first
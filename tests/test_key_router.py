@@ -0,0 +1,176 @@
+"""
+Key selection, ejection and error classification of the key-pool router
+"""
+
+import asyncio
+
+import litellm
+import pytest
+import requests
+
+from utils import circuit_breaker, key_router
+from utils.circuit_breaker import BREAKER_BACKOFF, CLOSED, HALF_OPEN, OPEN
+from utils.key_router import ROUTER_EJECT_AFTER, KeyRouter, NoKeyAvailable, error_kind
+
+KEYS = {"fast": "sk-fast", "medium": "sk-medium", "slow": "sk-slow"}
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(key_router, "time", fake)
+    monkeypatch.setattr(circuit_breaker, "time", fake)
+    return fake
+
+
+def ping_row(name, latency, **fields):
+    """Monitor row of a key whose ping succeeded"""
+    return {"Service": name, "_raw_status": "active", "_ping_status": "success", "_ping_time": latency, **fields}
+
+
+def make_router(strategy="p2c", seed=None, **kwargs):
+    router = KeyRouter(KEYS, strategy=strategy, seed=seed, **kwargs)
+    router.update([ping_row("fast", 0.2), ping_row("medium", 0.5), ping_row("slow", 2.0)])
+    return router
+
+
+def test_least_loaded_picks_best_score(clock):
+    for seed in range(20):
+        assert make_router("least_loaded", seed=seed).acquire().name == "fast"
+
+
+def test_p2c_picks_better_of_two(clock):
+    picked = {make_router("p2c", seed=seed).acquire().name for seed in range(50)}
+    # The slowest key loses every pairing, the others win some
+    assert picked == {"fast", "medium"}
+
+
+def test_in_flight_cap(clock):
+    router = make_router("least_loaded", max_in_flight=1)
+    leases = [router.acquire() for _ in KEYS]
+    assert sorted(lease.name for lease in leases) == sorted(KEYS)
+    with pytest.raises(NoKeyAvailable):
+        router.acquire()
+
+    router.release(leases[0])
+    assert router.acquire().name == leases[0].name
+
+
+def test_half_open_probe_claim_and_release(clock):
+    router = KeyRouter({"a": "sk-a", "b": "sk-b"}, strategy="least_loaded")
+    for lease in [router.acquire(), router.acquire()]:
+        router.release(lease, error="timeout")
+    assert all(row["breaker"]["state"] == OPEN for row in router.snapshot())
+    with pytest.raises(NoKeyAvailable):
+        router.acquire()
+
+    clock.now += BREAKER_BACKOFF["timeout"]
+    probe = router.acquire()
+    breakers = {row["service"]: row["breaker"]["state"] for row in router.snapshot()}
+    assert breakers == {"a": HALF_OPEN, "b": HALF_OPEN}
+    # The other recovered key handed its claim back and can probe next
+    other = router.acquire()
+    assert other.name != probe.name
+    with pytest.raises(NoKeyAvailable):
+        router.acquire()
+
+    router.release(probe)
+    router.release(other, error="quota_exceeded")
+    breakers = {row["service"]: row["breaker"]["state"] for row in router.snapshot()}
+    assert breakers == {probe.name: CLOSED, other.name: OPEN}
+
+
+def test_unclassified_errors_eject_after_limit(clock):
+    router = KeyRouter({"a": "sk-a"})
+    for _ in range(ROUTER_EJECT_AFTER - 1):
+        router.release(router.acquire(), failed=True)
+        assert router.snapshot()[0]["breaker"]["state"] == CLOSED
+
+    router.release(router.acquire(), failed=True)
+    breaker = router.snapshot()[0]["breaker"]
+    assert breaker["state"] == OPEN
+    assert breaker["retry_in"] == BREAKER_BACKOFF["timeout"]
+    with pytest.raises(NoKeyAvailable):
+        router.acquire()
+
+
+def test_success_resets_error_streak(clock):
+    router = KeyRouter({"a": "sk-a"})
+    for _ in range(ROUTER_EJECT_AFTER - 1):
+        router.release(router.acquire(), failed=True)
+    router.release(router.acquire())
+    router.release(router.acquire(), failed=True)
+    assert router.snapshot()[0]["breaker"]["state"] == CLOSED
+
+
+def test_update_ejects_failing_keys(clock):
+    router = KeyRouter({"a": "sk-a", "b": "sk-b", "c": "sk-c"}, strategy="least_loaded")
+    router.update([
+        {"Service": "a", "_raw_status": "error", "Error": "HTTP 429"},
+        {"Service": "b", "_raw_status": "invalid_key", "Error": None},
+        ping_row("c", 1.0),
+        {"Service": "unknown", "_raw_status": "error", "Error": "HTTP 401"},
+    ])
+
+    states = {row["service"]: row["breaker"] for row in router.snapshot()}
+    assert states["a"]["state"] == OPEN
+    assert states["a"]["last_failure"] == "quota_exceeded"
+    assert states["b"]["last_failure"] == "invalid_key"
+    assert states["c"]["state"] == CLOSED
+    assert {router.acquire().name for _ in range(3)} == {"c"}
+
+
+class ResponseError(Exception):
+    def __init__(self, status):
+        super().__init__("request failed")
+        self.response = type("Response", (), {"status": status})()
+
+
+class ReadTimeout(OSError):
+    pass
+
+
+@pytest.mark.parametrize("error, kind", [
+    (ResponseError(401), "invalid_key"),
+    (ResponseError(403), "invalid_key"),
+    (ResponseError(408), "timeout"),
+    (ResponseError(429), "quota_exceeded"),
+    (ResponseError(500), None),
+    (litellm.RateLimitError("slow down", "deepseek", "deepseek-chat"), "quota_exceeded"),
+    (litellm.AuthenticationError("bad key", "deepseek", "deepseek-chat"), "invalid_key"),
+    (litellm.Timeout("timed out", "deepseek-chat", "deepseek"), "timeout"),
+    (TimeoutError(), "timeout"),
+    (asyncio.TimeoutError(), "timeout"),
+    (requests.exceptions.ReadTimeout(), "timeout"),
+    (ReadTimeout(), "timeout"),
+    # Messages alone never classify an error
+    (ValueError("429 rate limit exceeded"), None),
+    (RuntimeError("invalid api key"), None),
+])
+def test_error_kind(error, kind):
+    assert error_kind(error) == kind
+
+
+def test_error_kind_unwraps_stream_errors():
+    wrapped = RuntimeError("stream failed")
+    wrapped.original_exception = ResponseError(429)
+    assert error_kind(wrapped) == "quota_exceeded"
+
+
+def test_lease_reports_classified_errors(clock):
+    router = KeyRouter({"a": "sk-a"})
+    with pytest.raises(ResponseError):
+        with router.lease():
+            raise ResponseError(401)
+
+    breaker = router.snapshot()[0]["breaker"]
+    assert breaker["state"] == OPEN
+    assert breaker["last_failure"] == "invalid_key"
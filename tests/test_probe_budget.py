@@ -0,0 +1,92 @@
+"""
+Daily token budget of completion probes
+"""
+
+import asyncio
+import threading
+from types import SimpleNamespace
+
+import pytest
+
+from utils import api_monitors
+from utils.probe_budget import ProbeBudget
+
+
+@pytest.fixture
+def budget(tmp_path):
+    return ProbeBudget(str(tmp_path / "budget.db"), limit=100)
+
+
+def test_spend_stops_at_limit(budget):
+    assert budget.try_spend(60)
+    assert not budget.try_spend(60)
+    assert budget.try_spend(40)
+    assert budget.snapshot()["remaining"] == 0
+
+
+def test_settle_replaces_reservation(budget):
+    assert budget.try_spend(50)
+    budget.settle(50, 22)
+    assert budget.snapshot()["used"] == 22
+    # Unknown usage keeps the reservation
+    budget.settle(50, None)
+    assert budget.snapshot()["used"] == 22
+
+
+class RecordingBudget:
+    """Remembers which thread touched the budget and what was settled"""
+
+    def __init__(self):
+        self.threads = []
+        self.settled = []
+
+    def try_spend(self, tokens):
+        self.threads.append(threading.current_thread())
+        return True
+
+    def settle(self, reserved, actual):
+        self.threads.append(threading.current_thread())
+        self.settled.append((reserved, actual))
+
+
+def chunk(content, usage=None):
+    return SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=content))], usage=usage)
+
+
+class FakeStream:
+    def __init__(self, chunks):
+        self.chunks = chunks
+
+    def __aiter__(self):
+        return self._iterate()
+
+    async def _iterate(self):
+        for item in self.chunks:
+            yield item
+
+
+def test_stream_probe_settles_from_final_chunk(monkeypatch):
+    requests = []
+
+    async def acompletion(**kwargs):
+        requests.append(kwargs)
+        return FakeStream([chunk("po"), chunk("ng"), SimpleNamespace(choices=[], usage=SimpleNamespace(total_tokens=22))])
+
+    monkeypatch.setattr(api_monitors.litellm, "acompletion", acompletion)
+    monkeypatch.setattr(api_monitors, "get_probe_budget", RecordingBudget)
+    checker = api_monitors.APIBalanceChecker()
+    checker.probe_tier = "completion"
+    checker.ping_mode = "stream"
+
+    async def ping():
+        loop_thread = threading.current_thread()
+        return await checker.ping_deepseek_api_async("sk-test"), loop_thread
+
+    result, loop_thread = asyncio.run(ping())
+
+    assert result["ping_status"] == "success"
+    assert result["ping_response"] == "pong"
+    assert requests[0]["stream_options"] == {"include_usage": True}
+    assert checker.probe_budget.settled == [(api_monitors.PING_TOKEN_ESTIMATE, 22)]
+    # SQLite I/O never runs on the event loop
+    assert loop_thread not in checker.probe_budget.threads
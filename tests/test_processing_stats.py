@@ -0,0 +1,196 @@
+"""
+Stats parsing and incremental merge of the Processing fetchers
+The database is replaced by canned GROUPING SETS rows.
+"""
+
+import json
+from contextlib import contextmanager
+from datetime import date
+
+import pytest
+
+from utils import processing_stats
+from utils.processing_stats import (
+    GROUPING_BY_DATE, GROUPING_BY_NAME, GROUPING_TOTAL, PLATFORMS, _fetch_platform_stats
+)
+
+CUTOFF = date(2024, 5, 10)
+PLATFORM = PLATFORMS["youtube"]
+
+
+class FakeDatabase:
+    """Answers the rollup check and the stats query, remembering which query ran"""
+
+    def __init__(self, rows, rollup=False):
+        self.rows = rows
+        self.rollup = rollup
+        self.queries = []
+
+    @contextmanager
+    def connection(self, database_url, connect_timeout=None, statement_timeout_ms=None):
+        if database_url is None:
+            raise RuntimeError("no database URL")
+        yield self
+
+    @contextmanager
+    def cursor(self):
+        yield None
+
+    def execute(self, cur, source, query_name, query, params=None):
+        self.queries.append((query_name, params))
+        if query_name == "rollup_check":
+            return [(self.rollup,)]
+        return self.rows
+
+
+@pytest.fixture
+def database(monkeypatch):
+    def install(rows, rollup=False):
+        db = FakeDatabase(rows, rollup)
+        monkeypatch.setattr(processing_stats, "get_connection", db.connection)
+        monkeypatch.setattr(processing_stats, "execute_timed", db.execute)
+        monkeypatch.setattr(processing_stats, "_incremental_cutoff", lambda: CUTOFF)
+        return db
+    return install
+
+
+def test_incremental_fetch_merges_snapshot(database):
+    previous = {
+        "dates": [date(2024, 5, 11), date(2024, 5, 9), date(2024, 5, 1)],
+        "incremental": {
+            "cutoff": CUTOFF,
+            "base_stats": {"alpha": 3, "beta": 8},
+            "base_days": 11,
+            "full_refreshed_at": 1000.0
+        }
+    }
+    # Only rows past the cutoff come back
+    db = database([
+        (GROUPING_BY_NAME, "alpha", None, 4, 4, 4),
+        (GROUPING_BY_NAME, "gamma", None, 10, 10, 10),
+        (GROUPING_BY_DATE, None, date(2024, 5, 12), 9, 9, 9),
+        (GROUPING_BY_DATE, None, date(2024, 5, 11), 5, 5, 5),
+        (GROUPING_TOTAL, None, None, 14, 14, 14),
+    ])
+
+    result = _fetch_platform_stats("postgres://", PLATFORM, previous)
+
+    assert db.queries[-1] == ("incremental_stats", {"cutoff": CUTOFF})
+    assert result["channel_stats"] == {"gamma": 10, "beta": 8, "alpha": 7}
+    assert result["channels"] == ["alpha", "beta", "gamma"]
+    # Dates before the cutoff come from the snapshot, the re-scanned ones from the query
+    assert result["dates"] == [date(2024, 5, 12), date(2024, 5, 11), date(2024, 5, 9), date(2024, 5, 1)]
+    assert result["total_days"] == 25
+    # The base stays that of the last full refresh
+    assert result["incremental"] == previous["incremental"]
+
+
+def test_full_fetch_maps_grouping_ids(database):
+    db = database([
+        (GROUPING_BY_NAME, "alpha", None, 5, 5, 2),
+        (GROUPING_BY_NAME, "beta", None, 8, 7, 0),
+        (GROUPING_BY_NAME, None, None, 3, 0, 0),  # rows without a name
+        (GROUPING_BY_DATE, None, date(2024, 5, 11), 4, 4, 4),
+        (GROUPING_BY_DATE, None, date(2024, 5, 1), 9, 9, 0),
+        (GROUPING_BY_DATE, None, None, 1, 0, 0),  # rows without a date
+        (GROUPING_TOTAL, None, None, 16, 13, 2),
+    ])
+
+    result = _fetch_platform_stats("postgres://", PLATFORM)
+
+    assert result["error"] is None
+    assert result["source"] == "table"
+    assert result["channels"] == ["alpha", "beta"]
+    assert list(result["channel_stats"].items()) == [("beta", 8), ("alpha", 5)]
+    assert result["dates"] == [date(2024, 5, 11), date(2024, 5, 1)]
+    assert result["total_days"] == 13
+    assert db.queries[-1] == ("full_stats", {"cutoff": CUTOFF})
+
+    incremental = result["incremental"]
+    assert incremental["cutoff"] == CUTOFF
+    # Counts before the cutoff; names with only recent rows have no base
+    assert incremental["base_stats"] == {"alpha": 3, "beta": 8}
+    assert incremental["base_days"] == 11
+
+
+def test_connection_error_returns_empty_stats(database):
+    database([])
+
+    result = _fetch_platform_stats(None, PLATFORM)
+
+    assert result == {
+        "channels": [],
+        "dates": [],
+        "total_days": 0,
+        "channel_stats": {},
+        "error": "Connection error: no database URL"
+    }
+
+
+def test_rollup_replaces_incremental_merge(database):
+    previous = {
+        "dates": [date(2024, 5, 1)],
+        "incremental": {
+            "cutoff": date(2024, 4, 1),
+            "base_stats": {"alpha": 100},
+            "base_days": 100,
+            "full_refreshed_at": 1000.0
+        }
+    }
+    db = database([
+        (GROUPING_BY_NAME, "alpha", None, 6, 6, 1),
+        (GROUPING_BY_DATE, None, date(2024, 5, 12), 6, 6, 1),
+        (GROUPING_TOTAL, None, None, 6, 6, 1),
+    ], rollup=True)
+
+    result = _fetch_platform_stats("postgres://", PLATFORM, previous)
+
+    assert [name for name, _ in db.queries] == ["rollup_check", "rollup_stats"]
+    assert db.queries[-1][1] == {"cutoff": CUTOFF}
+    assert result["source"] == "rollup"
+    assert result["channel_stats"] == {"alpha": 6}
+    assert result["dates"] == [date(2024, 5, 12)]
+    assert result["total_days"] == 6
+    assert result["incremental"]["base_stats"] == {"alpha": 5}
+    assert result["incremental"]["base_days"] == 5
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    platforms = dict(PLATFORMS)
+    monkeypatch.setattr(processing_stats, "PLATFORMS", platforms)
+    return platforms
+
+
+def test_sources_file_skips_broken_entries(tmp_path, registry, capsys):
+    source = {
+        "name": "reddit", "url_env": "REDDIT_DATABASE_URL", "table": "posts",
+        "name_column": "subreddit", "date_column": "created_at", "label": "Reddit"
+    }
+    path = tmp_path / "sources.json"
+    path.write_text(json.dumps([
+        dict(source, item_label="Subreddit", statement_timeout_ms=5000),
+        dict(source, name="no_table", table=None),
+        dict(source, name="typo", labell="Reddit"),
+        dict(source, name="slow", connect_timeout="10"),
+        "reddit",
+    ]))
+
+    processing_stats._load_sources_file(str(path))
+
+    assert set(registry) - set(PLATFORMS) == {"reddit"}
+    assert registry["reddit"]["stats_key"] == "subreddit_stats"
+    assert registry["reddit"]["statement_timeout_ms"] == 5000
+    assert capsys.readouterr().out.count("[ERROR] Skipping source") == 4
+
+
+@pytest.mark.parametrize("content", [None, "not json", '{"name": "reddit"}'])
+def test_unreadable_sources_file_registers_nothing(tmp_path, registry, capsys, content):
+    path = tmp_path / "sources.json"
+    if content is not None:
+        path.write_text(content)
+
+    processing_stats._load_sources_file(str(path))
+
+    assert registry == PLATFORMS
+    assert "[ERROR]" in capsys.readouterr().out
@@ -0,0 +1,77 @@
+"""
+Rate-limit header parsing
+"""
+
+import pytest
+
+from utils.rate_limits import parse_rate_limit_headers
+
+NOW = 1_700_000_000.0
+
+
+def test_openai_style_headers():
+    headers = {
+        "x-ratelimit-limit-requests": "500",
+        "x-ratelimit-remaining-requests": "499",
+        "x-ratelimit-reset-requests": "120ms",
+        "x-ratelimit-limit-tokens": "30000",
+        "x-ratelimit-remaining-tokens": "29000.0",
+        "x-ratelimit-reset-tokens": "6m0s",
+        "content-type": "application/json"
+    }
+
+    assert parse_rate_limit_headers(headers, now=NOW) == {
+        "limit_requests": 500,
+        "remaining_requests": 499,
+        "reset_requests": pytest.approx(0.12),
+        "limit_tokens": 30000,
+        "remaining_tokens": 29000,
+        "reset_tokens": 360.0
+    }
+
+
+def test_litellm_prefix_and_case():
+    headers = {
+        "llm_provider-X-RateLimit-Remaining-Requests": "3",
+        "LLM_PROVIDER-retry-after": "20"
+    }
+
+    assert parse_rate_limit_headers(headers, now=NOW) == {
+        "remaining_requests": 3,
+        "retry_after": 20.0
+    }
+
+
+@pytest.mark.parametrize("value, seconds", [
+    ("30", 30.0),
+    ("1.5s", 1.5),
+    ("1h2m", 3720.0),
+    (str(int(NOW) + 45), 45.0),  # epoch timestamp
+    (str(int(NOW) - 45), 0.0),   # epoch already passed
+])
+def test_reset_values(value, seconds):
+    assert parse_rate_limit_headers({"ratelimit-reset": value}, now=NOW) == {"reset_requests": seconds}
+
+
+def test_invalid_values_are_skipped():
+    headers = {
+        "x-ratelimit-remaining-requests": "abc",
+        "x-ratelimit-reset-requests": "soon",
+        "x-ratelimit-reset-tokens": "5 minutes",
+        "x-ratelimit-limit-tokens": None,
+        "x-ratelimit-limit-requests": "60"
+    }
+
+    assert parse_rate_limit_headers(headers, now=NOW) == {"limit_requests": 60}
+
+
+def test_first_header_wins():
+    # The specific request header and the generic alias map to the same field
+    headers = {"x-ratelimit-remaining-requests": "7", "x-ratelimit-remaining": "99"}
+
+    assert parse_rate_limit_headers(headers, now=NOW) == {"remaining_requests": 7}
+
+
+@pytest.mark.parametrize("headers", [None, {}, {"content-type": "text/plain"}])
+def test_no_rate_limit_headers(headers):
+    assert parse_rate_limit_headers(headers, now=NOW) == {}
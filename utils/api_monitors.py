@@ -6,17 +6,25 @@ Simplified version for DeepSeek monitoring only
 import requests
 import litellm
 from datetime import datetime
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlparse
 import os
 import time
+import copy
+import json
 import asyncio
-import nest_asyncio
+import atexit
+import concurrent.futures
+import threading
 from dotenv import load_dotenv
-import streamlit as st
 import aiohttp
 
-# Apply nest_asyncio to allow nested event loops (for Streamlit)
-nest_asyncio.apply()
+from utils.balance_history import get_balance_history
+from utils.latency import record_ping
+from utils.circuit_breaker import get_breaker, failure_kind, key_breaker_snapshot
+from utils.probe_budget import get_probe_budget
+from utils.rate_limits import RESET_FIELDS, get_rate_limits, parse_rate_limit_headers, record_rate_limits
+from utils.shared_cache import get_cache_backend
 
 load_dotenv()
 
@@ -25,6 +33,52 @@ DEEPSEEK_MODEL = "deepseek/deepseek-chat"  # Changed from deepseek-reasoner
 GEMINI_MODEL = "gemini/gemini-2.5-pro-preview-05-06"
 PING_TIMEOUT = 10
 PING_MAX_TOKENS = 10
+# "stream" measures connect time and time-to-first-token separately, "full" waits for the whole response
+PING_MODE = os.getenv("PING_MODE", "stream")
+# Probe tier: "auth" checks the key against a free metadata endpoint (no tokens spent),
+# "completion" sends a tiny completion to the probe model while the daily token budget lasts
+PING_PROBE = os.getenv("PING_PROBE", "auth")
+# Cheapest/fastest model per provider for completion probes
+PROBE_MODELS = {
+    "deepseek": os.getenv("DEEPSEEK_PROBE_MODEL", DEEPSEEK_MODEL),
+    "gemini": os.getenv("GEMINI_PROBE_MODEL", "gemini/gemini-2.0-flash-lite")
+}
+# Tokens reserved against the budget per completion probe (prompt plus max completion)
+PING_TOKEN_ESTIMATE = 40 + PING_MAX_TOKENS
+
+# Provider endpoints - override to point the monitors at a mock server (utils/mock_provider.py)
+DEEPSEEK_BASE_URL = os.getenv("DEEPSEEK_BASE_URL", "https://api.deepseek.com").rstrip("/")
+GEMINI_BASE_URL = os.getenv("GEMINI_BASE_URL", "https://generativelanguage.googleapis.com").rstrip("/")
+# api_base handed to LiteLLM per model, None keeps LiteLLM's own default endpoint
+_PROVIDER_API_BASES = {
+    "deepseek": DEEPSEEK_BASE_URL if os.getenv("DEEPSEEK_BASE_URL") else None,
+    "gemini": f"{GEMINI_BASE_URL}/v1beta" if os.getenv("GEMINI_BASE_URL") else None
+}
+LLM_API_BASES = {
+    model: _PROVIDER_API_BASES[provider]
+    for provider, model in [("deepseek", DEEPSEEK_MODEL), ("gemini", GEMINI_MODEL), *PROBE_MODELS.items()]
+}
+
+# HTTP connection pooling for balance/status checks
+HTTP_LIMIT_PER_HOST = int(os.getenv("HTTP_LIMIT_PER_HOST", "10"))
+HTTP_DNS_CACHE_TTL = int(os.getenv("HTTP_DNS_CACHE_TTL", "300"))
+HTTP_KEEPALIVE_TIMEOUT = float(os.getenv("HTTP_KEEPALIVE_TIMEOUT", "30"))
+
+# Optional JSON file with extra keys per provider, either a list of keys or
+# {"name": "key"}: {"deepseek": ["sk-..."], "gemini": {"Gemini Backup": "..."}}
+API_KEYS_FILE = os.getenv("API_KEYS_FILE")
+
+# Requests in flight per provider during a fan-out over all keys
+PROVIDER_MAX_CONCURRENCY = {
+    "deepseek": int(os.getenv("DEEPSEEK_MAX_CONCURRENCY", "5")),
+    "gemini": int(os.getenv("GEMINI_MAX_CONCURRENCY", "5"))
+}
+
+# Upper bound for a sync call waiting on the background event loop
+ASYNC_CALL_TIMEOUT = float(os.getenv("ASYNC_CALL_TIMEOUT", "60"))
+
+# How long balance results are cached (seconds)
+BALANCES_CACHE_TTL = float(os.getenv("BALANCES_CACHE_TTL", "300"))
 
 # Ping test messages
 PING_MESSAGES = [
@@ -33,20 +87,267 @@ PING_MESSAGES = [
 ]
 
 
+def _load_keys_file(path: Optional[str]) -> Dict:
+    """Read the optional keys file (missing or broken file means no extra keys)"""
+    if not path:
+        return {}
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"[ERROR] Failed to read API keys file {path}: {e}")
+        return {}
+
+
+def discover_keys(provider: str, env_prefix: str, name_prefix: str,
+                  single_name: Optional[str] = None) -> Dict[str, str]:
+    """
+    All keys of a provider as {service name: key}:
+    <env_prefix> (named single_name), <env_prefix>_<n> (named "<name_prefix> <n>")
+    and the provider's entries in API_KEYS_FILE
+    """
+    keys = {}
+    if single_name and os.getenv(env_prefix):
+        keys[single_name] = os.getenv(env_prefix)
+    
+    numbered = []
+    for var, value in os.environ.items():
+        suffix = var[len(env_prefix) + 1:] if var.startswith(env_prefix + "_") else ""
+        if suffix.isdigit() and value:
+            numbered.append((int(suffix), value))
+    for n, value in sorted(numbered):
+        keys[f"{name_prefix} {n}"] = value
+    
+    from_file = _load_keys_file(API_KEYS_FILE).get(provider, [])
+    known = set(keys.values())
+    if isinstance(from_file, list):
+        # Unnamed keys continue the numbering after the env keys
+        next_n = max((n for n, _ in numbered), default=0) + 1
+        new_keys = [value for value in dict.fromkeys(from_file) if value and value not in known]
+        from_file = {f"{name_prefix} {next_n + i}": value for i, value in enumerate(new_keys)}
+    
+    for name, value in from_file.items():
+        if value and value not in known:
+            keys[name] = value
+            known.add(value)
+    
+    return keys
+
+
+def _response_rate_limits(source) -> Dict:
+    """Rate-limit headers of a LiteLLM response, stream or exception"""
+    # Errors raised mid-stream wrap the provider's error
+    source = getattr(source, "original_exception", None) or source
+    headers = getattr(source, "litellm_response_headers", None)
+    if headers is None:
+        headers = (getattr(source, "_hidden_params", None) or {}).get("additional_headers")
+    return parse_rate_limit_headers(headers)
+
+
+class _BackgroundLoop:
+    """Event loop running forever in a daemon thread, shared by the whole process"""
+    
+    def __init__(self):
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+    
+    def _get_loop(self) -> asyncio.AbstractEventLoop:
+        """Start the loop thread on first use"""
+        with self._lock:
+            if self._loop is None or self._loop.is_closed():
+                loop = asyncio.new_event_loop()
+                thread = threading.Thread(target=loop.run_forever, name="api-monitors-loop", daemon=True)
+                thread.start()
+                self._loop, self._thread = loop, thread
+            return self._loop
+    
+    def submit(self, coro) -> concurrent.futures.Future:
+        """Schedule a coroutine on the loop without waiting for it"""
+        return asyncio.run_coroutine_threadsafe(coro, self._get_loop())
+    
+    def run(self, coro, timeout: Optional[float] = ASYNC_CALL_TIMEOUT):
+        """Run a coroutine on the loop and block until it finishes"""
+        if threading.current_thread() is self._thread:
+            coro.close()
+            raise RuntimeError("Blocking call from inside the monitors event loop - await the coroutine instead")
+        
+        future = self.submit(coro)
+        try:
+            return future.result(timeout)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            raise
+    
+    def stop(self):
+        """Stop the loop thread (pending tasks are abandoned)"""
+        with self._lock:
+            if self._loop is not None and not self._loop.is_closed():
+                self._loop.call_soon_threadsafe(self._loop.stop)
+                self._thread.join(timeout=5)
+                if not self._thread.is_alive():
+                    self._loop.close()
+            self._loop, self._thread = None, None
+
+
+_background_loop = _BackgroundLoop()
+
+
+def run_async(coro, timeout: Optional[float] = ASYNC_CALL_TIMEOUT):
+    """Sync facade: run a coroutine on the shared background loop"""
+    return _background_loop.run(coro, timeout)
+
+
+class SingleFlight:
+    """Collapses concurrent calls with the same key into one execution"""
+    
+    def __init__(self):
+        self._calls: Dict[object, concurrent.futures.Future] = {}
+        self._lock = threading.Lock()
+    
+    def do(self, key, fn):
+        """Run fn, or wait for the identical call already in flight and share its result"""
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = concurrent.futures.Future()
+                self._calls[key] = future
+        
+        if not leader:
+            # Callers mutate results (e.g. merging pings), so followers get their own copy
+            return copy.deepcopy(future.result())
+        
+        try:
+            result = fn()
+            future.set_result(result)
+            return result
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._calls.pop(key, None)
+
+
+_single_flight = SingleFlight()
+
+
 class APIBalanceChecker:
     """Class for checking DeepSeek API balances and Gemini status"""
     
     def __init__(self):
-        """Initialize with API keys from environment variables"""
-        self.deepseek_keys = [
-            os.getenv("DEEPSEEK_API_KEY_1"),
-            os.getenv("DEEPSEEK_API_KEY_2"),
-            os.getenv("DEEPSEEK_API_KEY_3")
-        ]
+        """Initialize with API keys discovered from the environment and API_KEYS_FILE"""
+        # service name -> key; a single unset placeholder keeps "not configured" visible
+        self.deepseek_keys: Dict[str, Optional[str]] = (
+            discover_keys("deepseek", "DEEPSEEK_API_KEY", "DeepSeek Key") or {"DeepSeek Key 1": None}
+        )
+        self.gemini_keys: Dict[str, Optional[str]] = (
+            discover_keys("gemini", "GEMINI_API_KEY", "Google Gemini", single_name="Google Gemini")
+            or {"Google Gemini": None}
+        )
+        
+        # Pooled HTTP sessions: host -> (session, event loop it belongs to)
+        self._sessions: Dict[str, Tuple[aiohttp.ClientSession, asyncio.AbstractEventLoop]] = {}
+        # Per-provider fan-out limits: provider -> (semaphore, event loop it belongs to)
+        self._semaphores: Dict[str, Tuple[asyncio.Semaphore, asyncio.AbstractEventLoop]] = {}
+        
+        self.ping_mode = PING_MODE
+        self.probe_tier = PING_PROBE
+        self.probe_budget = get_probe_budget()
+    
+    def _get_session(self, url: str) -> aiohttp.ClientSession:
+        """Get the pooled session for the URL's host (must be called inside the event loop)"""
+        host = urlparse(url).netloc
+        loop = asyncio.get_running_loop()
+        session, session_loop = self._sessions.get(host, (None, None))
+        
+        if session is None or session.closed or session_loop is not loop:
+            connector = aiohttp.TCPConnector(
+                limit_per_host=HTTP_LIMIT_PER_HOST,
+                ttl_dns_cache=HTTP_DNS_CACHE_TTL,
+                keepalive_timeout=HTTP_KEEPALIVE_TIMEOUT
+            )
+            session = aiohttp.ClientSession(connector=connector)
+            self._sessions[host] = (session, loop)
+        
+        return session
+    
+    def _get_semaphore(self, provider: str) -> asyncio.Semaphore:
+        """Get the provider's concurrency limit (must be called inside the event loop)"""
+        loop = asyncio.get_running_loop()
+        semaphore, semaphore_loop = self._semaphores.get(provider, (None, None))
+        if semaphore is None or semaphore_loop is not loop:
+            semaphore = asyncio.Semaphore(PROVIDER_MAX_CONCURRENCY.get(provider, 5))
+            self._semaphores[provider] = (semaphore, loop)
+        return semaphore
+    
+    async def _reserve_probe_tokens(self) -> bool:
+        """Whether a completion probe may run (the budget's SQLite I/O runs off the event loop)"""
+        if self.probe_tier != "completion":
+            return False
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self.probe_budget.try_spend, PING_TOKEN_ESTIMATE)
+    
+    async def _settle_probe_tokens(self, usage):
+        """Replace a completion probe's reservation with the tokens the provider billed"""
+        total_tokens = getattr(usage, "total_tokens", None)
+        if total_tokens is not None:
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, self.probe_budget.settle, PING_TOKEN_ESTIMATE, total_tokens)
+    
+    async def _guarded(self, provider: str, key_name: str, check: str, call, *args) -> Dict:
+        """
+        Run a balance check or ping (check = "balance" / "ping") through the key's
+        circuit breaker for that check and under the provider's concurrency limit
+        """
+        if not args[0]:
+            # Not configured - nothing to protect
+            return await call(*args)
+        
+        breaker = get_breaker(key_name, check)
+        if not breaker.allow():
+            return self._skipped_result(key_name, check, breaker.snapshot())
         
-        # Google Gemini key
-        self.gemini_key = os.getenv("GEMINI_API_KEY")
+        try:
+            async with self._get_semaphore(provider):
+                result = await call(*args)
+        except BaseException:
+            breaker.release()
+            raise
+        
+        breaker.record(failure_kind(result))
+        record_rate_limits(key_name, result.get("rate_limits"))
+        return result
+    
+    def _skipped_result(self, key_name: str, check: str, breaker: Dict) -> Dict:
+        """Result of a check skipped because the key's breaker is open"""
+        error = f"Skipped - {breaker['last_failure']}, retry in {breaker['retry_in']}s"
+        if check == "ping":
+            return {
+                "ping_status": breaker["last_failure"],
+                "ping_response": None,
+                "ping_time": 0,
+                "ping_error": error,
+                "skipped": True
+            }
         
+        return {
+            "service": key_name,
+            "status": breaker["last_failure"] if breaker["last_failure"] != "timeout" else "error",
+            "error": error,
+            "balance_value": 0,
+            "skipped": True
+        }
+    
+    async def close(self):
+        """Close all pooled HTTP sessions"""
+        sessions = [session for session, _ in self._sessions.values()]
+        self._sessions.clear()
+        for session in sessions:
+            if not session.closed:
+                await session.close()
+    
     def check_deepseek_balance(self, api_key: str, key_name: str = "DeepSeek") -> Dict:
         """Check DeepSeek API balance"""
         if not api_key:
@@ -56,7 +357,7 @@ class APIBalanceChecker:
                 "error": "API key not found"
             }
             
-        url = "https://api.deepseek.com/user/balance"
+        url = f"{DEEPSEEK_BASE_URL}/user/balance"
         headers = {
             "Authorization": f"Bearer {api_key}",
             "Accept": "application/json"
@@ -127,146 +428,82 @@ class APIBalanceChecker:
                 "error": "API key not found"
             }
             
-        url = "https://api.deepseek.com/user/balance"
+        url = f"{DEEPSEEK_BASE_URL}/user/balance"
         headers = {
             "Authorization": f"Bearer {api_key}",
             "Accept": "application/json"
         }
         
-        async with aiohttp.ClientSession() as session:
-            try:
-                async with session.get(url, headers=headers, timeout=aiohttp.ClientTimeout(total=5)) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        
-                        # Extract balance information
-                        balance_info = {}
-                        total_balance = 0
-                        granted_balance = 0
-                        topped_up_balance = 0
-                        
-                        if "balance_infos" in data and len(data["balance_infos"]) > 0:
-                            for balance in data["balance_infos"]:
-                                currency = balance.get("currency", "Unknown")
-                                total = float(balance.get("total_balance", "0"))
-                                granted = float(balance.get("granted_balance", "0"))
-                                topped_up = float(balance.get("topped_up_balance", "0"))
-                                
-                                balance_info[currency] = {
-                                    "total": total,
-                                    "granted": granted,
-                                    "topped_up": topped_up
-                                }
-                                
-                                if currency == "USD":
-                                    total_balance = total
-                                    granted_balance = granted
-                                    topped_up_balance = topped_up
-                        
-                        return {
-                            "service": key_name,
-                            "status": "active" if data.get("is_available", False) else "insufficient",
-                            "balance": f"${total_balance:.2f}",
-                            "balance_value": total_balance,
-                            "granted": f"${granted_balance:.2f}",
-                            "topped_up": f"${topped_up_balance:.2f}",
-                            "balances": balance_info,
-                            "raw_response": data
-                        }
-                    else:
-                        return {
-                            "service": key_name,
-                            "status": "error",
-                            "error": f"HTTP {response.status}",
-                            "balance_value": 0
-                        }
-                        
-            except asyncio.TimeoutError:
-                return {
-                    "service": key_name,
-                    "status": "error",
-                    "error": "Request timeout",
-                    "balance_value": 0
-                }
-            except Exception as e:
-                return {
-                    "service": key_name,
-                    "status": "error",
-                    "error": f"Request failed: {str(e)}",
-                    "balance_value": 0
-                }
-    
-    def ping_deepseek_api(self, api_key: str, key_name: str = "DeepSeek") -> Dict:
-        """Ping DeepSeek API with a simple test request"""
-        if not api_key:
-            return {
-                "ping_status": "not_configured",
-                "ping_error": "API key not found",
-                "ping_time": 0
-            }
-        
+        session = self._get_session(url)
         try:
-            start_time = time.time()
-            
-            # Use LiteLLM for unified API calls
-            response = litellm.completion(
-                model=DEEPSEEK_MODEL,
-                messages=PING_MESSAGES,
-                api_key=api_key,
-                max_tokens=PING_MAX_TOKENS,
-                timeout=PING_TIMEOUT
-            )
-            
-            end_time = time.time()
-            response_time = round(end_time - start_time, 2)
-            
-            # Safely extract response content for DeepSeek
-            try:
-                # Debug logging
-                if hasattr(response, 'choices') and response.choices:
-                    choice = response.choices[0]
-                    content = choice.message.content
+            async with session.get(url, headers=headers, timeout=aiohttp.ClientTimeout(total=5)) as response:
+                rate_limits = parse_rate_limit_headers(response.headers)
+                if response.status == 200:
+                    data = await response.json()
                     
-                    # Additional debug info
-                    if not content:
-                        print(f"DEBUG DeepSeek: Empty content. Model: {getattr(response, 'model', 'unknown')}, "
-                              f"Finish reason: {getattr(choice, 'finish_reason', 'unknown')}")
+                    # Extract balance information
+                    balance_info = {}
+                    total_balance = 0
+                    granted_balance = 0
+                    topped_up_balance = 0
                     
-                    response_content = content.strip().lower() if content else "[empty response]"
+                    if "balance_infos" in data and len(data["balance_infos"]) > 0:
+                        for balance in data["balance_infos"]:
+                            currency = balance.get("currency", "Unknown")
+                            total = float(balance.get("total_balance", "0"))
+                            granted = float(balance.get("granted_balance", "0"))
+                            topped_up = float(balance.get("topped_up_balance", "0"))
+                            
+                            balance_info[currency] = {
+                                "total": total,
+                                "granted": granted,
+                                "topped_up": topped_up
+                            }
+                            
+                            if currency == "USD":
+                                total_balance = total
+                                granted_balance = granted
+                                topped_up_balance = topped_up
+                    
+                    return {
+                        "service": key_name,
+                        "status": "active" if data.get("is_available", False) else "insufficient",
+                        "balance": f"${total_balance:.2f}",
+                        "balance_value": total_balance,
+                        "granted": f"${granted_balance:.2f}",
+                        "topped_up": f"${topped_up_balance:.2f}",
+                        "balances": balance_info,
+                        "raw_response": data,
+                        "rate_limits": rate_limits
+                    }
                 else:
-                    response_content = "[no choices in response]"
-            except (AttributeError, IndexError) as e:
-                response_content = f"parse error: {str(e)}"
-            
+                    return {
+                        "service": key_name,
+                        "status": "error",
+                        "error": f"HTTP {response.status}",
+                        "balance_value": 0,
+                        "rate_limits": rate_limits
+                    }
+                    
+        except asyncio.TimeoutError:
             return {
-                "ping_status": "success",
-                "ping_response": response_content,
-                "ping_time": response_time,
-                "ping_error": None
+                "service": key_name,
+                "status": "error",
+                "error": "Request timeout",
+                "balance_value": 0
             }
-            
         except Exception as e:
-            end_time = time.time()
-            response_time = round(end_time - start_time, 2) if 'start_time' in locals() else 0
-            
-            # Determine error type
-            error_str = str(e).lower()
-            if "timeout" in error_str:
-                status = "timeout"
-            elif "quota" in error_str or "rate" in error_str or "429" in error_str:
-                status = "quota_exceeded"
-            elif "unauthorized" in error_str or "401" in error_str:
-                status = "invalid_key"
-            else:
-                status = "failed"
-            
             return {
-                "ping_status": status,
-                "ping_response": None,
-                "ping_time": response_time,
-                "ping_error": str(e)
+                "service": key_name,
+                "status": "error",
+                "error": f"Request failed: {str(e)}",
+                "balance_value": 0
             }
     
+    def ping_deepseek_api(self, api_key: str, key_name: str = "DeepSeek") -> Dict:
+        """Ping DeepSeek API (sync wrapper around the async probe)"""
+        return run_async(self.ping_deepseek_api_async(api_key, key_name))
+    
     async def ping_deepseek_api_async(self, api_key: str, key_name: str = "DeepSeek") -> Dict:
         """Async ping DeepSeek API with a simple test request"""
         if not api_key:
@@ -276,12 +513,20 @@ class APIBalanceChecker:
                 "ping_time": 0
             }
         
+        # Free auth probe unless completion probes are enabled and within today's token budget
+        if not await self._reserve_probe_tokens():
+            return await self.auth_probe_async("deepseek", api_key)
+        
+        if self.ping_mode == "stream":
+            return await self.stream_probe_async(PROBE_MODELS["deepseek"], api_key)
+        
         try:
             start_time = time.time()
             
             # Use async LiteLLM for true parallel calls
             response = await litellm.acompletion(
-                model=DEEPSEEK_MODEL,
+                model=PROBE_MODELS["deepseek"],
+                api_base=LLM_API_BASES[PROBE_MODELS["deepseek"]],
                 messages=PING_MESSAGES,
                 api_key=api_key,
                 max_tokens=PING_MAX_TOKENS,
@@ -290,6 +535,7 @@ class APIBalanceChecker:
             
             end_time = time.time()
             response_time = round(end_time - start_time, 2)
+            await self._settle_probe_tokens(getattr(response, "usage", None))
             
             # Safely extract response content for DeepSeek
             try:
@@ -313,7 +559,9 @@ class APIBalanceChecker:
                 "ping_status": "success",
                 "ping_response": response_content,
                 "ping_time": response_time,
-                "ping_error": None
+                "ping_error": None,
+                "rate_limits": _response_rate_limits(response),
+                "ping_probe": "completion"
             }
             
         except Exception as e:
@@ -335,20 +583,22 @@ class APIBalanceChecker:
                 "ping_status": status,
                 "ping_response": None,
                 "ping_time": response_time,
-                "ping_error": str(e)
+                "ping_error": str(e),
+                "rate_limits": _response_rate_limits(e),
+                "ping_probe": "completion"
             }
     
-    def check_gemini_status(self, api_key: str) -> Dict:
+    def check_gemini_status(self, api_key: str, key_name: str = "Google Gemini") -> Dict:
         """Check Google Gemini API key validity (no balance API available)"""
         if not api_key:
             return {
-                "service": "Google Gemini",
+                "service": key_name,
                 "status": "not_configured",
                 "error": "API key not found"
             }
             
         # Test with a lightweight request to models endpoint
-        url = f"https://generativelanguage.googleapis.com/v1beta/models?key={api_key}"
+        url = f"{GEMINI_BASE_URL}/v1beta/models?key={api_key}"
         
         try:
             response = requests.get(url, timeout=5)
@@ -358,7 +608,7 @@ class APIBalanceChecker:
                 model_count = len(data.get("models", []))
                 
                 return {
-                    "service": "Google Gemini",
+                    "service": key_name,
                     "status": "active",
                     "models_available": model_count,
                     "note": "Key valid (no balance API)",
@@ -366,90 +616,99 @@ class APIBalanceChecker:
                 }
             elif response.status_code == 403:
                 return {
-                    "service": "Google Gemini",
+                    "service": key_name,
                     "status": "invalid_key",
                     "error": "Invalid or restricted API key"
                 }
             elif response.status_code == 429:
                 return {
-                    "service": "Google Gemini",
+                    "service": key_name,
                     "status": "quota_exceeded",
                     "error": "Quota exceeded or rate limited"
                 }
             else:
                 return {
-                    "service": "Google Gemini",
+                    "service": key_name,
                     "status": "error",
                     "error": f"HTTP {response.status_code}"
                 }
                 
         except requests.exceptions.RequestException as e:
             return {
-                "service": "Google Gemini",
+                "service": key_name,
                 "status": "error",
                 "error": f"Request failed: {str(e)}"
             }
     
-    async def check_gemini_status_async(self, api_key: str) -> Dict:
+    async def check_gemini_status_async(self, api_key: str, key_name: str = "Google Gemini") -> Dict:
         """Async check Google Gemini API key validity"""
         if not api_key:
             return {
-                "service": "Google Gemini",
+                "service": key_name,
                 "status": "not_configured",
                 "error": "API key not found"
             }
             
         # Test with a lightweight request to models endpoint
-        url = f"https://generativelanguage.googleapis.com/v1beta/models?key={api_key}"
+        url = f"{GEMINI_BASE_URL}/v1beta/models?key={api_key}"
         
-        async with aiohttp.ClientSession() as session:
-            try:
-                async with session.get(url, timeout=aiohttp.ClientTimeout(total=5)) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        model_count = len(data.get("models", []))
-                        
-                        return {
-                            "service": "Google Gemini",
-                            "status": "active",
-                            "models_available": model_count,
-                            "note": "Key valid (no balance API)",
-                            "dashboard_url": "https://console.cloud.google.com/apis/api/generativelanguage.googleapis.com/metrics"
-                        }
-                    elif response.status == 403:
-                        return {
-                            "service": "Google Gemini",
-                            "status": "invalid_key",
-                            "error": "Invalid or restricted API key"
-                        }
-                    elif response.status == 429:
-                        return {
-                            "service": "Google Gemini",
-                            "status": "quota_exceeded",
-                            "error": "Quota exceeded or rate limited"
-                        }
-                    else:
-                        return {
-                            "service": "Google Gemini",
-                            "status": "error",
-                            "error": f"HTTP {response.status}"
-                        }
-                        
-            except asyncio.TimeoutError:
-                return {
-                    "service": "Google Gemini",
-                    "status": "error",
-                    "error": "Request timeout"
-                }
-            except Exception as e:
-                return {
-                    "service": "Google Gemini",
-                    "status": "error",
-                    "error": f"Request failed: {str(e)}"
-                }
+        session = self._get_session(url)
+        try:
+            async with session.get(url, timeout=aiohttp.ClientTimeout(total=5)) as response:
+                rate_limits = parse_rate_limit_headers(response.headers)
+                if response.status == 200:
+                    data = await response.json()
+                    model_count = len(data.get("models", []))
+                    
+                    return {
+                        "service": key_name,
+                        "status": "active",
+                        "models_available": model_count,
+                        "note": "Key valid (no balance API)",
+                        "dashboard_url": "https://console.cloud.google.com/apis/api/generativelanguage.googleapis.com/metrics",
+                        "rate_limits": rate_limits
+                    }
+                elif response.status == 403:
+                    return {
+                        "service": key_name,
+                        "status": "invalid_key",
+                        "error": "Invalid or restricted API key",
+                        "rate_limits": rate_limits
+                    }
+                elif response.status == 429:
+                    return {
+                        "service": key_name,
+                        "status": "quota_exceeded",
+                        "error": "Quota exceeded or rate limited",
+                        "rate_limits": rate_limits
+                    }
+                else:
+                    return {
+                        "service": key_name,
+                        "status": "error",
+                        "error": f"HTTP {response.status}",
+                        "rate_limits": rate_limits
+                    }
+                    
+        except asyncio.TimeoutError:
+            return {
+                "service": key_name,
+                "status": "error",
+                "error": "Request timeout"
+            }
+        except Exception as e:
+            return {
+                "service": key_name,
+                "status": "error",
+                "error": f"Request failed: {str(e)}"
+            }
     
     def ping_gemini_api(self, api_key: str) -> Dict:
-        """Ping Google Gemini API with a simple test request"""
+        """Ping Google Gemini API (sync wrapper around the async probe)"""
+        return run_async(self.ping_gemini_api_async(api_key))
+    
+    async def ping_gemini_api_async(self, api_key: str) -> Dict:
+        """Async ping Google Gemini API with a simple test request"""
         if not api_key:
             return {
                 "ping_status": "not_configured",
@@ -457,12 +716,20 @@ class APIBalanceChecker:
                 "ping_time": 0
             }
         
+        # Free auth probe unless completion probes are enabled and within today's token budget
+        if not await self._reserve_probe_tokens():
+            return await self.auth_probe_async("gemini", api_key)
+        
+        if self.ping_mode == "stream":
+            return await self.stream_probe_async(PROBE_MODELS["gemini"], api_key)
+        
         try:
             start_time = time.time()
             
-            # Use LiteLLM for unified API calls
-            response = litellm.completion(
-                model=GEMINI_MODEL,
+            # Use async LiteLLM for true parallel calls
+            response = await litellm.acompletion(
+                model=PROBE_MODELS["gemini"],
+                api_base=LLM_API_BASES[PROBE_MODELS["gemini"]],
                 messages=PING_MESSAGES,
                 api_key=api_key,
                 max_tokens=PING_MAX_TOKENS,
@@ -471,6 +738,7 @@ class APIBalanceChecker:
             
             end_time = time.time()
             response_time = round(end_time - start_time, 2)
+            await self._settle_probe_tokens(getattr(response, "usage", None))
             
             # Safely extract response content for Gemini
             try:
@@ -498,7 +766,9 @@ class APIBalanceChecker:
                 "ping_status": "success",
                 "ping_response": response_content,
                 "ping_time": response_time,
-                "ping_error": None
+                "ping_error": None,
+                "rate_limits": _response_rate_limits(response),
+                "ping_probe": "completion"
             }
             
         except Exception as e:
@@ -520,73 +790,120 @@ class APIBalanceChecker:
                 "ping_status": status,
                 "ping_response": None,
                 "ping_time": response_time,
-                "ping_error": str(e)
+                "ping_error": str(e),
+                "rate_limits": _response_rate_limits(e),
+                "ping_probe": "completion"
             }
     
-    async def ping_gemini_api_async(self, api_key: str) -> Dict:
-        """Async ping Google Gemini API with a simple test request"""
-        if not api_key:
+    async def auth_probe_async(self, provider: str, api_key: str) -> Dict:
+        """Free probe: an authenticated metadata request that spends no tokens"""
+        if provider == "deepseek":
+            url = f"{DEEPSEEK_BASE_URL}/models"
+            headers = {"Authorization": f"Bearer {api_key}"}
+        else:
+            model_name = PROBE_MODELS["gemini"].split("/", 1)[-1]
+            url = f"{GEMINI_BASE_URL}/v1beta/models/{model_name}"
+            headers = {"x-goog-api-key": api_key}
+        
+        # Completion probes were enabled but today's token budget ran out
+        note = "key valid (token budget spent)" if self.probe_tier == "completion" else "key valid"
+        start_time = time.time()
+        session = self._get_session(url)
+        try:
+            async with session.get(url, headers=headers, timeout=aiohttp.ClientTimeout(total=PING_TIMEOUT)) as response:
+                connect_time = time.time() - start_time
+                await response.read()
+                http_status = response.status
+                rate_limits = parse_rate_limit_headers(response.headers)
+        except asyncio.TimeoutError:
             return {
-                "ping_status": "not_configured",
-                "ping_error": "API key not found",
-                "ping_time": 0
+                "ping_status": "timeout",
+                "ping_response": None,
+                "ping_time": round(time.time() - start_time, 2),
+                "ping_error": "Request timeout",
+                "ping_probe": "auth"
+            }
+        except Exception as e:
+            return {
+                "ping_status": "failed",
+                "ping_response": None,
+                "ping_time": round(time.time() - start_time, 2),
+                "ping_error": str(e) or type(e).__name__,
+                "ping_probe": "auth"
             }
         
-        try:
-            start_time = time.time()
-            
-            # Use async LiteLLM for true parallel calls
-            response = await litellm.acompletion(
-                model=GEMINI_MODEL,
+        result = {
+            "ping_status": "success",
+            "ping_response": note,
+            "ping_time": round(time.time() - start_time, 2),
+            "ping_connect_time": round(connect_time, 2),
+            "ping_error": None,
+            "ping_probe": "auth",
+            "rate_limits": rate_limits
+        }
+        if http_status != 200:
+            result["ping_status"] = {401: "invalid_key", 403: "invalid_key", 429: "quota_exceeded"}.get(http_status, "failed")
+            result["ping_response"] = None
+            result["ping_error"] = f"HTTP {http_status}"
+        return result
+    
+    async def stream_probe_async(self, model: str, api_key: str) -> Dict:
+        """Streaming ping: connect time, time-to-first-token and total time"""
+        start_time = time.time()
+        connect_time = None
+        ttft = None
+        parts = []
+        rate_limits = {}
+        usage = None
+        
+        async def consume():
+            nonlocal connect_time, ttft, rate_limits, usage
+            stream = await litellm.acompletion(
+                model=model,
+                api_base=LLM_API_BASES.get(model),
                 messages=PING_MESSAGES,
                 api_key=api_key,
                 max_tokens=PING_MAX_TOKENS,
-                timeout=PING_TIMEOUT
+                timeout=PING_TIMEOUT,
+                stream=True,
+                # The final chunk reports the billed tokens
+                stream_options={"include_usage": True}
             )
+            # The stream is handed back once the response headers arrived
+            connect_time = time.time() - start_time
+            rate_limits = _response_rate_limits(stream)
             
-            end_time = time.time()
-            response_time = round(end_time - start_time, 2)
-            
-            # Safely extract response content for Gemini
-            try:
-                content = response.choices[0].message.content
-                response_content = content.strip().lower() if content else "empty response"
-                
-                # Debug info for Gemini issues
-                if not content:
-                    debug_info = f"Debug: choices={len(response.choices) if hasattr(response, 'choices') else 'no choices'}"
-                    response_content = f"empty response ({debug_info})"
-                    
-            except (AttributeError, IndexError) as e:
-                # More detailed debug info
-                try:
-                    debug_info = f"Response type: {type(response)}, Has choices: {hasattr(response, 'choices')}"
-                    if hasattr(response, 'choices') and response.choices:
-                        debug_info += f", Choice type: {type(response.choices[0])}"
-                        if hasattr(response.choices[0], 'message'):
-                            debug_info += f", Message type: {type(response.choices[0].message)}"
-                    response_content = f"parse error: {str(e)} ({debug_info})"
-                except:
-                    response_content = f"parse error: {str(e)}"
+            async for chunk in stream:
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if delta:
+                    if ttft is None:
+                        ttft = time.time() - start_time
+                    parts.append(delta)
+                usage = getattr(chunk, "usage", None) or usage
+        
+        try:
+            await asyncio.wait_for(consume(), timeout=PING_TIMEOUT)
+            await self._settle_probe_tokens(usage)
+            content = "".join(parts).strip().lower()
             
             return {
                 "ping_status": "success",
-                "ping_response": response_content,
-                "ping_time": response_time,
-                "ping_error": None
+                "ping_response": content or "[empty response]",
+                "ping_time": round(time.time() - start_time, 2),
+                "ping_connect_time": round(connect_time, 2),
+                "ping_ttft": round(ttft, 2) if ttft is not None else None,
+                "ping_error": None,
+                "rate_limits": rate_limits,
+                "ping_probe": "completion"
             }
             
         except Exception as e:
-            end_time = time.time()
-            response_time = round(end_time - start_time, 2) if 'start_time' in locals() else 0
-            
-            # Determine error type for Gemini
             error_str = str(e).lower()
-            if "timeout" in error_str:
+            if isinstance(e, asyncio.TimeoutError) or "timeout" in error_str:
                 status = "timeout"
             elif "quota" in error_str or "rate" in error_str or "429" in error_str:
                 status = "quota_exceeded"
-            elif "unauthorized" in error_str or "403" in error_str:
+            elif "unauthorized" in error_str or "401" in error_str or "403" in error_str:
                 status = "invalid_key"
             else:
                 status = "failed"
@@ -594,14 +911,27 @@ class APIBalanceChecker:
             return {
                 "ping_status": status,
                 "ping_response": None,
-                "ping_time": response_time,
-                "ping_error": str(e)
+                "ping_time": round(time.time() - start_time, 2),
+                "ping_connect_time": round(connect_time, 2) if connect_time is not None else None,
+                "ping_ttft": round(ttft, 2) if ttft is not None else None,
+                "ping_error": str(e) or type(e).__name__,
+                "rate_limits": rate_limits or _response_rate_limits(e),
+                "ping_probe": "completion"
             }
     
     def check_all_balances(self, include_ping_tests=False) -> List[Dict]:
         """Check balances of all DeepSeek API keys and Gemini status"""
-        # Use async version for parallel checks
-        return asyncio.run(self.check_all_balances_async(include_ping_tests))
+        # Sessions refreshing at the same moment share one in-flight fan-out
+        return _single_flight.do(
+            ("balances", id(self), include_ping_tests),
+            lambda: self._check_all_balances(include_ping_tests)
+        )
+    
+    def _check_all_balances(self, include_ping_tests: bool) -> List[Dict]:
+        # Runs on the shared background loop so pooled sessions stay warm between calls
+        results = run_async(self.check_all_balances_async(include_ping_tests))
+        _record_history(results)
+        return results
     
     async def check_all_balances_async(self, include_ping_tests=False) -> List[Dict]:
         """Async check balances of all DeepSeek API keys and Gemini status"""
@@ -609,16 +939,16 @@ class APIBalanceChecker:
         balance_tasks = []
         
         # Create tasks for DeepSeek balances
-        for i, key in enumerate(self.deepseek_keys, 1):
-            key_name = f"DeepSeek Key {i}"
-            task = self.check_deepseek_balance_async(key, key_name)
+        for key_name, key in self.deepseek_keys.items():
+            task = self._guarded("deepseek", key_name, "balance", self.check_deepseek_balance_async, key, key_name)
             balance_tasks.append((task, "deepseek", key_name))
         
-        # Create task for Gemini status
-        task = self.check_gemini_status_async(self.gemini_key)
-        balance_tasks.append((task, "gemini", "Google Gemini"))
+        # Create tasks for Gemini status
+        for key_name, key in self.gemini_keys.items():
+            task = self._guarded("gemini", key_name, "balance", self.check_gemini_status_async, key, key_name)
+            balance_tasks.append((task, "gemini", key_name))
         
-        # Execute all balance checks in parallel
+        # Execute all balance checks in parallel (bounded per provider)
         balance_coroutines = [task for task, _, _ in balance_tasks]
         balance_results_raw = await asyncio.gather(*balance_coroutines, return_exceptions=True)
         
@@ -645,68 +975,27 @@ class APIBalanceChecker:
             # Create empty ping results
             ping_results = []
         
-        # Merge balance and ping results
+        # Merge balance and ping results by service name
+        pings_by_service = {p.get("service"): p for p in ping_results}
+        not_tested = {"ping_status": "not_tested", "ping_time": 0, "ping_response": None}
         final_results = []
         for (balance_result, api_type, service_name) in balance_results:
-            if include_ping_tests:
-                # Find corresponding ping result
-                ping_result = next(
-                    (p for p in ping_results if p.get("service") == service_name),
-                    {"ping_status": "not_tested", "ping_time": 0, "ping_response": None}
-                )
-            else:
-                # No ping test performed
-                ping_result = {"ping_status": "not_tested", "ping_time": 0, "ping_response": None}
+            ping_result = pings_by_service.get(service_name, not_tested)
             
-            # Merge results
-            combined_result = {**balance_result, **ping_result}
+            # Merge results (with the key's breaker state and rate-limit headroom)
+            combined_result = {
+                **balance_result,
+                **ping_result,
+                "breaker": key_breaker_snapshot(service_name),
+                "rate_limits": get_rate_limits(service_name)
+            }
             final_results.append(self._format_result(combined_result, api_type=api_type))
         
         return final_results
     
     async def _ping_all_for_balance_check(self) -> List[Dict]:
         """Internal async method to run ping tests for balance check"""
-        tasks = []
-        
-        # Create tasks for DeepSeek keys
-        for i, key in enumerate(self.deepseek_keys, 1):
-            if key:
-                key_name = f"DeepSeek Key {i}"
-                task = self.ping_deepseek_api_async(key, key_name)
-                tasks.append((task, key_name))
-        
-        # Create task for Gemini
-        if self.gemini_key:
-            task = self.ping_gemini_api_async(self.gemini_key)
-            tasks.append((task, "Google Gemini"))
-        
-        if not tasks:
-            return []
-        
-        # Execute all tasks in parallel
-        coroutines = [task for task, _ in tasks]
-        results_raw = await asyncio.gather(*coroutines, return_exceptions=True)
-        
-        # Format results
-        results = []
-        for i, result in enumerate(results_raw):
-            _, service_name = tasks[i]
-            
-            if isinstance(result, Exception):
-                results.append({
-                    "service": service_name,
-                    "ping_status": "failed",
-                    "ping_error": str(result),
-                    "ping_time": 0,
-                    "ping_response": None
-                })
-            else:
-                results.append({
-                    "service": service_name,
-                    **result
-                })
-        
-        return results
+        return list(await asyncio.gather(*(_ping_one(*job) for job in _ping_jobs(self))))
     
     def _format_status(self, status: str) -> str:
         """Format status with emoji indicator"""
@@ -750,6 +1039,19 @@ class APIBalanceChecker:
         else:
             ping_display = "🔴 Failed"
         
+        # Circuit breaker state of the key
+        breaker = result.get("breaker") or {}
+        breaker_state = breaker.get("state", "closed")
+        if breaker_state == "open":
+            health_display = f"⏸️ Paused {breaker.get('check', '')} ({breaker.get('retry_in', 0)}s)"
+        elif breaker_state == "half_open":
+            health_display = "🟡 Probing"
+        else:
+            health_display = "🟢 OK"
+        
+        rate_limits = result.get("rate_limits")
+        rate_limit_columns = format_rate_limits(rate_limits)
+        
         if api_type == "deepseek":
             formatted = {
                 "Service": result.get("service", "Unknown"),
@@ -759,12 +1061,18 @@ class APIBalanceChecker:
                 "Granted": result.get("granted", "-"),
                 "Topped Up": result.get("topped_up", "-"),
                 "Ping Test": ping_display,
+                **rate_limit_columns,
+                "Health": health_display,
                 "_balance_value": result.get("balance_value", 0),  # Hidden field
                 "_api_type": "deepseek",  # Hidden field
                 "_raw_status": result.get("status", "unknown"),  # Hidden field for calculations
                 "_ping_status": ping_status,  # Hidden field
                 "_ping_time": ping_time,  # Hidden field
-                "_ping_response": ping_response  # Hidden field
+                "_ping_ttft": result.get("ping_ttft"),  # Hidden field
+                "_ping_connect_time": result.get("ping_connect_time"),  # Hidden field
+                "_ping_response": ping_response,  # Hidden field
+                "_breaker_state": breaker_state,  # Hidden field
+                "_rate_limits": rate_limits  # Hidden field - raw headroom for schedulers
             }
         else:  # gemini
             formatted = {
@@ -775,6 +1083,8 @@ class APIBalanceChecker:
                 "Granted": "N/A", 
                 "Topped Up": "N/A",
                 "Ping Test": ping_display,
+                **rate_limit_columns,
+                "Health": health_display,
                 "_balance_value": 0,  # Hidden field
                 "_api_type": "gemini",  # Hidden field
                 "_raw_status": result.get("status", "unknown"),  # Hidden field for calculations
@@ -783,7 +1093,11 @@ class APIBalanceChecker:
                 "_dashboard_url": result.get("dashboard_url", ""),  # Hidden field
                 "_ping_status": ping_status,  # Hidden field
                 "_ping_time": ping_time,  # Hidden field
-                "_ping_response": ping_response  # Hidden field
+                "_ping_ttft": result.get("ping_ttft"),  # Hidden field
+                "_ping_connect_time": result.get("ping_connect_time"),  # Hidden field
+                "_ping_response": ping_response,  # Hidden field
+                "_breaker_state": breaker_state,  # Hidden field
+                "_rate_limits": rate_limits  # Hidden field - raw headroom for schedulers
             }
         
         # Add error info if present
@@ -797,71 +1111,199 @@ class APIBalanceChecker:
         return formatted
 
 
-@st.cache_data(ttl=300)  # Cache for 5 minutes
+def format_rate_limits(rate_limits: Optional[Dict]) -> Dict[str, str]:
+    """Headroom columns for the keys table ("-" where the provider sent no headers)"""
+    rate_limits = rate_limits or {}
+    
+    def headroom(kind: str) -> str:
+        remaining = rate_limits.get(f"remaining_{kind}")
+        if remaining is None:
+            return "-"
+        limit = rate_limits.get(f"limit_{kind}")
+        return f"{remaining:,}/{limit:,}" if limit else f"{remaining:,}"
+    
+    # A 429's Retry-After wins, otherwise the soonest window reset
+    resets = [rate_limits[field] for field in RESET_FIELDS if rate_limits.get(field)]
+    reset_in = rate_limits.get("retry_after") or (min(resets) if resets else None)
+    
+    return {
+        "Requests Left": headroom("requests"),
+        "Tokens Left": headroom("tokens"),
+        "Limit Resets": f"{reset_in:.0f}s" if reset_in else "-"
+    }
+
+
+def _record_history(results: List[Dict]):
+    """Append checked balances to the time-series (never fails the check)"""
+    try:
+        history = get_balance_history()
+        if history:
+            history.record_results(results)
+    except Exception as e:
+        print(f"[ERROR] Failed to record balance history: {e}")
+
+
+_checker: Optional[APIBalanceChecker] = None
+_checker_lock = threading.Lock()
+
+
+def get_checker() -> APIBalanceChecker:
+    """Process-wide checker whose pooled sessions survive Streamlit reruns"""
+    global _checker
+    with _checker_lock:
+        if _checker is None:
+            _checker = APIBalanceChecker()
+        return _checker
+
+
+def shutdown():
+    """Close pooled sessions and stop the background loop"""
+    global _checker
+    with _checker_lock:
+        checker, _checker = _checker, None
+    if checker is not None:
+        try:
+            run_async(checker.close(), timeout=5)
+        except Exception:
+            pass
+    _background_loop.stop()
+
+
+atexit.register(shutdown)
+
+
 def get_cached_balances(include_ping_tests=False):
-    """Get cached API balances"""
-    checker = APIBalanceChecker()
-    return checker.check_all_balances(include_ping_tests=include_ping_tests)
+    """Get cached API balances (shared across processes with CACHE_BACKEND=sqlite)"""
+    return get_cache_backend().get_or_load(
+        f"balances:{include_ping_tests}",
+        BALANCES_CACHE_TTL,
+        lambda: get_checker().check_all_balances(include_ping_tests=include_ping_tests)
+    )
 
 
-async def ping_all_apis_async():
-    """Perform ping tests using asyncio for true parallel execution"""
-    checker = APIBalanceChecker()
-    tasks = []
+def invalidate_cached_balances():
+    """Drop cached balances so the next call checks the providers again"""
+    backend = get_cache_backend()
+    for include_ping_tests in (False, True):
+        backend.safely(backend.delete, f"balances:{include_ping_tests}")
+
+
+def _ping_jobs(checker: APIBalanceChecker) -> List[Tuple]:
+    """(service name, type, coroutine factory) for every configured key"""
+    jobs = []
     
-    # Create tasks for DeepSeek keys
-    for i, key in enumerate(checker.deepseek_keys, 1):
+    # DeepSeek keys
+    for key_name, key in checker.deepseek_keys.items():
         if key:  # Only add configured keys
-            key_name = f"DeepSeek Key {i}"
-            task = checker.ping_deepseek_api_async(key, key_name)
-            tasks.append((task, key_name, "DeepSeek"))
-    
-    # Create task for Gemini
-    if checker.gemini_key:
-        task = checker.ping_gemini_api_async(checker.gemini_key)
-        tasks.append((task, "Google Gemini", "Gemini"))
-    
-    # Execute all tasks in parallel
-    if tasks:
-        # Extract just the coroutines for gather
-        coroutines = [task for task, _, _ in tasks]
-        
-        # Run all tasks concurrently
-        results_raw = await asyncio.gather(*coroutines, return_exceptions=True)
-        
-        # Format results with service names
-        results = []
-        for i, result in enumerate(results_raw):
-            _, service_name, service_type = tasks[i]
-            
-            if isinstance(result, Exception):
-                # Handle exceptions
-                results.append({
-                    "service": service_name,
-                    "type": service_type,
-                    "ping_status": "failed",
-                    "ping_error": str(result),
-                    "ping_time": 0,
-                    "ping_response": None
-                })
-            else:
-                # Add service info to result
-                results.append({
-                    "service": service_name,
-                    "type": service_type,
-                    **result
-                })
-    else:
-        results = []
+            jobs.append((key_name, "DeepSeek", lambda key=key, key_name=key_name: checker._guarded(
+                "deepseek", key_name, "ping", checker.ping_deepseek_api_async, key, key_name
+            )))
+    
+    # Gemini keys
+    for key_name, key in checker.gemini_keys.items():
+        if key:
+            jobs.append((key_name, "Gemini", lambda key=key, key_name=key_name: checker._guarded(
+                "gemini", key_name, "ping", checker.ping_gemini_api_async, key
+            )))
+    
+    return jobs
+
+
+async def _ping_one(service_name: str, service_type: str, make_ping) -> Dict:
+    """Run one ping and label (and record) its result"""
+    try:
+        result = {
+            "service": service_name,
+            "type": service_type,
+            **await make_ping()
+        }
+    except Exception as e:
+        result = {
+            "service": service_name,
+            "type": service_type,
+            "ping_status": "failed",
+            "ping_error": str(e),
+            "ping_time": 0,
+            "ping_response": None
+        }
     
-    return results
+    record_ping(service_name, service_type, result)
+    return result
+
+
+async def ping_all_apis_async():
+    """Perform ping tests using asyncio for true parallel execution"""
+    jobs = _ping_jobs(get_checker())
+    return list(await asyncio.gather(*(_ping_one(*job) for job in jobs)))
 
 
 def ping_all_apis():
-    """Wrapper to call async function from sync Streamlit context"""
-    # nest_asyncio already applied at module level
-    # Simply use asyncio.run which creates a new event loop
-    return asyncio.run(ping_all_apis_async())
+    """Ping every key and return the results in key order (joins a round already in flight)"""
+    results = {result["service"]: result for result in iter_ping_results()}
+    return [results[name] for name, _, _ in _ping_jobs(get_checker()) if name in results]
+
+
+class _PingRound:
+    """One in-flight round of pings, shared by every consumer that joins it"""
+    
+    def __init__(self, jobs: List[Tuple]):
+        self.futures = {_background_loop.submit(_ping_one(*job)): job for job in jobs}
+        self.consumers = 0
+    
+    def running(self) -> bool:
+        return not all(future.done() for future in self.futures)
+
+
+_ping_round: Optional[_PingRound] = None
+_ping_round_lock = threading.Lock()
+
+
+def _join_ping_round() -> _PingRound:
+    """Join the running round of pings, or start one if none is in flight"""
+    global _ping_round
+    with _ping_round_lock:
+        if _ping_round is None or not _ping_round.running():
+            _ping_round = _PingRound(_ping_jobs(get_checker()))
+        _ping_round.consumers += 1
+        return _ping_round
+
+
+def _leave_ping_round(ping_round: _PingRound):
+    """Drop a consumer - the last one out cancels pings nobody waits for anymore"""
+    with _ping_round_lock:
+        ping_round.consumers -= 1
+        if ping_round.consumers == 0:
+            for future in ping_round.futures:
+                future.cancel()
+
+
+def iter_ping_results(timeout: Optional[float] = ASYNC_CALL_TIMEOUT):
+    """
+    Yield each key's ping result as soon as it arrives (fastest first).
+    Callers arriving while a round is in flight share it instead of pinging again.
+    """
+    ping_round = _join_ping_round()
+    futures = ping_round.futures
+    
+    pending = set(futures)
+    try:
+        for future in concurrent.futures.as_completed(futures, timeout=timeout):
+            pending.discard(future)
+            # Every consumer gets its own copy of the shared result
+            yield copy.deepcopy(future.result())
+    except concurrent.futures.TimeoutError:
+        for future in pending:
+            service_name, service_type, _ = futures[future]
+            yield {
+                "service": service_name,
+                "type": service_type,
+                "ping_status": "timeout",
+                "ping_error": f"No result after {timeout}s",
+                "ping_time": 0,
+                "ping_response": None
+            }
+    finally:
+        _leave_ping_round(ping_round)
 
 
 def get_status_color(status: str) -> str:
@@ -0,0 +1,237 @@
+"""
+Balance history
+Records every DeepSeek balance check into a local SQLite time-series (fixed-size
+ring buffer per key plus hourly downsampled rows) and derives burn rate and runway.
+"""
+
+import os
+import sqlite3
+import time
+from typing import Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# History location - set to an empty string to disable recording
+BALANCE_HISTORY_DB_PATH = os.getenv("BALANCE_HISTORY_DB_PATH", "balance_history.db")
+# Raw samples kept per key (ring buffer slots)
+BALANCE_HISTORY_RING_SIZE = int(os.getenv("BALANCE_HISTORY_RING_SIZE", "288"))
+# Days of hourly downsampled history kept
+BALANCE_HISTORY_RETENTION_DAYS = int(os.getenv("BALANCE_HISTORY_RETENTION_DAYS", "90"))
+# Window the burn rate is averaged over (hours)
+BALANCE_BURN_WINDOW_HOURS = float(os.getenv("BALANCE_BURN_WINDOW_HOURS", "24"))
+# Minimum observed time before a burn rate is reported (hours)
+BALANCE_BURN_MIN_HOURS = float(os.getenv("BALANCE_BURN_MIN_HOURS", "0.5"))
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS balance_keys (
+        key TEXT PRIMARY KEY,
+        writes INTEGER NOT NULL,
+        first_ts REAL NOT NULL,
+        last_ts REAL NOT NULL,
+        last_balance REAL NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS balance_ring (
+        key TEXT NOT NULL,
+        slot INTEGER NOT NULL,
+        ts REAL NOT NULL,
+        balance REAL NOT NULL,
+        PRIMARY KEY (key, slot)
+    );
+    CREATE TABLE IF NOT EXISTS balance_hourly (
+        key TEXT NOT NULL,
+        hour INTEGER NOT NULL,
+        samples INTEGER NOT NULL,
+        balance_min REAL NOT NULL,
+        balance_max REAL NOT NULL,
+        balance_last REAL NOT NULL,
+        spend REAL NOT NULL,
+        PRIMARY KEY (key, hour)
+    );
+"""
+
+# Hourly rows are upserted: min/max/last track the balance, spend accumulates drops
+UPSERT_HOURLY_QUERY = """
+    INSERT INTO balance_hourly (key, hour, samples, balance_min, balance_max, balance_last, spend)
+    VALUES (:key, :hour, 1, :balance, :balance, :balance, :spend)
+    ON CONFLICT (key, hour) DO UPDATE SET
+        samples = samples + 1,
+        balance_min = MIN(balance_min, excluded.balance_min),
+        balance_max = MAX(balance_max, excluded.balance_max),
+        balance_last = excluded.balance_last,
+        spend = spend + excluded.spend
+"""
+
+# Keys not checked within the window (rotated or removed) are left out
+BURN_QUERY = """
+    SELECT k.key, k.first_ts, k.last_ts, k.last_balance, COALESCE(SUM(h.spend), 0)
+    FROM balance_keys k
+    LEFT JOIN balance_hourly h ON h.key = k.key AND h.hour >= :window_hour
+    WHERE k.last_ts >= :window_start
+    GROUP BY k.key
+    ORDER BY k.key
+"""
+
+
+class BalanceHistory:
+    """SQLite-backed balance time-series"""
+
+    def __init__(self, path: str, ring_size: int = BALANCE_HISTORY_RING_SIZE,
+                 retention_days: int = BALANCE_HISTORY_RETENTION_DAYS):
+        self.path = path
+        self.ring_size = ring_size
+        self.retention_days = retention_days
+        conn = self._connect()
+        try:
+            conn.executescript(SCHEMA)
+        finally:
+            conn.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=5)
+        # Page renders read while the collector writes
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def record(self, key: str, balance: float, ts: Optional[float] = None):
+        """Append one balance sample for a key"""
+        ts = time.time() if ts is None else ts
+        conn = self._connect()
+        try:
+            with conn:
+                row = conn.execute(
+                    "SELECT writes, last_balance FROM balance_keys WHERE key = ?", (key,)
+                ).fetchone()
+                writes, last_balance = row if row else (0, balance)
+
+                # Only drops count as spend - increases are top-ups
+                spend = max(0.0, last_balance - balance)
+
+                conn.execute(
+                    "INSERT OR REPLACE INTO balance_ring (key, slot, ts, balance) VALUES (?, ?, ?, ?)",
+                    (key, writes % self.ring_size, ts, balance)
+                )
+                conn.execute(UPSERT_HOURLY_QUERY, {
+                    "key": key, "hour": int(ts // 3600), "balance": balance, "spend": spend
+                })
+                conn.execute(
+                    """
+                    INSERT INTO balance_keys (key, writes, first_ts, last_ts, last_balance)
+                    VALUES (?, 1, ?, ?, ?)
+                    ON CONFLICT (key) DO UPDATE SET
+                        writes = writes + 1, last_ts = excluded.last_ts, last_balance = excluded.last_balance
+                    """,
+                    (key, ts, ts, balance)
+                )
+                conn.execute(
+                    "DELETE FROM balance_hourly WHERE hour < ?",
+                    (int(ts // 3600) - self.retention_days * 24,)
+                )
+        finally:
+            conn.close()
+
+    def record_results(self, results: List[Dict], ts: Optional[float] = None):
+        """Record the DeepSeek rows of a formatted balance check"""
+        for result in results:
+            # Failed checks report a zero balance, don't mistake that for spend
+            if result.get("_api_type") == "deepseek" and result.get("_raw_status") in ("active", "insufficient"):
+                self.record(result["Service"], float(result.get("_balance_value", 0)), ts)
+
+    def recent(self, key: str) -> List[Tuple[float, float]]:
+        """Raw (ts, balance) samples still in the key's ring buffer, oldest first"""
+        conn = self._connect()
+        try:
+            return conn.execute(
+                "SELECT ts, balance FROM balance_ring WHERE key = ? ORDER BY ts", (key,)
+            ).fetchall()
+        finally:
+            conn.close()
+
+    def hourly(self, since_hours: Optional[float] = None) -> List[Dict]:
+        """Downsampled history of all keys, oldest first"""
+        min_hour = int((time.time() - since_hours * 3600) // 3600) if since_hours else 0
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                """
+                SELECT key, hour, samples, balance_min, balance_max, balance_last, spend
+                FROM balance_hourly WHERE hour >= ? ORDER BY hour, key
+                """,
+                (min_hour,)
+            ).fetchall()
+        finally:
+            conn.close()
+
+        return [
+            {
+                "key": key,
+                "hour": hour * 3600,
+                "samples": samples,
+                "balance_min": balance_min,
+                "balance_max": balance_max,
+                "balance": balance_last,
+                "spend": spend
+            }
+            for key, hour, samples, balance_min, balance_max, balance_last, spend in rows
+        ]
+
+    def burn_rates(self, window_hours: float = BALANCE_BURN_WINDOW_HOURS) -> Dict[str, Dict]:
+        """Per-key spend over the window, hourly burn rate and runway (keys checked within it)"""
+        now = time.time()
+        window_start = now - window_hours * 3600
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                BURN_QUERY, {"window_hour": int(window_start // 3600), "window_start": window_start}
+            ).fetchall()
+        finally:
+            conn.close()
+
+        rates = {}
+        for key, first_ts, last_ts, balance, spend in rows:
+            # Average over the part of the window we actually observed
+            observed_hours = (now - max(window_start, first_ts)) / 3600
+            rate = spend / observed_hours if observed_hours >= BALANCE_BURN_MIN_HOURS else None
+            rates[key] = {
+                "balance": balance,
+                "spend": spend,
+                "observed_hours": observed_hours,
+                "rate_per_hour": rate,
+                "runway_hours": runway_hours(balance, rate),
+                "last_ts": last_ts
+            }
+        return rates
+
+
+def runway_hours(balance: float, rate_per_hour: Optional[float]) -> Optional[float]:
+    """Hours until the balance runs out at the given rate (None if not draining)"""
+    if not rate_per_hour:
+        return None
+    return balance / rate_per_hour
+
+
+def total_burn(rates: Dict[str, Dict]) -> Dict:
+    """Combined balance, burn rate and runway over all keys"""
+    known = [rate["rate_per_hour"] for rate in rates.values() if rate["rate_per_hour"] is not None]
+    balance = sum(rate["balance"] for rate in rates.values())
+    rate = sum(known) if known else None
+    return {
+        "balance": balance,
+        "spend": sum(rate["spend"] for rate in rates.values()),
+        "rate_per_hour": rate,
+        "runway_hours": runway_hours(balance, rate)
+    }
+
+
+_history: Optional[BalanceHistory] = None
+
+
+def get_balance_history() -> Optional[BalanceHistory]:
+    """Shared history, or None when BALANCE_HISTORY_DB_PATH is empty"""
+    global _history
+    if not BALANCE_HISTORY_DB_PATH:
+        return None
+    if _history is None:
+        _history = BalanceHistory(BALANCE_HISTORY_DB_PATH)
+    return _history
@@ -0,0 +1,209 @@
+"""
+Provider key benchmark
+Ramps concurrency per key and reports requests/s, latency percentiles, tokens/s
+and the concurrency level at which the provider starts answering 429.
+
+Usage:
+    python -m utils.benchmark                                  # every configured key
+    python -m utils.benchmark --provider deepseek --levels 1 2 4 8 16
+    python -m utils.benchmark --key "DeepSeek Key 2" --requests 40 --output key2.json
+    python -m utils.benchmark --compare previous.json
+"""
+
+import argparse
+import asyncio
+import json
+import sys
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+
+import litellm
+
+from utils.api_monitors import (
+    APIBalanceChecker, DEEPSEEK_MODEL, GEMINI_MODEL, LLM_API_BASES, PING_MESSAGES, PING_TIMEOUT
+)
+from utils.latency import LatencyHistogram
+
+PROVIDER_MODELS = {
+    "deepseek": DEEPSEEK_MODEL,
+    "gemini": GEMINI_MODEL
+}
+
+DEFAULT_LEVELS = [1, 2, 4, 8, 16]
+
+
+def _is_rate_limited(error: Exception) -> bool:
+    error_str = str(error).lower()
+    return isinstance(error, litellm.RateLimitError) or "429" in error_str or "rate limit" in error_str
+
+
+async def _request(model: str, api_key: str, max_tokens: int) -> Dict:
+    """One timed completion: latency, completion tokens and outcome"""
+    start = time.perf_counter()
+    try:
+        response = await litellm.acompletion(
+            model=model,
+            api_base=LLM_API_BASES.get(model),
+            messages=PING_MESSAGES,
+            api_key=api_key,
+            max_tokens=max_tokens,
+            timeout=PING_TIMEOUT
+        )
+        usage = getattr(response, "usage", None)
+        return {
+            "ok": True,
+            "latency": time.perf_counter() - start,
+            "tokens": getattr(usage, "completion_tokens", 0) or 0
+        }
+    except Exception as e:
+        return {
+            "ok": False,
+            "latency": time.perf_counter() - start,
+            "tokens": 0,
+            "rate_limited": _is_rate_limited(e),
+            "error": str(e)[:200]
+        }
+
+
+async def run_level(model: str, api_key: str, concurrency: int, requests: int, max_tokens: int) -> Dict:
+    """Send `requests` completions with at most `concurrency` in flight"""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def limited():
+        async with semaphore:
+            return await _request(model, api_key, max_tokens)
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(limited() for _ in range(requests)))
+    elapsed = time.perf_counter() - start
+
+    histogram = LatencyHistogram()
+    for result in results:
+        if result["ok"]:
+            histogram.record(result["latency"] * 1000)
+        else:
+            histogram.record_error()
+
+    ok = [result for result in results if result["ok"]]
+    errors = [result["error"] for result in results if not result["ok"]]
+    p50, p99 = histogram.percentile(0.50), histogram.percentile(0.99)
+    return {
+        "concurrency": concurrency,
+        "requests": requests,
+        "ok": len(ok),
+        "errors": len(errors),
+        "rate_limited": sum(1 for result in results if result.get("rate_limited")),
+        "elapsed_s": round(elapsed, 3),
+        "requests_per_s": round(len(ok) / elapsed, 3) if elapsed else 0,
+        "tokens_per_s": round(sum(result["tokens"] for result in ok) / elapsed, 2) if elapsed else 0,
+        "p50_ms": round(p50, 1) if p50 is not None else None,
+        "p99_ms": round(p99, 1) if p99 is not None else None,
+        "sample_error": errors[0] if errors else None
+    }
+
+
+async def benchmark_key(provider: str, key_name: str, api_key: str, levels: List[int],
+                        requests_per_level: Optional[int], max_tokens: int, stop_on_429: bool = True) -> Dict:
+    """Ramp through the concurrency levels for one key"""
+    model = PROVIDER_MODELS[provider]
+    result = {"service": key_name, "provider": provider, "model": model, "levels": [], "rate_limit_concurrency": None}
+
+    for concurrency in levels:
+        # Enough requests that every level runs a few full waves
+        requests = requests_per_level or concurrency * 4
+        level = await run_level(model, api_key, concurrency, requests, max_tokens)
+        result["levels"].append(level)
+        print(
+            f"[OK] {key_name} c={concurrency}: {level['requests_per_s']} req/s, "
+            f"p50 {level['p50_ms']}ms, p99 {level['p99_ms']}ms, {level['tokens_per_s']} tok/s, "
+            f"{level['errors']} errors ({level['rate_limited']} x 429)"
+        )
+
+        if level["rate_limited"]:
+            result["rate_limit_concurrency"] = concurrency
+            if stop_on_429:
+                break
+
+    return result
+
+
+def _configured_keys(providers: List[str], only: Optional[List[str]]) -> List[tuple]:
+    checker = APIBalanceChecker()
+    keys = {"deepseek": checker.deepseek_keys, "gemini": checker.gemini_keys}
+    return [
+        (provider, key_name, api_key)
+        for provider in providers
+        for key_name, api_key in keys[provider].items()
+        if api_key and (not only or key_name in only)
+    ]
+
+
+def compare(current: Dict, previous: Dict):
+    """Print requests/s and p99 changes per key and level against an earlier run"""
+    previous_levels = {
+        (key["service"], level["concurrency"]): level
+        for key in previous.get("keys", [])
+        for level in key["levels"]
+    }
+    print(f"\nCompared with run of {previous.get('started_at')}:")
+    for key in current["keys"]:
+        for level in key["levels"]:
+            before = previous_levels.get((key["service"], level["concurrency"]))
+            if not before:
+                continue
+            print(
+                f"  {key['service']} c={level['concurrency']}: "
+                f"{before['requests_per_s']} -> {level['requests_per_s']} req/s, "
+                f"p99 {before['p99_ms']} -> {level['p99_ms']} ms"
+            )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark provider keys under increasing concurrency")
+    parser.add_argument("--provider", action="append", choices=list(PROVIDER_MODELS),
+                        help="Limit to a provider (repeatable, default: all)")
+    parser.add_argument("--key", action="append", help="Limit to a key by service name (repeatable)")
+    parser.add_argument("--levels", type=int, nargs="+", default=DEFAULT_LEVELS,
+                        help="Concurrency levels to ramp through")
+    parser.add_argument("--requests", type=int, default=None,
+                        help="Requests per level (default: 4 x concurrency)")
+    parser.add_argument("--max-tokens", type=int, default=32, help="Completion tokens per request")
+    parser.add_argument("--no-stop", action="store_true", help="Keep ramping after the first 429")
+    parser.add_argument("--output", help="JSON result file (default: benchmark_<timestamp>.json)")
+    parser.add_argument("--compare", help="Earlier result file to compare against")
+    args = parser.parse_args()
+
+    keys = _configured_keys(args.provider or list(PROVIDER_MODELS), args.key)
+    if not keys:
+        print("[ERROR] No configured keys to benchmark")
+        sys.exit(2)
+
+    started_at = datetime.now()
+    report = {
+        "started_at": started_at.isoformat(timespec="seconds"),
+        "levels": args.levels,
+        "max_tokens": args.max_tokens,
+        "keys": []
+    }
+
+    async def run_all():
+        for provider, key_name, api_key in keys:
+            report["keys"].append(await benchmark_key(
+                provider, key_name, api_key, args.levels, args.requests, args.max_tokens, not args.no_stop
+            ))
+
+    asyncio.run(run_all())
+
+    output = args.output or f"benchmark_{started_at.strftime('%Y%m%d_%H%M%S')}.json"
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            compare(report, json.load(f))
+
+
+if __name__ == "__main__":
+    main()
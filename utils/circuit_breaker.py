@@ -0,0 +1,136 @@
+"""
+Per-key circuit breakers
+Stops balance checks and pings against keys that are invalid, rate limited or
+timing out, and retries them with exponential backoff.
+"""
+
+import os
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# First backoff (seconds) per failure kind, doubled on every consecutive failure
+BREAKER_BACKOFF = {
+    "invalid_key": float(os.getenv("BREAKER_INVALID_KEY_BACKOFF", "600")),
+    "quota_exceeded": float(os.getenv("BREAKER_QUOTA_BACKOFF", "120")),
+    "timeout": float(os.getenv("BREAKER_TIMEOUT_BACKOFF", "30"))
+}
+# Upper bound of the backoff (seconds)
+BREAKER_MAX_BACKOFF = float(os.getenv("BREAKER_MAX_BACKOFF", "3600"))
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+# Checks with a breaker of their own per key - a passing balance check must not
+# reset the backoff of pings that keep failing, and vice versa
+CHECKS = ("balance", "ping")
+
+# HTTP errors of the balance/status endpoints that mean the same as ping statuses
+_HTTP_FAILURES = {
+    "HTTP 401": "invalid_key",
+    "HTTP 403": "invalid_key",
+    "HTTP 429": "quota_exceeded"
+}
+
+
+def failure_kind(result: Dict) -> Optional[str]:
+    """Failure kind that should trip the breaker, None if the result doesn't"""
+    for status in (result.get("status"), result.get("ping_status")):
+        if status in BREAKER_BACKOFF:
+            return status
+    if result.get("status") == "error":
+        error = result.get("error") or ""
+        if error == "Request timeout":
+            return "timeout"
+        return _HTTP_FAILURES.get(error)
+    return None
+
+
+class CircuitBreaker:
+    """closed -> open (backoff) -> half_open (one probe) -> closed or open again"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.state = CLOSED
+        self.failures = 0
+        self.last_failure: Optional[str] = None
+        self.open_until = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """Whether a request may go out now (claims the probe when half-open)"""
+        with self._lock:
+            if self.state == OPEN and time.time() >= self.open_until:
+                self.state = HALF_OPEN
+            if self.state == HALF_OPEN:
+                if self._probing:
+                    return False
+                self._probing = True
+                return True
+            return self.state == CLOSED
+
+    def record(self, kind: Optional[str]):
+        """Record a finished request: its failure kind, or None if it didn't trip"""
+        with self._lock:
+            self._probing = False
+            if kind is None:
+                self.state = CLOSED
+                self.failures = 0
+                self.last_failure = None
+                return
+
+            self.failures += 1
+            self.last_failure = kind
+            backoff = BREAKER_BACKOFF[kind] * 2 ** min(self.failures - 1, 16)
+            self.open_until = time.time() + min(backoff, BREAKER_MAX_BACKOFF)
+            self.state = OPEN
+
+    def release(self):
+        """Give the probe back after a request that never completed"""
+        with self._lock:
+            self._probing = False
+
+    def retry_in(self) -> float:
+        return max(0.0, self.open_until - time.time()) if self.state == OPEN else 0.0
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {
+                "state": self.state,
+                "failures": self.failures,
+                "last_failure": self.last_failure,
+                "retry_in": round(self.retry_in())
+            }
+
+
+_breakers: Dict[Tuple[str, str], CircuitBreaker] = {}
+_breakers_lock = threading.Lock()
+
+# How restrictive each state is, to show the worst of a key's checks
+_STATE_SEVERITY = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+def get_breaker(name: str, check: str) -> CircuitBreaker:
+    """Process-wide breaker of one check ("balance" / "ping") of a key (by service name)"""
+    with _breakers_lock:
+        if (name, check) not in _breakers:
+            _breakers[(name, check)] = CircuitBreaker(f"{name} {check}")
+        return _breakers[(name, check)]
+
+
+def key_breaker_snapshot(name: str) -> Dict:
+    """State of the key's most restricted check, for display"""
+    snapshots = [dict(get_breaker(name, check).snapshot(), check=check) for check in CHECKS]
+    return max(snapshots, key=lambda snapshot: (_STATE_SEVERITY[snapshot["state"]], snapshot["retry_in"]))
+
+
+def reset_breakers():
+    """Close every breaker (e.g. after keys were rotated)"""
+    with _breakers_lock:
+        _breakers.clear()
@@ -0,0 +1,87 @@
+"""
+Background snapshot collector
+Gathers Processing stats and API balances into the snapshot store so pages
+only read the latest snapshot instead of querying upstream on every render.
+
+Usage:
+    SNAPSHOT_DB_PATH=snapshots.db python -m utils.collector            # run forever
+    SNAPSHOT_DB_PATH=snapshots.db python -m utils.collector --once     # single pass
+"""
+
+import argparse
+import os
+import sys
+import time
+from typing import Callable
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Seconds between collection passes
+COLLECTOR_INTERVAL = float(os.getenv("COLLECTOR_INTERVAL", "60"))
+
+PROCESSING_SNAPSHOT = "processing"
+BALANCES_SNAPSHOT = "balances"
+
+
+def collect_processing() -> dict:
+    """Fresh stats for every registered source"""
+    from utils.processing_stats import fetch_all_platforms
+    return fetch_all_platforms(refresh=True)
+
+
+def collect_balances() -> list:
+    """Balance/status check of every configured API key (no ping tests)"""
+    from utils.api_monitors import get_checker
+    return get_checker().check_all_balances(include_ping_tests=False)
+
+
+COLLECTORS = {
+    PROCESSING_SNAPSHOT: collect_processing,
+    BALANCES_SNAPSHOT: collect_balances,
+}
+
+
+def _collect(store, kind: str, collect: Callable) -> bool:
+    start = time.time()
+    try:
+        store.save(kind, collect())
+        print(f"[OK] {kind}: collected in {time.time() - start:.2f}s")
+        return True
+    except Exception as e:
+        print(f"[ERROR] {kind}: collection failed: {e}")
+        return False
+
+
+def run_once(store) -> bool:
+    """Collect every snapshot kind once, returns False if any failed"""
+    results = [_collect(store, kind, collect) for kind, collect in COLLECTORS.items()]
+    return all(results)
+
+
+def main():
+    from utils.snapshot_store import SNAPSHOT_DB_PATH, get_snapshot_store
+
+    parser = argparse.ArgumentParser(description="Collect dashboard snapshots")
+    parser.add_argument("--once", action="store_true", help="Collect once and exit")
+    parser.add_argument("--interval", type=float, default=COLLECTOR_INTERVAL,
+                        help="Seconds between passes")
+    args = parser.parse_args()
+
+    store = get_snapshot_store()
+    if store is None:
+        print("[ERROR] SNAPSHOT_DB_PATH is not set")
+        sys.exit(2)
+
+    print(f"Collecting into {SNAPSHOT_DB_PATH}")
+    while True:
+        started = time.time()
+        ok = run_once(store)
+        if args.once:
+            sys.exit(0 if ok else 1)
+        time.sleep(max(0, args.interval - (time.time() - started)))
+
+
+if __name__ == "__main__":
+    main()
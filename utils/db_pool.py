@@ -0,0 +1,187 @@
+"""
+PostgreSQL connection pooling
+Process-wide pools (one per database URL) shared by all Streamlit sessions
+"""
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional, Tuple
+
+import psycopg2
+from psycopg2 import pool
+from psycopg2.extensions import QueryCanceledError
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Pool configuration
+DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", "1"))
+DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", "5"))
+DB_POOL_CHECKOUT_TIMEOUT = float(os.getenv("DB_POOL_CHECKOUT_TIMEOUT", "10"))
+# Idle connections older than this are pinged before being handed out
+DB_POOL_HEALTHCHECK_INTERVAL = float(os.getenv("DB_POOL_HEALTHCHECK_INTERVAL", "30"))
+# Default timeouts for new connections (per-source values override these)
+DB_CONNECT_TIMEOUT = int(os.getenv("DB_CONNECT_TIMEOUT", "5"))
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "10000"))
+
+# Errors that mean the connection itself is unusable
+CONNECTION_ERRORS = (psycopg2.OperationalError, psycopg2.InterfaceError)
+
+
+class ConnectionPool:
+    """Thread-safe pool with blocking checkout and health checks"""
+
+    def __init__(self, database_url: str, min_size: int = DB_POOL_MIN_SIZE,
+                 max_size: int = DB_POOL_MAX_SIZE, connect_timeout: int = DB_CONNECT_TIMEOUT,
+                 statement_timeout_ms: int = DB_STATEMENT_TIMEOUT_MS):
+        """Create the underlying psycopg2 pool for a database URL"""
+        self.database_url = database_url
+        self.max_size = max_size
+        # Timeouts are baked into each connection so queries need no extra SET round trip
+        self._pool = pool.ThreadedConnectionPool(
+            min_size,
+            max_size,
+            database_url,
+            connect_timeout=connect_timeout,
+            options=f"-c statement_timeout={statement_timeout_ms}"
+        )
+        # psycopg2 raises instead of waiting when exhausted, so gate checkouts
+        self._slots = threading.BoundedSemaphore(max_size)
+        self._last_used: Dict[int, float] = {}
+
+    @property
+    def closed(self) -> bool:
+        return self._pool.closed
+
+    def _is_healthy(self, conn) -> bool:
+        """Check that a pooled connection is still alive"""
+        if conn.closed:
+            return False
+
+        last_used = self._last_used.get(id(conn))
+        if last_used is None or time.monotonic() - last_used < DB_POOL_HEALTHCHECK_INTERVAL:
+            # Freshly opened or recently used
+            return True
+
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            return True
+        except CONNECTION_ERRORS:
+            return False
+
+    def checkout(self):
+        """Take a healthy connection from the pool, reconnecting if needed"""
+        if not self._slots.acquire(timeout=DB_POOL_CHECKOUT_TIMEOUT):
+            raise pool.PoolError(
+                f"Connection pool exhausted (waited {DB_POOL_CHECKOUT_TIMEOUT}s)"
+            )
+
+        try:
+            # Every pooled connection may be dead after a server restart
+            for _ in range(self.max_size + 1):
+                conn = self._pool.getconn()
+                if conn.autocommit is False:
+                    # Read-only stats queries - avoid idle-in-transaction sessions
+                    conn.autocommit = True
+                if self._is_healthy(conn):
+                    return conn
+                self._discard(conn)
+            raise psycopg2.OperationalError("Could not obtain a healthy connection")
+        except Exception:
+            self._slots.release()
+            raise
+
+    def checkin(self, conn, broken: bool = False):
+        """Return a connection to the pool (closing it if broken)"""
+        try:
+            if broken or conn.closed:
+                self._discard(conn)
+            else:
+                self._last_used[id(conn)] = time.monotonic()
+                self._pool.putconn(conn)
+        finally:
+            self._slots.release()
+
+    def _discard(self, conn):
+        """Close a connection and drop it from the pool"""
+        self._last_used.pop(id(conn), None)
+        try:
+            self._pool.putconn(conn, close=True)
+        except pool.PoolError:
+            pass
+
+    @contextmanager
+    def connection(self) -> Iterator:
+        """Context manager that checks a connection out and back in"""
+        conn = self.checkout()
+        try:
+            yield conn
+        except CONNECTION_ERRORS as e:
+            # A cancelled or timed-out statement leaves the connection usable
+            self.checkin(conn, broken=not isinstance(e, QueryCanceledError))
+            raise
+        except BaseException:
+            self.checkin(conn)
+            raise
+        else:
+            self.checkin(conn)
+
+    def close(self):
+        """Close all connections in the pool"""
+        self._last_used.clear()
+        self._pool.closeall()
+
+
+# (database URL, connect timeout, statement timeout) -> pool
+_pools: Dict[Tuple[str, int, int], ConnectionPool] = {}
+_pools_lock = threading.Lock()
+# Per-pool creation locks - opening one database's connections never blocks the others
+_pool_locks: Dict[Tuple[str, int, int], threading.Lock] = {}
+
+
+def get_pool(database_url: str, connect_timeout: Optional[int] = None,
+             statement_timeout_ms: Optional[int] = None) -> ConnectionPool:
+    """Get (or lazily create) the process-wide pool for a database URL and timeouts"""
+    if not database_url:
+        raise ValueError("Database URL is not configured")
+
+    key = (
+        database_url,
+        connect_timeout or DB_CONNECT_TIMEOUT,
+        statement_timeout_ms or DB_STATEMENT_TIMEOUT_MS
+    )
+    db_pool = _pools.get(key)
+    if db_pool is None or db_pool.closed:
+        with _pools_lock:
+            pool_lock = _pool_locks.setdefault(key, threading.Lock())
+        with pool_lock:
+            db_pool = _pools.get(key)
+            if db_pool is None or db_pool.closed:
+                # Opens min_size connections - up to connect_timeout for an unreachable database
+                db_pool = ConnectionPool(
+                    database_url,
+                    connect_timeout=key[1],
+                    statement_timeout_ms=key[2]
+                )
+                with _pools_lock:
+                    _pools[key] = db_pool
+    return db_pool
+
+
+@contextmanager
+def get_connection(database_url: str, connect_timeout: Optional[int] = None,
+                   statement_timeout_ms: Optional[int] = None) -> Iterator:
+    """Borrow a pooled connection for the given database URL"""
+    with get_pool(database_url, connect_timeout, statement_timeout_ms).connection() as conn:
+        yield conn
+
+
+def close_all_pools():
+    """Close every pool (e.g. on shutdown)"""
+    with _pools_lock:
+        for db_pool in _pools.values():
+            db_pool.close()
+        _pools.clear()
@@ -0,0 +1,303 @@
+"""
+Key-pool router
+Picks the API key for each production request from the monitor's data
+(balance, status, ping latency, rate-limit headroom) plus live feedback from
+the requests themselves. Importable by workers without Streamlit.
+
+Usage:
+    router = KeyRouter(checker.deepseek_keys)
+    router.update(checker.check_all_balances())  # or a collector snapshot payload
+    with router.lease() as lease:
+        response = call_provider(api_key=lease.api_key)
+        lease.headers = response.headers  # optional, refreshes the key's headroom
+"""
+
+import os
+import random
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Dict, Iterator, List, Mapping, Optional
+
+from dotenv import load_dotenv
+
+from utils.circuit_breaker import BREAKER_BACKOFF, CLOSED, CircuitBreaker, failure_kind
+from utils.rate_limits import RateLimitTracker, parse_rate_limit_headers
+
+load_dotenv()
+
+# "p2c" (power of two random choices) or "least_loaded" (best score over all keys)
+ROUTER_STRATEGY = os.getenv("ROUTER_STRATEGY", "p2c")
+# Requests in flight per key
+ROUTER_MAX_IN_FLIGHT = int(os.getenv("ROUTER_MAX_IN_FLIGHT", "8"))
+# Keys below this balance (USD) get no traffic, below ROUTER_LOW_BALANCE they get less
+ROUTER_MIN_BALANCE = float(os.getenv("ROUTER_MIN_BALANCE", "0.5"))
+ROUTER_LOW_BALANCE = float(os.getenv("ROUTER_LOW_BALANCE", "5"))
+# Weight of the newest sample in the per-key latency average
+ROUTER_LATENCY_ALPHA = float(os.getenv("ROUTER_LATENCY_ALPHA", "0.2"))
+# Latency (seconds) assumed for keys without measurements
+ROUTER_DEFAULT_LATENCY = 1.0
+# Consecutive unclassified errors before a key is ejected (with the timeout backoff)
+ROUTER_EJECT_AFTER = int(os.getenv("ROUTER_EJECT_AFTER", "3"))
+
+# Statuses from the balance check that rule a key out
+_UNUSABLE_STATUSES = {"insufficient", "invalid_key", "not_configured"}
+
+
+class NoKeyAvailable(RuntimeError):
+    """Every key is ejected, out of balance or headroom, or at its in-flight limit"""
+
+
+@dataclass
+class KeyState:
+    """What the router knows about one key"""
+    name: str
+    api_key: str
+    status: Optional[str] = None
+    balance: Optional[float] = None
+    latency: Optional[float] = None  # moving average, seconds
+    in_flight: int = 0
+    requests: int = 0
+    errors: int = 0
+    consecutive_errors: int = 0
+
+
+@dataclass
+class Lease:
+    """A key handed out for one request"""
+    name: str
+    api_key: str
+    started_at: float = field(default_factory=time.time)
+    headers: Optional[Mapping[str, str]] = None  # response headers, if the caller has them
+
+
+# HTTP status of a failed request -> failure kind that ejects the key
+_STATUS_KINDS = {
+    401: "invalid_key",
+    403: "invalid_key",
+    408: "timeout",
+    429: "quota_exceeded"
+}
+
+
+def _status_code(error: BaseException) -> Optional[int]:
+    """HTTP status carried by the exception (LiteLLM, requests, httpx, aiohttp)"""
+    for source in (error, getattr(error, "response", None)):
+        for attr in ("status_code", "status"):
+            value = getattr(source, attr, None)
+            if isinstance(value, int):
+                return value
+    return None
+
+
+def error_kind(error: BaseException) -> Optional[str]:
+    """
+    Failure kind of a provider exception, from its type and HTTP status only.
+    Anything else is None - an unclassified failure, never a guess from the message.
+    """
+    # Errors raised mid-stream wrap the provider's error
+    error = getattr(error, "original_exception", None) or error
+
+    kind = _STATUS_KINDS.get(_status_code(error))
+    if kind:
+        return kind
+
+    # LiteLLM is only checked when the caller already uses it
+    litellm = sys.modules.get("litellm")
+    if litellm is not None:
+        if isinstance(error, litellm.RateLimitError):
+            return "quota_exceeded"
+        if isinstance(error, litellm.AuthenticationError):
+            return "invalid_key"
+        if isinstance(error, litellm.Timeout):
+            return "timeout"
+
+    # Client timeouts: TimeoutError, requests' Timeout, httpx' TimeoutException...
+    if isinstance(error, TimeoutError) or any(
+        cls.__name__.endswith(("Timeout", "TimeoutError", "TimeoutException")) for cls in type(error).__mro__
+    ):
+        return "timeout"
+    return None
+
+
+class KeyRouter:
+    """Thread-safe key selection over a pool of keys"""
+
+    def __init__(self, keys: Dict[str, Optional[str]], strategy: str = ROUTER_STRATEGY,
+                 max_in_flight: int = ROUTER_MAX_IN_FLIGHT, seed: Optional[int] = None):
+        self.strategy = strategy
+        self.max_in_flight = max_in_flight
+        self._keys: Dict[str, KeyState] = {
+            name: KeyState(name, api_key) for name, api_key in keys.items() if api_key
+        }
+        self._breakers = {name: CircuitBreaker(name) for name in self._keys}
+        self._rate_limits = RateLimitTracker()
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def update(self, results: List[Dict]):
+        """Merge monitor rows (check_all_balances() output or a balances snapshot)"""
+        with self._lock:
+            for row in results:
+                state = self._keys.get(row.get("Service"))
+                if state is None:
+                    continue
+                state.status = row.get("_raw_status", state.status)
+                # Keys the monitor saw failing (invalid, rate limited, timing out) are ejected
+                kind = failure_kind({"status": row.get("_raw_status"), "error": row.get("Error")})
+                if kind and self._breakers[state.name].state == CLOSED:
+                    self._breakers[state.name].record(kind)
+                if row.get("_api_type") == "deepseek" and row.get("_raw_status") in ("active", "insufficient"):
+                    state.balance = row.get("_balance_value")
+                # Seed latency from pings until live requests take over
+                ping_latency = row.get("_ping_ttft") or row.get("_ping_time")
+                if state.latency is None and row.get("_ping_status") == "success" and ping_latency:
+                    state.latency = ping_latency
+                rate_limits = row.get("_rate_limits")
+                if rate_limits:
+                    # Rows carry readings already aged to when the row was built
+                    read_at = rate_limits.get("observed_at", time.time()) + rate_limits.get("age", 0)
+                    self._rate_limits.record(state.name, rate_limits, now=read_at)
+
+    def _weight(self, state: KeyState, now: float) -> float:
+        """Share of traffic a key can take: 0 = none, 1 = full (balance and headroom)"""
+        if state.status in _UNUSABLE_STATUSES:
+            return 0.0
+        weight = 1.0
+
+        if state.balance is not None:
+            if state.balance < ROUTER_MIN_BALANCE:
+                return 0.0
+            weight *= max(0.05, min(1.0, state.balance / ROUTER_LOW_BALANCE))
+
+        rate_limits = self._rate_limits.get(state.name, now) or {}
+        if rate_limits.get("retry_after"):
+            return 0.0
+        for kind in ("requests", "tokens"):
+            remaining = rate_limits.get(f"remaining_{kind}")
+            limit = rate_limits.get(f"limit_{kind}")
+            if remaining is None:
+                continue
+            if remaining <= 0:
+                return 0.0
+            if limit:
+                weight *= max(0.05, remaining / limit)
+        return weight
+
+    def _score(self, state: KeyState, weight: float) -> float:
+        """Expected cost of sending one more request to a key (lower is better)"""
+        latency = state.latency or ROUTER_DEFAULT_LATENCY
+        return latency * (state.in_flight + 1) / weight
+
+    def acquire(self) -> Lease:
+        """Pick a key for one request (raises NoKeyAvailable)"""
+        now = time.time()
+        with self._lock:
+            candidates = []
+            probes = []
+            for state in self._keys.values():
+                if state.in_flight >= self.max_in_flight:
+                    continue
+                weight = self._weight(state, now)
+                if weight <= 0:
+                    continue
+                breaker = self._breakers[state.name]
+                if breaker.state == CLOSED:
+                    candidates.append((self._score(state, weight), state))
+                elif breaker.allow():
+                    # Ejected key whose backoff ran out - claims its single probe request
+                    probes.append(state)
+
+            if probes:
+                # Probe one recovered key now, hand the other claims back
+                state = probes[0]
+                for other in probes[1:]:
+                    self._breakers[other.name].release()
+            elif not candidates:
+                raise NoKeyAvailable(f"No usable key among {len(self._keys)}")
+            else:
+                if self.strategy == "p2c" and len(candidates) > 2:
+                    candidates = self._rng.sample(candidates, 2)
+                _, state = min(candidates, key=lambda candidate: candidate[0])
+
+            state.in_flight += 1
+            state.requests += 1
+            return Lease(state.name, state.api_key)
+
+    def release(self, lease: Lease, error: Optional[str] = None, failed: bool = False):
+        """
+        Report a finished request.
+        error  - failure kind ("invalid_key", "quota_exceeded", "timeout"), ejects the key
+        failed - any other failure, ejects the key after ROUTER_EJECT_AFTER in a row
+        """
+        latency = time.time() - lease.started_at
+        rate_limits = parse_rate_limit_headers(lease.headers)
+        with self._lock:
+            state = self._keys[lease.name]
+            state.in_flight = max(0, state.in_flight - 1)
+            breaker = self._breakers[lease.name]
+
+            if error is None and not failed:
+                state.consecutive_errors = 0
+                state.latency = latency if state.latency is None else (
+                    ROUTER_LATENCY_ALPHA * latency + (1 - ROUTER_LATENCY_ALPHA) * state.latency
+                )
+                breaker.record(None)
+            else:
+                state.errors += 1
+                state.consecutive_errors += 1
+                if error in BREAKER_BACKOFF:
+                    breaker.record(error)
+                elif state.consecutive_errors >= ROUTER_EJECT_AFTER:
+                    breaker.record("timeout")
+                else:
+                    breaker.release()
+
+            if rate_limits:
+                self._rate_limits.record(lease.name, rate_limits)
+
+    @contextmanager
+    def lease(self) -> Iterator[Lease]:
+        """Acquire a key for the block; exceptions are classified and reported"""
+        lease = self.acquire()
+        try:
+            yield lease
+        except Exception as e:
+            kind = error_kind(e)
+            self.release(lease, error=kind, failed=kind is None)
+            raise
+        else:
+            self.release(lease)
+
+    def snapshot(self) -> List[Dict]:
+        """Per-key routing state for dashboards and logs"""
+        now = time.time()
+        with self._lock:
+            return [
+                {
+                    "service": state.name,
+                    "status": state.status,
+                    "balance": state.balance,
+                    "latency": state.latency,
+                    "weight": round(self._weight(state, now), 3),
+                    "in_flight": state.in_flight,
+                    "requests": state.requests,
+                    "errors": state.errors,
+                    "breaker": self._breakers[state.name].snapshot(),
+                    "rate_limits": self._rate_limits.get(state.name, now)
+                }
+                for state in self._keys.values()
+            ]
+
+
+def router_from_checker(checker=None, provider: str = "deepseek", **kwargs) -> KeyRouter:
+    """Router over a provider's keys, seeded with a fresh balance check"""
+    from utils.api_monitors import get_checker
+
+    checker = checker or get_checker()
+    keys = checker.deepseek_keys if provider == "deepseek" else checker.gemini_keys
+    router = KeyRouter(keys, **kwargs)
+    router.update(checker.check_all_balances())
+    return router
@@ -0,0 +1,213 @@
+"""
+Ping latency histograms
+Log-bucketed, mergeable latency histograms per key, metric (total, time to
+first token, connect) and probe tier, kept in time slices so percentiles and error rates can
+be reported over sliding windows.
+"""
+
+import math
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Relative precision of a bucket (0.05 -> values within ~5% of the true latency)
+LATENCY_PRECISION = float(os.getenv("LATENCY_PRECISION", "0.05"))
+# Tracked range in milliseconds, values outside are clamped into the edge buckets
+LATENCY_MIN_MS = 1.0
+LATENCY_MAX_MS = 120_000.0
+# Width of one time slice and how long slices are kept (seconds)
+LATENCY_SLICE_SECONDS = int(os.getenv("LATENCY_SLICE_SECONDS", "60"))
+LATENCY_RETENTION = int(os.getenv("LATENCY_RETENTION", str(24 * 3600)))
+
+# Windows offered on the API Keys page: label -> seconds
+LATENCY_WINDOWS = {
+    "15 min": 15 * 60,
+    "1 hour": 3600,
+    "24 hours": 24 * 3600
+}
+
+# Recorded metrics: name -> ping result field
+LATENCY_METRICS = {
+    "total": "ping_time",
+    "ttft": "ping_ttft",
+    "connect": "ping_connect_time"
+}
+
+# Probe tiers recorded separately - auth checks and completions measure different things
+PROBE_TIERS = ("completion", "auth")
+
+_LOG_GROWTH = math.log1p(2 * LATENCY_PRECISION)
+_MAX_BUCKET = int(math.log(LATENCY_MAX_MS / LATENCY_MIN_MS) / _LOG_GROWTH)
+
+
+class LatencyHistogram:
+    """Sparse log-bucket histogram of successful latencies plus an error count"""
+
+    __slots__ = ("counts", "errors")
+
+    def __init__(self):
+        self.counts: Dict[int, int] = {}
+        self.errors = 0
+
+    @staticmethod
+    def bucket_of(ms: float) -> int:
+        ms = min(max(ms, LATENCY_MIN_MS), LATENCY_MAX_MS)
+        return min(int(math.log(ms / LATENCY_MIN_MS) / _LOG_GROWTH), _MAX_BUCKET)
+
+    @staticmethod
+    def value_of(bucket: int) -> float:
+        """Representative latency of a bucket (its geometric midpoint)"""
+        return LATENCY_MIN_MS * math.exp((bucket + 0.5) * _LOG_GROWTH)
+
+    @property
+    def samples(self) -> int:
+        return sum(self.counts.values())
+
+    def record(self, ms: float):
+        bucket = self.bucket_of(ms)
+        self.counts[bucket] = self.counts.get(bucket, 0) + 1
+
+    def record_error(self):
+        self.errors += 1
+
+    def merge(self, other: "LatencyHistogram") -> "LatencyHistogram":
+        """Add another histogram's counts into this one"""
+        for bucket, count in other.counts.items():
+            self.counts[bucket] = self.counts.get(bucket, 0) + count
+        self.errors += other.errors
+        return self
+
+    def percentile(self, q: float) -> Optional[float]:
+        """Latency (ms) at quantile q in [0, 1], None when empty"""
+        total = self.samples
+        if not total:
+            return None
+
+        rank = max(1, math.ceil(q * total))
+        seen = 0
+        for bucket in sorted(self.counts):
+            seen += self.counts[bucket]
+            if seen >= rank:
+                return self.value_of(bucket)
+        return self.value_of(max(self.counts))
+
+
+class LatencyRecorder:
+    """Per-key histograms split into time slices, shared by the whole process"""
+
+    def __init__(self, slice_seconds: int = LATENCY_SLICE_SECONDS, retention: int = LATENCY_RETENTION):
+        self.slice_seconds = slice_seconds
+        self.retention = retention
+        self._slices: Dict[str, Dict[int, LatencyHistogram]] = {}
+        self._providers: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def _slice(self, key: str, provider: str, now: float) -> LatencyHistogram:
+        index = int(now // self.slice_seconds)
+        slices = self._slices.setdefault(key, {})
+        self._providers[key] = provider
+
+        # Drop slices that fell out of retention
+        oldest = index - self.retention // self.slice_seconds
+        for expired in [i for i in slices if i < oldest]:
+            del slices[expired]
+
+        return slices.setdefault(index, LatencyHistogram())
+
+    def record(self, key: str, provider: str, seconds: float, ok: bool = True, now: Optional[float] = None):
+        """Record one ping (latency only counts for successful ones)"""
+        now = time.time() if now is None else now
+        with self._lock:
+            histogram = self._slice(key, provider, now)
+            if ok:
+                histogram.record(seconds * 1000)
+            else:
+                histogram.record_error()
+
+    def record_error(self, key: str, provider: str, now: Optional[float] = None):
+        self.record(key, provider, 0, ok=False, now=now)
+
+    def window(self, key: str, seconds: float, now: Optional[float] = None) -> LatencyHistogram:
+        """Merged histogram of a key over the last `seconds`"""
+        now = time.time() if now is None else now
+        first = int((now - seconds) // self.slice_seconds)
+        merged = LatencyHistogram()
+        with self._lock:
+            for index, histogram in self._slices.get(key, {}).items():
+                if index >= first:
+                    merged.merge(histogram)
+        return merged
+
+    def summary(self, seconds: float, now: Optional[float] = None) -> List[Dict]:
+        """Percentiles and error rate per key plus one aggregate row per provider"""
+        with self._lock:
+            providers = dict(self._providers)
+
+        rows = []
+        per_provider: Dict[str, LatencyHistogram] = {}
+        for key in sorted(providers):
+            histogram = self.window(key, seconds, now)
+            if histogram.samples or histogram.errors:
+                rows.append(_summary_row(key, providers[key], histogram))
+                per_provider.setdefault(providers[key], LatencyHistogram()).merge(histogram)
+
+        for provider, histogram in sorted(per_provider.items()):
+            rows.append(_summary_row(f"All {provider}", provider, histogram))
+        return rows
+
+    def clear(self):
+        with self._lock:
+            self._slices.clear()
+            self._providers.clear()
+
+
+def _summary_row(key: str, provider: str, histogram: LatencyHistogram) -> Dict:
+    attempts = histogram.samples + histogram.errors
+    return {
+        "service": key,
+        "provider": provider,
+        "samples": histogram.samples,
+        "errors": histogram.errors,
+        "error_rate": histogram.errors / attempts if attempts else 0.0,
+        "p50_ms": histogram.percentile(0.50),
+        "p95_ms": histogram.percentile(0.95),
+        "p99_ms": histogram.percentile(0.99)
+    }
+
+
+_recorders = {(metric, tier): LatencyRecorder() for metric in LATENCY_METRICS for tier in PROBE_TIERS}
+
+
+def record_ping(service: str, provider: str, result: Dict):
+    """Record a ping result dict (ping_status, ping_time, ping_ttft, ping_probe...) for a key"""
+    status = result.get("ping_status")
+    # Pings skipped by an open circuit breaker never reached the provider
+    if result.get("skipped") or status in (None, "not_configured", "not_tested"):
+        return
+
+    tier = result.get("ping_probe")
+    if tier not in PROBE_TIERS:
+        tier = "completion"
+
+    ok = status == "success"
+    for metric, field in LATENCY_METRICS.items():
+        value = result.get(field)
+        if not ok:
+            _recorders[(metric, tier)].record_error(service, provider)
+        elif value is not None:
+            # Full (non-streaming) pings only carry the total time, auth checks no TTFT
+            _recorders[(metric, tier)].record(service, provider, value)
+
+
+def latency_summary(seconds: float, metric: str = "total", tier: str = "completion") -> List[Dict]:
+    """Summary rows of every key pinged with the given probe tier within the window"""
+    return _recorders[(metric, tier)].summary(seconds)
+
+
+def get_latency_recorder(metric: str = "total", tier: str = "completion") -> LatencyRecorder:
+    return _recorders[(metric, tier)]
@@ -0,0 +1,335 @@
+"""
+Local mock provider
+Stand-in for the DeepSeek and Gemini endpoints the monitors talk to (balance,
+model metadata, chat completions with streaming), with configurable latency,
+errors and 429 bursts for offline benchmarks.
+
+Usage:
+    python -m utils.mock_provider --port 8765 --latency-ms 300 --error-rate 0.05
+    DEEPSEEK_BASE_URL=http://127.0.0.1:8765 GEMINI_BASE_URL=http://127.0.0.1:8765 streamlit run app.py
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set
+
+from aiohttp import web
+
+# Tokens of the mocked completion (answers the ping prompt)
+REPLY_TOKENS = ["po", "ng"]
+
+
+@dataclass
+class MockConfig:
+    """Behaviour of the mock server"""
+    latency_ms: float = 200  # median time to response headers
+    latency_sigma: float = 0.5  # log-normal spread of the latency (0 = fixed)
+    ttft_ms: float = 100  # extra delay before the first streamed token
+    token_delay_ms: float = 20  # delay between streamed tokens
+    error_rate: float = 0.0  # share of requests answered with HTTP 500
+    max_concurrency: int = 0  # in-flight requests per key before 429 (0 = unlimited)
+    burst_period: float = 0  # every N seconds ...
+    burst_duration: float = 0  # ... answer everything with 429 for this long
+    requests_per_minute: int = 0  # per-key rate limit, advertised in x-ratelimit-* headers (0 = none)
+    balance: float = 100.0  # starting USD balance of every key
+    cost_per_request: float = 0.001  # balance drained per chat completion
+    invalid_keys: Set[str] = field(default_factory=set)
+    seed: Optional[int] = None
+
+
+class MockProvider:
+    """aiohttp application emulating the provider APIs"""
+
+    def __init__(self, config: MockConfig):
+        self.config = config
+        self.started_at = time.time()
+        self.balances: Dict[str, float] = {}
+        self.in_flight: Dict[str, int] = {}
+        self.windows: Dict[str, List[float]] = {}  # key -> [window start, requests in window]
+        self.requests = 0
+        self._rng = random.Random(config.seed)
+
+    def app(self) -> web.Application:
+        app = web.Application()
+        app.on_response_prepare.append(self._add_rate_limit_headers)
+        app.add_routes([
+            web.get("/user/balance", self.deepseek_balance),
+            web.get("/models", self.deepseek_models),
+            web.post("/chat/completions", self.chat_completions),
+            web.post("/beta/chat/completions", self.chat_completions),
+            web.get("/v1beta/models", self.gemini_models),
+            web.get("/v1beta/models/{model}", self.gemini_model),
+            web.post("/v1beta/models/{model}:generateContent", self.gemini_generate),
+            web.post("/v1beta/models/{model}:streamGenerateContent", self.gemini_generate),
+            web.get("/mock/stats", self.stats)
+        ])
+        return app
+
+    async def _delay(self, ms: float, sigma: float = 0):
+        if ms <= 0:
+            return
+        if sigma:
+            ms = ms * self._rng.lognormvariate(0, sigma)
+        await asyncio.sleep(ms / 1000)
+
+    def _count_request(self, request: web.Request, key: Optional[str]) -> bool:
+        """Count a request in the key's minute window, False once the window is full"""
+        limit = self.config.requests_per_minute
+        if not limit or not key:
+            return True
+
+        now = time.time()
+        window = self.windows.setdefault(key, [now, 0])
+        if now - window[0] >= 60:
+            window[0], window[1] = now, 0
+        window[1] += 1
+
+        reset = max(0.0, window[0] + 60 - now)
+        request["rate_limit_headers"] = {
+            "x-ratelimit-limit-requests": str(limit),
+            "x-ratelimit-remaining-requests": str(max(0, limit - window[1])),
+            "x-ratelimit-reset-requests": f"{reset:.3f}s"
+        }
+        if window[1] > limit:
+            request["rate_limit_headers"]["retry-after"] = str(int(reset) + 1)
+            return False
+        return True
+
+    async def _add_rate_limit_headers(self, request: web.Request, response: web.StreamResponse):
+        response.headers.update(request.get("rate_limit_headers", {}))
+
+    def _fault(self, key: Optional[str], invalid_status: int) -> Optional[web.Response]:
+        """Error response this request gets, if any"""
+        config = self.config
+        if not key or key in config.invalid_keys:
+            return web.json_response({"error": {"message": "Authentication Fails (invalid key)"}}, status=invalid_status)
+
+        if config.burst_period and (time.time() - self.started_at) % config.burst_period < config.burst_duration:
+            return web.json_response({"error": {"message": "Rate limit reached (burst)"}}, status=429)
+
+        if config.max_concurrency and self.in_flight.get(key, 0) > config.max_concurrency:
+            return web.json_response({"error": {"message": "Rate limit reached (concurrency)"}}, status=429)
+
+        if config.error_rate and self._rng.random() < config.error_rate:
+            return web.json_response({"error": {"message": "Internal error (injected)"}}, status=500)
+
+        return None
+
+    async def _handle(self, request: web.Request, key: Optional[str], invalid_status: int, respond):
+        """Shared request flow: count, latency, faults, then the real response"""
+        self.requests += 1
+        self.in_flight[key] = self.in_flight.get(key, 0) + 1
+        try:
+            await self._delay(self.config.latency_ms, self.config.latency_sigma)
+            fault = self._fault(key, invalid_status)
+            if fault is None and not self._count_request(request, key):
+                fault = web.json_response({"error": {"message": "Rate limit reached (requests per minute)"}}, status=429)
+            return fault or await respond()
+        finally:
+            self.in_flight[key] -= 1
+
+    def _spend(self, key: str):
+        balance = self.balances.get(key, self.config.balance)
+        self.balances[key] = max(0.0, balance - self.config.cost_per_request)
+
+    async def _stream(self, request: web.Request, events: List[Dict]) -> web.StreamResponse:
+        """Send events as server-sent events with the configured token timing"""
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        await self._delay(self.config.ttft_ms)
+        for i, event in enumerate(events):
+            if i:
+                await self._delay(self.config.token_delay_ms)
+            data = event if isinstance(event, str) else json.dumps(event)
+            await response.write(f"data: {data}\n\n".encode())
+        await response.write_eof()
+        return response
+
+    # DeepSeek
+
+    async def deepseek_balance(self, request: web.Request) -> web.Response:
+        key = request.headers.get("Authorization", "").removeprefix("Bearer ").strip()
+
+        async def respond():
+            balance = self.balances.get(key, self.config.balance)
+            return web.json_response({
+                "is_available": balance > 0,
+                "balance_infos": [{
+                    "currency": "USD",
+                    "total_balance": f"{balance:.2f}",
+                    "granted_balance": "0.00",
+                    "topped_up_balance": f"{balance:.2f}"
+                }]
+            })
+
+        return await self._handle(request, key, 401, respond)
+
+    async def deepseek_models(self, request: web.Request) -> web.Response:
+        key = request.headers.get("Authorization", "").removeprefix("Bearer ").strip()
+
+        async def respond():
+            return web.json_response({"object": "list", "data": [
+                {"id": "deepseek-chat", "object": "model", "owned_by": "deepseek"},
+                {"id": "deepseek-reasoner", "object": "model", "owned_by": "deepseek"}
+            ]})
+
+        return await self._handle(request, key, 401, respond)
+
+    async def chat_completions(self, request: web.Request) -> web.StreamResponse:
+        key = request.headers.get("Authorization", "").removeprefix("Bearer ").strip()
+        body = await request.json()
+        model = body.get("model", "deepseek-chat")
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        created = int(time.time())
+        usage = {"prompt_tokens": 20, "completion_tokens": len(REPLY_TOKENS), "total_tokens": 20 + len(REPLY_TOKENS)}
+
+        async def respond():
+            self._spend(key)
+            if not body.get("stream"):
+                await self._delay(self.config.ttft_ms + self.config.token_delay_ms * (len(REPLY_TOKENS) - 1))
+                return web.json_response({
+                    "id": completion_id,
+                    "object": "chat.completion",
+                    "created": created,
+                    "model": model,
+                    "choices": [{
+                        "index": 0,
+                        "message": {"role": "assistant", "content": "".join(REPLY_TOKENS)},
+                        "finish_reason": "stop"
+                    }],
+                    "usage": usage
+                })
+
+            def chunk(delta: Dict, finish_reason: Optional[str] = None) -> Dict:
+                return {
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "created": created,
+                    "model": model,
+                    "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]
+                }
+
+            events = [chunk({"role": "assistant", "content": token}) for token in REPLY_TOKENS]
+            events.append({**chunk({}, "stop"), "usage": usage})
+            events.append("[DONE]")
+            return await self._stream(request, events)
+
+        return await self._handle(request, key, 401, respond)
+
+    # Gemini
+
+    async def gemini_models(self, request: web.Request) -> web.Response:
+        key = request.query.get("key")
+
+        async def respond():
+            return web.json_response({"models": [
+                {"name": "models/gemini-2.5-pro-preview-05-06"},
+                {"name": "models/gemini-2.0-flash"}
+            ]})
+
+        return await self._handle(request, key, 403, respond)
+
+    async def gemini_model(self, request: web.Request) -> web.Response:
+        key = request.headers.get("x-goog-api-key") or request.query.get("key")
+        model = request.match_info["model"]
+
+        async def respond():
+            return web.json_response({"name": f"models/{model}", "displayName": model})
+
+        return await self._handle(request, key, 403, respond)
+
+    async def gemini_generate(self, request: web.Request) -> web.StreamResponse:
+        key = request.headers.get("x-goog-api-key") or request.query.get("key")
+        model = request.match_info["model"]
+        streaming = request.path.endswith(":streamGenerateContent")
+
+        def candidate(text: str, finish_reason: Optional[str] = None) -> Dict:
+            result = {"content": {"parts": [{"text": text}], "role": "model"}, "index": 0}
+            if finish_reason:
+                result["finishReason"] = finish_reason
+            return result
+
+        usage = {"promptTokenCount": 20, "candidatesTokenCount": len(REPLY_TOKENS),
+                 "totalTokenCount": 20 + len(REPLY_TOKENS)}
+
+        async def respond():
+            if not streaming:
+                await self._delay(self.config.ttft_ms + self.config.token_delay_ms * (len(REPLY_TOKENS) - 1))
+                return web.json_response({
+                    "candidates": [candidate("".join(REPLY_TOKENS), "STOP")],
+                    "usageMetadata": usage,
+                    "modelVersion": model
+                })
+
+            events = [
+                {"candidates": [candidate(token)], "modelVersion": model}
+                for token in REPLY_TOKENS
+            ]
+            events[-1] = {"candidates": [candidate(REPLY_TOKENS[-1], "STOP")], "usageMetadata": usage,
+                          "modelVersion": model}
+            return await self._stream(request, events)
+
+        return await self._handle(request, key, 403, respond)
+
+    async def stats(self, request: web.Request) -> web.Response:
+        """Counters for benchmark scripts"""
+        return web.json_response({
+            "requests": self.requests,
+            "in_flight": {key: count for key, count in self.in_flight.items() if count},
+            "balances": self.balances
+        })
+
+
+def main():
+    defaults = MockConfig()
+    parser = argparse.ArgumentParser(description="Run a local mock of the DeepSeek and Gemini APIs")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=defaults.latency_ms, help="Median response latency")
+    parser.add_argument("--latency-sigma", type=float, default=defaults.latency_sigma,
+                        help="Log-normal latency spread (0 = fixed)")
+    parser.add_argument("--ttft-ms", type=float, default=defaults.ttft_ms, help="Delay before the first token")
+    parser.add_argument("--token-delay-ms", type=float, default=defaults.token_delay_ms,
+                        help="Delay between streamed tokens")
+    parser.add_argument("--error-rate", type=float, default=defaults.error_rate, help="Share of HTTP 500 answers")
+    parser.add_argument("--max-concurrency", type=int, default=defaults.max_concurrency,
+                        help="In-flight requests per key before 429 (0 = unlimited)")
+    parser.add_argument("--burst-period", type=float, default=defaults.burst_period,
+                        help="Seconds between 429 bursts (0 = none)")
+    parser.add_argument("--burst-duration", type=float, default=defaults.burst_duration,
+                        help="Length of each 429 burst in seconds")
+    parser.add_argument("--requests-per-minute", type=int, default=defaults.requests_per_minute,
+                        help="Per-key rate limit sent in x-ratelimit-* headers (0 = none)")
+    parser.add_argument("--balance", type=float, default=defaults.balance, help="Starting balance per key")
+    parser.add_argument("--cost-per-request", type=float, default=defaults.cost_per_request,
+                        help="Balance drained per chat completion")
+    parser.add_argument("--invalid-key", action="append", default=[], help="Key rejected as invalid (repeatable)")
+    parser.add_argument("--seed", type=int, help="Random seed for reproducible runs")
+    args = parser.parse_args()
+
+    config = MockConfig(
+        latency_ms=args.latency_ms,
+        latency_sigma=args.latency_sigma,
+        ttft_ms=args.ttft_ms,
+        token_delay_ms=args.token_delay_ms,
+        error_rate=args.error_rate,
+        max_concurrency=args.max_concurrency,
+        burst_period=args.burst_period,
+        burst_duration=args.burst_duration,
+        requests_per_minute=args.requests_per_minute,
+        balance=args.balance,
+        cost_per_request=args.cost_per_request,
+        invalid_keys=set(args.invalid_key),
+        seed=args.seed
+    )
+    print(f"Mock provider on http://{args.host}:{args.port}")
+    web.run_app(MockProvider(config).app(), host=args.host, port=args.port, print=None)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Ping token budget
+Daily cap on the tokens spent by completion probes, kept in a SQLite file so
+every process on the host (Streamlit replicas, the collector) and restarts
+share one counter. Once it is used up pings fall back to the free auth probe
+until the next day.
+"""
+
+import os
+import sqlite3
+import threading
+from datetime import date, timedelta
+from typing import Dict, Optional
+
+from dotenv import load_dotenv
+
+from utils.shared_cache import CACHE_DB_PATH
+
+load_dotenv()
+
+# Tokens completion probes may spend per day across all keys (0 = unlimited)
+PING_DAILY_TOKEN_BUDGET = int(os.getenv("PING_DAILY_TOKEN_BUDGET", "20000"))
+# Counter file, shared with the cache by default
+PING_BUDGET_DB_PATH = os.getenv("PING_BUDGET_DB_PATH", CACHE_DB_PATH)
+# Days of counters kept for reference
+PING_BUDGET_KEEP_DAYS = 7
+
+BUDGET_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS probe_budget (
+        day TEXT PRIMARY KEY,
+        used INTEGER NOT NULL
+    )
+"""
+
+
+class ProbeBudget:
+    """Per-day token counter, updated atomically in SQLite"""
+
+    def __init__(self, path: str = PING_BUDGET_DB_PATH, limit: int = PING_DAILY_TOKEN_BUDGET):
+        self.path = path
+        self.limit = limit
+        conn = self._connect()
+        try:
+            conn.execute(BUDGET_SCHEMA)
+        finally:
+            conn.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def try_spend(self, tokens: int) -> bool:
+        """Reserve tokens for a probe, False if that would exceed today's budget"""
+        today = date.today()
+        try:
+            conn = self._connect()
+            try:
+                if conn.execute("INSERT OR IGNORE INTO probe_budget (day, used) VALUES (?, 0)",
+                                (today.isoformat(),)).rowcount:
+                    # First probe of the day - drop old counters
+                    cutoff = today - timedelta(days=PING_BUDGET_KEEP_DAYS)
+                    conn.execute("DELETE FROM probe_budget WHERE day < ?", (cutoff.isoformat(),))
+                # Check and add in one statement so concurrent processes can't overshoot
+                cursor = conn.execute(
+                    "UPDATE probe_budget SET used = used + :tokens "
+                    "WHERE day = :day AND (:limit = 0 OR used + :tokens <= :limit)",
+                    {"tokens": tokens, "day": today.isoformat(), "limit": self.limit}
+                )
+                return cursor.rowcount == 1
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            # Fail closed - without the counter no tokens are spent
+            print(f"[ERROR] Ping token budget unavailable: {e}")
+            return False
+
+    def settle(self, reserved: int, actual: Optional[int]):
+        """Replace a reservation with the tokens the provider actually billed"""
+        if actual is None:
+            return
+        try:
+            conn = self._connect()
+            try:
+                conn.execute(
+                    "UPDATE probe_budget SET used = MAX(0, used - ? + ?) WHERE day = ?",
+                    (reserved, actual, date.today().isoformat())
+                )
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            print(f"[ERROR] Failed to settle ping tokens: {e}")
+
+    def snapshot(self) -> Dict:
+        today = date.today().isoformat()
+        try:
+            conn = self._connect()
+            try:
+                row = conn.execute("SELECT used FROM probe_budget WHERE day = ?", (today,)).fetchone()
+            finally:
+                conn.close()
+        except sqlite3.Error as e:
+            print(f"[ERROR] Ping token budget unavailable: {e}")
+            row = None
+
+        used = row[0] if row else 0
+        return {
+            "day": today,
+            "used": used,
+            "limit": self.limit,
+            "remaining": max(0, self.limit - used) if self.limit else None
+        }
+
+
+_budget: Optional[ProbeBudget] = None
+_budget_lock = threading.Lock()
+
+
+def get_probe_budget() -> ProbeBudget:
+    """Host-wide ping token budget"""
+    global _budget
+    with _budget_lock:
+        if _budget is None:
+            _budget = ProbeBudget()
+        return _budget
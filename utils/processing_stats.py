@@ -0,0 +1,421 @@
+"""
+Processing statistics fetchers
+Queries the platform databases used by the Processing page
+"""
+
+import json
+import os
+import time
+from datetime import date, datetime, timedelta
+from functools import partial
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Dict, Optional
+from psycopg2 import sql
+from dotenv import load_dotenv
+
+from utils.db_pool import get_connection
+from utils.query_metrics import execute_timed
+from utils.rollups import ROLLUP_EXISTS_QUERY, ROLLUP_STATS_QUERY, rollup_name
+from utils.shared_cache import get_cache_backend
+from utils.swr_cache import CacheEntry, SWRCache
+
+load_dotenv()
+
+# Overall deadline for fetching every platform (seconds)
+PROCESSING_FETCH_DEADLINE = float(os.getenv("PROCESSING_FETCH_DEADLINE", "15"))
+# How long platform stats stay fresh before a background refresh (seconds)
+PROCESSING_CACHE_TTL = float(os.getenv("PROCESSING_CACHE_TTL", "300"))
+
+# Source registry: name -> database/table layout and display labels.
+# Every registered source goes through the same pooled, cached, parallel fetch path.
+PLATFORMS: Dict[str, Dict] = {}
+
+# Optional JSON file with extra sources (a list of register_source() keyword arguments)
+PROCESSING_SOURCES_FILE = os.getenv("PROCESSING_SOURCES_FILE")
+
+
+def register_source(name: str, url_env: str, table: str, name_column: str, date_column: str,
+                    label: str, item_label: str = "Channel", count_label: str = "Entries",
+                    items_label: Optional[str] = None, statement_timeout_ms: Optional[int] = None,
+                    connect_timeout: Optional[int] = None) -> Dict:
+    """
+    Register a source for the Processing page.
+    Results use "<item>s" / "<item>_stats" keys, e.g. "channels" / "channel_stats".
+    Timeouts default to DB_STATEMENT_TIMEOUT_MS / DB_CONNECT_TIMEOUT.
+    """
+    item_key = item_label.lower()
+    source = {
+        "name": name,
+        "url_env": url_env,
+        "table": table,
+        "name_column": name_column,
+        "date_column": date_column,
+        "label": label,
+        "item_label": item_label,
+        "items_label": items_label or f"{item_label}s",
+        "count_label": count_label,
+        "items_key": f"{item_key}s",
+        "stats_key": f"{item_key}_stats",
+        "statement_timeout_ms": statement_timeout_ms,
+        "connect_timeout": connect_timeout
+    }
+    PLATFORMS[name] = source
+    return source
+
+
+register_source("youtube", "YOUTUBE_DATABASE_URL", "videos", "channel_name", "date",
+                label="YouTube", item_label="Channel", count_label="Videos")
+register_source("twitter", "TWITTER_DATABASE_URL", "daily_summaries", "twitter_name", "summary_date",
+                label="Twitter", item_label="User", count_label="Summaries")
+register_source("telegram", "TELEGRAM_DATABASE_URL", "daily_summaries", "group_name", "summary_date",
+                label="Telegram", item_label="Group", count_label="Summaries")
+
+# register_source() arguments: required ones are strings, timeouts are integers
+_SOURCE_FIELDS = ("name", "url_env", "table", "name_column", "date_column", "label")
+_SOURCE_OPTIONAL_FIELDS = ("item_label", "count_label", "items_label")
+_SOURCE_TIMEOUT_FIELDS = ("statement_timeout_ms", "connect_timeout")
+
+
+def _source_config_error(config) -> Optional[str]:
+    """Why a sources-file entry can't be registered, None if it can"""
+    if not isinstance(config, dict):
+        return "not an object"
+    unknown = set(config) - set(_SOURCE_FIELDS + _SOURCE_OPTIONAL_FIELDS + _SOURCE_TIMEOUT_FIELDS)
+    if unknown:
+        return f"unknown fields {sorted(unknown)}"
+    for field in _SOURCE_FIELDS:
+        if not isinstance(config.get(field), str) or not config[field]:
+            return f"missing {field}"
+    for field in _SOURCE_OPTIONAL_FIELDS:
+        if field in config and not isinstance(config[field], str):
+            return f"{field} must be a string"
+    for field in _SOURCE_TIMEOUT_FIELDS:
+        value = config.get(field)
+        if value is not None and (not isinstance(value, int) or isinstance(value, bool)):
+            return f"{field} must be an integer"
+    return None
+
+
+def _load_sources_file(path: Optional[str]):
+    """Register the sources listed in the optional sources file (broken entries are skipped)"""
+    if not path:
+        return
+    try:
+        with open(path) as f:
+            configs = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"[ERROR] Failed to read Processing sources file {path}: {e}")
+        return
+    if not isinstance(configs, list):
+        print(f"[ERROR] Processing sources file {path} must contain a list of sources")
+        return
+
+    for i, config in enumerate(configs):
+        error = _source_config_error(config)
+        if error:
+            print(f"[ERROR] Skipping source #{i + 1} in {path}: {error}")
+            continue
+        register_source(**config)
+
+
+_load_sources_file(PROCESSING_SOURCES_FILE)
+
+# Shared worker pool - not a context manager so a hung database never blocks the page
+PROCESSING_FETCH_WORKERS = int(os.getenv("PROCESSING_FETCH_WORKERS", "8"))
+_executor = ThreadPoolExecutor(max_workers=PROCESSING_FETCH_WORKERS, thread_name_prefix="processing-fetch")
+
+# Source name -> connection currently running its stats query (for cancellation)
+_in_flight: Dict[str, object] = {}
+
+# Process-wide stats cache shared by every Streamlit session
+_stats_cache = SWRCache(
+    ttl=PROCESSING_CACHE_TTL,
+    executor=_executor,
+    error_of=lambda data: data.get("error"),
+    fetched_at_of=lambda data: data.get("loaded_at")
+)
+
+
+# Incremental refresh: only rows dated after a cutoff are re-queried between full refreshes
+PROCESSING_INCREMENTAL_REFRESH = os.getenv("PROCESSING_INCREMENTAL_REFRESH", "true").lower() == "true"
+# Days before today that are always re-scanned (late rows for recent dates are picked up)
+PROCESSING_INCREMENTAL_LOOKBACK_DAYS = int(os.getenv("PROCESSING_INCREMENTAL_LOOKBACK_DAYS", "1"))
+# Full rescan interval - catches backfilled old dates, deletes and rows without a date
+PROCESSING_FULL_REFRESH_INTERVAL = float(os.getenv("PROCESSING_FULL_REFRESH_INTERVAL", "3600"))
+
+# One scan per platform: per-name counts, distinct dates and the grand total
+# come back as separate grouping sets of the same query.
+# GROUPING(name, DATE(date)) is 1 for per-name rows, 2 for per-date rows, 3 for the total.
+# recent_count splits off rows at/after the incremental cutoff.
+PLATFORM_STATS_QUERY = """
+    SELECT
+        GROUPING({name}, DATE({date})) AS grouping_id,
+        {name},
+        DATE({date}) AS process_date,
+        COUNT(*) AS row_count,
+        COUNT({date}) AS dated_count,
+        COUNT(*) FILTER (WHERE {date} >= %(cutoff)s) AS recent_count
+    FROM {table}
+    {where}
+    GROUP BY GROUPING SETS (({name}), (DATE({date})), ())
+"""
+
+GROUPING_BY_NAME = 1
+GROUPING_BY_DATE = 2
+GROUPING_TOTAL = 3
+
+
+def _incremental_cutoff() -> date:
+    """First date that incremental refreshes re-scan"""
+    return date.today() - timedelta(days=PROCESSING_INCREMENTAL_LOOKBACK_DAYS)
+
+
+def _build_stats_query(platform: Dict, use_rollup: bool, incremental: bool) -> sql.Composable:
+    """Stats query over the platform's rollup or its raw table"""
+    if use_rollup:
+        return sql.SQL(ROLLUP_STATS_QUERY).format(view=sql.Identifier(rollup_name(platform)))
+
+    where = sql.SQL("")
+    if incremental:
+        where = sql.SQL("WHERE {date} >= %(cutoff)s").format(date=sql.Identifier(platform["date_column"]))
+
+    return sql.SQL(PLATFORM_STATS_QUERY).format(
+        table=sql.Identifier(platform["table"]),
+        name=sql.Identifier(platform["name_column"]),
+        date=sql.Identifier(platform["date_column"]),
+        where=where
+    )
+
+
+def _fetch_platform_stats(database_url: Optional[str], platform: Dict,
+                          previous: Optional[Dict] = None) -> Dict:
+    """
+    Get names, dates and counts for one platform table in a single query.
+    With a previous snapshot only rows past its cutoff are queried and merged in.
+    """
+    items_key = platform["items_key"]
+    stats_key = platform["stats_key"]
+    try:
+        snapshot = previous.get("incremental") if previous else None
+        cutoff = snapshot["cutoff"] if snapshot else _incremental_cutoff()
+
+        with get_connection(database_url, platform["connect_timeout"],
+                            platform["statement_timeout_ms"]) as conn, conn.cursor() as cur:
+            _in_flight[platform["name"]] = conn
+            try:
+                use_rollup = execute_timed(
+                    cur, platform["name"], "rollup_check", ROLLUP_EXISTS_QUERY, (rollup_name(platform),)
+                )[0][0]
+                if use_rollup:
+                    # Rollups are cheap to read in full - nothing to merge
+                    snapshot = None
+                    cutoff = _incremental_cutoff()
+
+                query = _build_stats_query(platform, use_rollup, incremental=snapshot is not None)
+                query_name = "rollup_stats" if use_rollup else ("incremental_stats" if snapshot else "full_stats")
+                rows = execute_timed(cur, platform["name"], query_name, query, {"cutoff": cutoff})
+            finally:
+                _in_flight.pop(platform["name"], None)
+
+        names_stats = {}
+        recent_stats = {}
+        dates = []
+        total_days = 0
+        recent_days = 0
+
+        for grouping_id, name, process_date, row_count, dated_count, recent_count in rows:
+            if grouping_id == GROUPING_BY_NAME:
+                if name is not None:
+                    names_stats[name] = row_count
+                    recent_stats[name] = recent_count
+            elif grouping_id == GROUPING_BY_DATE:
+                if process_date is not None:
+                    dates.append(process_date)
+            elif grouping_id == GROUPING_TOTAL:
+                total_days = dated_count
+                recent_days = recent_count
+
+        if snapshot:
+            # Rows before the cutoff come from the snapshot, the rest from this query
+            merged = dict(snapshot["base_stats"])
+            for name, count in names_stats.items():
+                merged[name] = merged.get(name, 0) + count
+            names_stats = {name: count for name, count in merged.items() if count > 0}
+            dates += [d for d in previous["dates"] if d < cutoff]
+            total_days += snapshot["base_days"]
+            full_refreshed_at = snapshot["full_refreshed_at"]
+            base_stats = snapshot["base_stats"]
+            base_days = snapshot["base_days"]
+        else:
+            full_refreshed_at = time.time()
+            base_stats = {
+                name: count - recent_stats[name]
+                for name, count in names_stats.items()
+                if count > recent_stats[name]
+            }
+            base_days = total_days - recent_days
+
+        return {
+            items_key: sorted(names_stats),
+            "dates": sorted(dates, reverse=True),
+            "total_days": total_days,
+            stats_key: dict(sorted(names_stats.items(), key=lambda item: item[1], reverse=True)),
+            "error": None,
+            "source": "rollup" if use_rollup else "table",
+            # Counts before the cutoff, reused by the next incremental refresh
+            "incremental": {
+                "cutoff": cutoff,
+                "base_stats": base_stats,
+                "base_days": base_days,
+                "full_refreshed_at": full_refreshed_at
+            }
+        }
+    except Exception as e:
+        return {
+            items_key: [],
+            "dates": [],
+            "total_days": 0,
+            stats_key: {},
+            "error": f"Connection error: {str(e)}"
+        }
+
+
+def fetch_platform(name: str, previous: Optional[Dict] = None) -> Dict:
+    """Get one platform's stats from its database"""
+    platform = PLATFORMS[name]
+    return _fetch_platform_stats(os.getenv(platform["url_env"]), platform, previous)
+
+
+def _with_cache_info(entry: CacheEntry) -> Dict:
+    """Platform stats plus when they were fetched and any newer refresh error"""
+    data = dict(entry.value)
+    data["fetched_at"] = datetime.fromtimestamp(entry.fetched_at)
+    # The last refresh failed but older good data is being shown
+    data["stale_error"] = entry.error if not data["error"] else None
+    return data
+
+
+def _fetch_platform_now(name: str, full: bool = False) -> Dict:
+    """Fetch one platform, incrementally from the cached snapshot when possible"""
+    entry = _stats_cache.peek(name)
+    previous = None
+
+    if not full and PROCESSING_INCREMENTAL_REFRESH and entry is not None:
+        snapshot = entry.value.get("incremental")
+        if snapshot and time.time() - snapshot["full_refreshed_at"] <= PROCESSING_FULL_REFRESH_INTERVAL:
+            previous = entry.value
+
+    start_time = time.time()
+    data = fetch_platform(name, previous=previous)
+    data["fetch_time"] = round(time.time() - start_time, 3)
+    data["loaded_at"] = time.time()
+    return data
+
+
+def _load_platform(name: str, full: bool = False, force: bool = False) -> Dict:
+    """
+    Load one platform's stats. With a shared cache backend other processes'
+    results are reused and only one process per host queries the database;
+    full/force always query and publish the result.
+    """
+    backend = get_cache_backend()
+    if not backend.shared:
+        return _fetch_platform_now(name, full)
+
+    key = f"processing:{name}"
+    if full or force:
+        data = _fetch_platform_now(name, full)
+        if not data.get("error"):
+            backend.safely(backend.set, key, data, PROCESSING_CACHE_TTL)
+        return data
+
+    return backend.get_or_load(
+        key,
+        PROCESSING_CACHE_TTL,
+        partial(_fetch_platform_now, name),
+        cacheable=lambda data: not data.get("error")
+    )
+
+
+def fetch_all_platforms(deadline: float = PROCESSING_FETCH_DEADLINE,
+                        refresh: bool = False) -> Dict[str, Dict]:
+    """
+    Get every platform's stats (cached, missing ones fetched concurrently).
+    refresh=True refetches every platform now instead of serving the cache.
+    """
+    load = _stats_cache.refresh if refresh else _stats_cache.get
+    futures = {
+        name: _executor.submit(load, name, partial(_load_platform, name, force=refresh))
+        for name in PLATFORMS
+    }
+    wait(futures.values(), timeout=deadline)
+
+    results = {}
+    for name, future in futures.items():
+        error = None
+        if future.done():
+            try:
+                results[name] = _with_cache_info(future.result())
+                continue
+            except Exception as e:
+                error = f"Fetch failed: {e}"
+        else:
+            future.cancel()
+            cancel_platform_query(name)
+            error = f"Timed out after {deadline:g}s"
+
+        entry = _stats_cache.peek(name)
+        if entry is not None:
+            # Degrade to the last cached value, marked as stale
+            results[name] = _with_cache_info(entry)
+            results[name]["stale_error"] = error
+        else:
+            results[name] = {
+                PLATFORMS[name]["items_key"]: [],
+                "dates": [],
+                "total_days": 0,
+                PLATFORMS[name]["stats_key"]: {},
+                "error": error,
+                "fetched_at": None,
+                "stale_error": None
+            }
+
+    return results
+
+
+def cancel_platform_query(name: str) -> bool:
+    """Ask Postgres to cancel the platform's running stats query, if any"""
+    conn = _in_flight.get(name)
+    if conn is None:
+        return False
+    try:
+        conn.cancel()
+        return True
+    except Exception:
+        return False
+
+
+def refresh_platform(name: str):
+    """Invalidate one platform's cached stats and refetch them now (full rescan)"""
+    _stats_cache.refresh(name, partial(_load_platform, name, full=True))
+
+
+def platform_data_from_snapshot(payload: Dict[str, Dict]) -> Dict[str, Dict]:
+    """Rebuild fetch_all_platforms() output from a stored snapshot"""
+    results = {}
+    for name, source in PLATFORMS.items():
+        data = payload.get(name)
+        if data is None:
+            data = {
+                source["items_key"]: [],
+                "dates": [],
+                "total_days": 0,
+                source["stats_key"]: {},
+                "error": "Not collected yet",
+                "fetched_at": None,
+                "stale_error": None
+            }
+        elif data.get("fetched_at"):
+            data["fetched_at"] = datetime.fromisoformat(data["fetched_at"])
+        results[name] = data
+    return results
@@ -0,0 +1,132 @@
+"""
+Query instrumentation
+Times every stats query and keeps a bounded in-process history of the results
+"""
+
+import json
+import os
+import threading
+import time
+from collections import deque
+from dataclasses import asdict, dataclass
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Number of recent query records kept in memory
+QUERY_HISTORY_SIZE = int(os.getenv("QUERY_HISTORY_SIZE", "200"))
+# Optional JSON-lines file every record is appended to (for external tooling)
+QUERY_LOG_FILE = os.getenv("QUERY_LOG_FILE")
+
+
+@dataclass(frozen=True)
+class QueryRecord:
+    """One executed query"""
+    source: str
+    query: str  # short label, not the SQL text
+    started_at: str
+    duration_ms: float
+    rows: int
+    bytes_fetched: int  # approximate text-format payload size
+    error: Optional[str] = None
+
+
+_records = deque(maxlen=QUERY_HISTORY_SIZE)
+_records_lock = threading.Lock()
+
+
+def _payload_size(rows: List[tuple]) -> int:
+    """Approximate result size as Postgres would send it in text format"""
+    return sum(
+        len(str(value).encode())
+        for row in rows
+        for value in row
+        if value is not None
+    )
+
+
+def _record(record: QueryRecord):
+    with _records_lock:
+        _records.append(record)
+        if QUERY_LOG_FILE:
+            try:
+                with open(QUERY_LOG_FILE, "a") as f:
+                    f.write(json.dumps(asdict(record)) + "\n")
+            except OSError:
+                pass
+
+
+def execute_timed(cur, source: str, query_name: str, query: Any, params: Any = None) -> List[tuple]:
+    """Execute a query, fetch all rows and record timing, row count and size"""
+    started_at = datetime.now().isoformat(timespec="seconds")
+    start = time.perf_counter()
+
+    try:
+        cur.execute(query, params)
+        rows = cur.fetchall()
+    except Exception as e:
+        _record(QueryRecord(
+            source=source,
+            query=query_name,
+            started_at=started_at,
+            duration_ms=round((time.perf_counter() - start) * 1000, 2),
+            rows=0,
+            bytes_fetched=0,
+            error=str(e).strip()
+        ))
+        raise
+
+    _record(QueryRecord(
+        source=source,
+        query=query_name,
+        started_at=started_at,
+        duration_ms=round((time.perf_counter() - start) * 1000, 2),
+        rows=len(rows),
+        bytes_fetched=_payload_size(rows)
+    ))
+    return rows
+
+
+def get_query_records(source: Optional[str] = None) -> List[Dict]:
+    """Recent query records, newest first (optionally for one source)"""
+    with _records_lock:
+        records = list(_records)
+
+    return [
+        asdict(record)
+        for record in reversed(records)
+        if source is None or record.source == source
+    ]
+
+
+def summarize_query_records(records: List[Dict]) -> List[Dict]:
+    """Per source/query latency summary over the given records"""
+    groups: Dict[tuple, List[Dict]] = {}
+    for record in records:
+        groups.setdefault((record["source"], record["query"]), []).append(record)
+
+    summary = []
+    for (source, query_name), items in groups.items():
+        durations = sorted(item["duration_ms"] for item in items)
+        summary.append({
+            "source": source,
+            "query": query_name,
+            "runs": len(items),
+            "errors": sum(1 for item in items if item["error"]),
+            "last_ms": items[0]["duration_ms"],
+            "avg_ms": round(sum(durations) / len(durations), 2),
+            "max_ms": durations[-1],
+            "last_rows": items[0]["rows"],
+            "last_bytes": items[0]["bytes_fetched"]
+        })
+
+    return sorted(summary, key=lambda item: item["avg_ms"], reverse=True)
+
+
+def clear_query_records():
+    """Forget the in-memory history"""
+    with _records_lock:
+        _records.clear()
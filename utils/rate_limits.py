@@ -0,0 +1,142 @@
+"""
+Provider rate-limit headroom
+Parses rate-limit response headers (remaining requests/tokens and reset times)
+and keeps the latest reading per key so schedulers can spread load before
+a key starts answering 429.
+"""
+
+import re
+import threading
+import time
+from typing import Dict, Mapping, Optional
+
+# Header -> field; request/token pairs as sent by OpenAI-compatible APIs,
+# plus the generic single-limit and IETF draft names
+RATE_LIMIT_HEADERS = {
+    "x-ratelimit-limit-requests": "limit_requests",
+    "x-ratelimit-remaining-requests": "remaining_requests",
+    "x-ratelimit-reset-requests": "reset_requests",
+    "x-ratelimit-limit-tokens": "limit_tokens",
+    "x-ratelimit-remaining-tokens": "remaining_tokens",
+    "x-ratelimit-reset-tokens": "reset_tokens",
+    "x-ratelimit-limit": "limit_requests",
+    "x-ratelimit-remaining": "remaining_requests",
+    "x-ratelimit-reset": "reset_requests",
+    "ratelimit-limit": "limit_requests",
+    "ratelimit-remaining": "remaining_requests",
+    "ratelimit-reset": "reset_requests",
+    "retry-after": "retry_after"
+}
+
+# Fields holding seconds until something resets (counted down as readings age)
+RESET_FIELDS = ("reset_requests", "reset_tokens", "retry_after")
+
+# LiteLLM forwards raw provider headers with this prefix
+_LITELLM_PREFIX = "llm_provider-"
+# "6m0s", "1.5s", "20ms", "1h2m"
+_DURATION_RE = re.compile(r"(\d+(?:\.\d+)?)(ms|h|m|s)")
+# Reset values above this are epoch timestamps rather than durations
+_EPOCH_THRESHOLD = 1_000_000_000
+
+
+def _parse_seconds(value: str, now: float) -> Optional[float]:
+    """Duration ("6m0s", "20ms", "30") or epoch timestamp -> seconds from now"""
+    value = value.strip().lower()
+    try:
+        number = float(value)
+        return max(0.0, number - now) if number > _EPOCH_THRESHOLD else number
+    except ValueError:
+        pass
+
+    parts = _DURATION_RE.findall(value)
+    if not parts or "".join(n + unit for n, unit in parts) != value:
+        return None
+    scale = {"h": 3600, "m": 60, "s": 1, "ms": 0.001}
+    return sum(float(n) * scale[unit] for n, unit in parts)
+
+
+def parse_rate_limit_headers(headers: Optional[Mapping[str, str]], now: Optional[float] = None) -> Dict:
+    """Rate-limit fields found in response headers (empty if the provider sent none)"""
+    if not headers:
+        return {}
+    now = time.time() if now is None else now
+
+    parsed = {}
+    for name, value in headers.items():
+        name = name.lower()
+        if name.startswith(_LITELLM_PREFIX):
+            name = name[len(_LITELLM_PREFIX):]
+        field = RATE_LIMIT_HEADERS.get(name)
+        if field is None or field in parsed or value is None:
+            continue
+
+        if field in RESET_FIELDS:
+            seconds = _parse_seconds(str(value), now)
+            if seconds is not None:
+                parsed[field] = seconds
+        else:
+            try:
+                parsed[field] = int(float(value))
+            except ValueError:
+                continue
+    return parsed
+
+
+class RateLimitTracker:
+    """Latest rate-limit reading per key, shared by the whole process"""
+
+    def __init__(self):
+        self._readings: Dict[str, Dict] = {}
+        self._lock = threading.Lock()
+
+    def record(self, key: str, rate_limits: Optional[Dict], now: Optional[float] = None):
+        if not rate_limits:
+            return
+        with self._lock:
+            self._readings[key] = {**rate_limits, "observed_at": time.time() if now is None else now}
+
+    def get(self, key: str, now: Optional[float] = None) -> Optional[Dict]:
+        """Reading aged to now: resets count down and headroom refills once they pass"""
+        with self._lock:
+            reading = self._readings.get(key)
+        if reading is None:
+            return None
+
+        now = time.time() if now is None else now
+        age = max(0.0, now - reading["observed_at"])
+        current = dict(reading, age=age)
+        for field in RESET_FIELDS:
+            if field in current:
+                current[field] = max(0.0, current[field] - age)
+
+        for kind in ("requests", "tokens"):
+            limit = current.get(f"limit_{kind}")
+            if current.get(f"reset_{kind}") == 0 and limit is not None:
+                current[f"remaining_{kind}"] = limit
+        return current
+
+    def snapshot(self, now: Optional[float] = None) -> Dict[str, Dict]:
+        with self._lock:
+            keys = list(self._readings)
+        return {key: self.get(key, now) for key in keys}
+
+    def clear(self):
+        with self._lock:
+            self._readings.clear()
+
+
+_tracker = RateLimitTracker()
+
+
+def record_rate_limits(key: str, rate_limits: Optional[Dict]):
+    _tracker.record(key, rate_limits)
+
+
+def get_rate_limits(key: str) -> Optional[Dict]:
+    """Current headroom of a key (None until a response carried rate-limit headers)"""
+    return _tracker.get(key)
+
+
+def rate_limit_snapshot() -> Dict[str, Dict]:
+    """Current headroom of every key seen so far"""
+    return _tracker.snapshot()
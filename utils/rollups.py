@@ -0,0 +1,153 @@
+"""
+Channel-day rollups for the Processing page
+Materialized views with per-name, per-day row counts that the stats fetchers
+read instead of scanning the raw tables when they exist.
+
+Usage:
+    python -m utils.rollups create                 # create missing rollups
+    python -m utils.rollups refresh --concurrently # refresh without blocking readers
+    python -m utils.rollups refresh --every 600    # keep refreshing on a schedule
+    python -m utils.rollups drop --platform youtube
+"""
+
+import argparse
+import os
+import sys
+import time
+from typing import Dict, List
+
+import psycopg2
+from psycopg2 import sql
+from dotenv import load_dotenv
+
+load_dotenv()
+
+CREATE_ROLLUP_QUERY = """
+    CREATE MATERIALIZED VIEW IF NOT EXISTS {view} AS
+    SELECT
+        {name} AS name,
+        DATE({date}) AS day,
+        COUNT(*) AS row_count
+    FROM {table}
+    GROUP BY {name}, DATE({date})
+"""
+
+# REFRESH ... CONCURRENTLY needs a unique index over plain columns
+CREATE_ROLLUP_INDEX_QUERY = "CREATE UNIQUE INDEX IF NOT EXISTS {index} ON {view} (name, day)"
+
+ROLLUP_EXISTS_QUERY = "SELECT to_regclass(%s) IS NOT NULL"
+
+# Same columns as the raw-table stats query so results are parsed the same way
+ROLLUP_STATS_QUERY = """
+    SELECT
+        GROUPING(name, day) AS grouping_id,
+        name,
+        day AS process_date,
+        SUM(row_count)::bigint AS row_count,
+        COALESCE(SUM(row_count) FILTER (WHERE day IS NOT NULL), 0)::bigint AS dated_count,
+        COALESCE(SUM(row_count) FILTER (WHERE day >= %(cutoff)s), 0)::bigint AS recent_count
+    FROM {view}
+    GROUP BY GROUPING SETS ((name), (day), ())
+"""
+
+
+def rollup_name(platform: Dict) -> str:
+    """Materialized view name for a platform table"""
+    return f"{platform['table']}_{platform['name_column']}_daily_rollup"
+
+
+def rollup_exists(cur, platform: Dict) -> bool:
+    """Check whether the platform's rollup has been created"""
+    cur.execute(ROLLUP_EXISTS_QUERY, (rollup_name(platform),))
+    return cur.fetchone()[0]
+
+
+def create_rollup(cur, platform: Dict):
+    """Create (and populate) the rollup and its unique index"""
+    view = rollup_name(platform)
+    cur.execute(sql.SQL(CREATE_ROLLUP_QUERY).format(
+        view=sql.Identifier(view),
+        table=sql.Identifier(platform["table"]),
+        name=sql.Identifier(platform["name_column"]),
+        date=sql.Identifier(platform["date_column"])
+    ))
+    cur.execute(sql.SQL(CREATE_ROLLUP_INDEX_QUERY).format(
+        index=sql.Identifier(f"{view}_name_day_idx"),
+        view=sql.Identifier(view)
+    ))
+
+
+def refresh_rollup(cur, platform: Dict, concurrently: bool = False):
+    """Recompute the rollup from its source table"""
+    query = "REFRESH MATERIALIZED VIEW CONCURRENTLY {view}" if concurrently else "REFRESH MATERIALIZED VIEW {view}"
+    cur.execute(sql.SQL(query).format(view=sql.Identifier(rollup_name(platform))))
+
+
+def drop_rollup(cur, platform: Dict):
+    """Drop the rollup (fetchers fall back to the raw table)"""
+    cur.execute(sql.SQL("DROP MATERIALIZED VIEW IF EXISTS {view}").format(
+        view=sql.Identifier(rollup_name(platform))
+    ))
+
+
+def run(action: str, platforms: List[str], concurrently: bool = False) -> bool:
+    """Apply an action to the given platforms, returns False if any failed"""
+    from utils.processing_stats import PLATFORMS
+
+    ok = True
+    for name in platforms:
+        platform = PLATFORMS[name]
+        database_url = os.getenv(platform["url_env"])
+        if not database_url:
+            print(f"[SKIP] {name}: {platform['url_env']} is not set")
+            continue
+
+        start = time.time()
+        try:
+            # Dedicated connection - refreshes can outlive pooled statement limits
+            conn = psycopg2.connect(database_url)
+            conn.autocommit = True
+            try:
+                with conn.cursor() as cur:
+                    if action == "create":
+                        create_rollup(cur, platform)
+                    elif action == "refresh":
+                        if not rollup_exists(cur, platform):
+                            print(f"[SKIP] {name}: rollup does not exist, run 'create' first")
+                            continue
+                        refresh_rollup(cur, platform, concurrently)
+                    elif action == "drop":
+                        drop_rollup(cur, platform)
+            finally:
+                conn.close()
+            print(f"[OK] {name}: {action} {rollup_name(platform)} in {time.time() - start:.2f}s")
+        except psycopg2.Error as e:
+            ok = False
+            print(f"[ERROR] {name}: {action} failed: {e}")
+
+    return ok
+
+
+def main():
+    from utils.processing_stats import PLATFORMS
+
+    parser = argparse.ArgumentParser(description="Manage Processing page rollups")
+    parser.add_argument("action", choices=["create", "refresh", "drop"])
+    parser.add_argument("--platform", action="append", choices=list(PLATFORMS),
+                        help="Limit to a platform (repeatable, default: all)")
+    parser.add_argument("--concurrently", action="store_true",
+                        help="Refresh without locking out readers")
+    parser.add_argument("--every", type=float, default=0,
+                        help="Repeat the action every N seconds")
+    args = parser.parse_args()
+
+    platforms = args.platform or list(PLATFORMS)
+    while True:
+        ok = run(args.action, platforms, args.concurrently)
+        if not args.every:
+            sys.exit(0 if ok else 1)
+        time.sleep(args.every)
+
+
+if __name__ == "__main__":
+    main()
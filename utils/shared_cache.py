@@ -0,0 +1,317 @@
+"""
+Shared cache backends
+Pluggable TTL cache for balance checks and Processing stats. The SQLite backend
+is shared by every process on the host, so replicas reuse each other's results
+and only one process at a time loads a given key.
+"""
+
+import os
+import pickle
+import sqlite3
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Any, Callable, Optional, Tuple, Type
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# "memory" (per process) or "sqlite" (shared by all processes on the host)
+CACHE_BACKEND = os.getenv("CACHE_BACKEND", "memory")
+CACHE_DB_PATH = os.getenv("CACHE_DB_PATH", "shared_cache.db")
+# Size limits - least recently used entries are evicted beyond them
+CACHE_MAX_ENTRIES = int(os.getenv("CACHE_MAX_ENTRIES", "1000"))
+CACHE_MAX_BYTES = int(os.getenv("CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+# How long a load may hold a key's lock before others stop waiting (seconds)
+CACHE_LOCK_TIMEOUT = float(os.getenv("CACHE_LOCK_TIMEOUT", "60"))
+# Poll interval while waiting for another process's load (seconds)
+CACHE_LOCK_POLL = 0.1
+
+
+class CacheBackend(ABC):
+    """TTL key-value cache with per-key load locks"""
+
+    # Whether other processes see the entries
+    shared = False
+    # Errors of the underlying store (e.g. a locked database), treated as cache misses
+    store_errors: Tuple[Type[Exception], ...] = ()
+
+    @abstractmethod
+    def get(self, key: str) -> Any:
+        """Cached value, or None when missing or expired"""
+
+    @abstractmethod
+    def set(self, key: str, value: Any, ttl: float):
+        pass
+
+    @abstractmethod
+    def delete(self, key: str):
+        pass
+
+    @abstractmethod
+    def clear(self):
+        pass
+
+    @abstractmethod
+    def try_lock(self, key: str, owner: str, ttl: float) -> bool:
+        """Claim the right to load a key (expires after ttl)"""
+
+    @abstractmethod
+    def unlock(self, key: str, owner: str):
+        pass
+
+    def safely(self, operation: Callable, *args, default: Any = None) -> Any:
+        """Run a cache operation, returning default if the store fails"""
+        try:
+            return operation(*args)
+        except self.store_errors as e:
+            print(f"[ERROR] Cache {operation.__name__} failed: {e}")
+            return default
+
+    def get_or_load(self, key: str, ttl: float, loader: Callable[[], Any],
+                    cacheable: Callable[[Any], bool] = lambda value: True,
+                    lock_timeout: float = CACHE_LOCK_TIMEOUT) -> Any:
+        """
+        Cached value, or load it - while another caller loads the key, wait for its result.
+        A failing store never fails the call, the value is then loaded directly.
+        """
+        value = self.safely(self.get, key)
+        if value is not None:
+            return value
+
+        owner = uuid.uuid4().hex
+        give_up_at = time.time() + lock_timeout
+        while True:
+            locked = self.safely(self.try_lock, key, owner, lock_timeout)
+            if locked is None:
+                return loader()
+            if locked:
+                break
+            time.sleep(CACHE_LOCK_POLL)
+            value = self.safely(self.get, key)
+            if value is not None:
+                return value
+            if time.time() > give_up_at:
+                # The holder is stuck - load without the lock rather than block the page
+                return loader()
+
+        try:
+            # Filled while we were acquiring the lock
+            value = self.safely(self.get, key)
+            if value is None:
+                value = loader()
+                if cacheable(value):
+                    self.safely(self.set, key, value, ttl)
+            return value
+        finally:
+            # A lock we fail to release expires after lock_timeout
+            self.safely(self.unlock, key, owner)
+
+
+class MemoryBackend(CacheBackend):
+    """Per-process LRU cache (values are pickled so callers never share objects)"""
+
+    def __init__(self, max_entries: int = CACHE_MAX_ENTRIES, max_bytes: int = CACHE_MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._bytes = 0
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Any:
+        with self._lock:
+            item = self._entries.get(key)
+            if item is None:
+                return None
+            blob, expires_at = item
+            if expires_at <= time.time():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+        return pickle.loads(blob)
+
+    def set(self, key: str, value: Any, ttl: float):
+        blob = pickle.dumps(value)
+        with self._lock:
+            self._remove(key)
+            self._entries[key] = (blob, time.time() + ttl)
+            self._bytes += len(blob)
+            while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                self._remove(next(iter(self._entries)))
+
+    def _remove(self, key: str):
+        item = self._entries.pop(key, None)
+        if item is not None:
+            self._bytes -= len(item[0])
+
+    def delete(self, key: str):
+        with self._lock:
+            self._remove(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def try_lock(self, key: str, owner: str, ttl: float) -> bool:
+        with self._lock:
+            holder = self._locks.get(key)
+            if holder is not None and holder[1] > time.time():
+                return False
+            self._locks[key] = (owner, time.time() + ttl)
+            return True
+
+    def unlock(self, key: str, owner: str):
+        with self._lock:
+            if self._locks.get(key, (None,))[0] == owner:
+                del self._locks[key]
+
+
+SQLITE_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS cache (
+        key TEXT PRIMARY KEY,
+        value BLOB NOT NULL,
+        size INTEGER NOT NULL,
+        expires_at REAL NOT NULL,
+        accessed_at REAL NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS cache_accessed_at ON cache (accessed_at);
+    CREATE TABLE IF NOT EXISTS cache_locks (
+        key TEXT PRIMARY KEY,
+        owner TEXT NOT NULL,
+        expires_at REAL NOT NULL
+    );
+"""
+
+# Drop expired entries, then least recently used ones until both limits hold
+EVICT_QUERY = """
+    DELETE FROM cache WHERE key IN (
+        SELECT key FROM (
+            SELECT
+                key,
+                expires_at,
+                ROW_NUMBER() OVER (ORDER BY accessed_at DESC) AS position,
+                SUM(size) OVER (ORDER BY accessed_at DESC) AS running_bytes
+            FROM cache
+        )
+        WHERE expires_at <= :now OR position > :max_entries OR running_bytes > :max_bytes
+    )
+"""
+
+
+class SQLiteBackend(CacheBackend):
+    """Cache file shared by every process on the host"""
+
+    shared = True
+    store_errors = (sqlite3.Error,)
+
+    def __init__(self, path: str, max_entries: int = CACHE_MAX_ENTRIES, max_bytes: int = CACHE_MAX_BYTES):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        conn = self._connect()
+        try:
+            conn.executescript(SQLITE_SCHEMA)
+        finally:
+            conn.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+        # Readers never block the writer and vice versa
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def get(self, key: str) -> Any:
+        now = time.time()
+        conn = self._connect()
+        try:
+            row = conn.execute(
+                "SELECT value FROM cache WHERE key = ? AND expires_at > ?", (key, now)
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute("UPDATE cache SET accessed_at = ? WHERE key = ?", (now, key))
+        finally:
+            conn.close()
+        return pickle.loads(row[0])
+
+    def set(self, key: str, value: Any, ttl: float):
+        blob = pickle.dumps(value)
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, size, expires_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                (key, blob, len(blob), now + ttl, now)
+            )
+            conn.execute(EVICT_QUERY, {"now": now, "max_entries": self.max_entries, "max_bytes": self.max_bytes})
+            conn.execute("COMMIT")
+        except BaseException:
+            # BEGIN itself may have failed (database locked) - nothing to roll back then
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def delete(self, key: str):
+        conn = self._connect()
+        try:
+            conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+        finally:
+            conn.close()
+
+    def clear(self):
+        conn = self._connect()
+        try:
+            conn.execute("DELETE FROM cache")
+        finally:
+            conn.close()
+
+    def try_lock(self, key: str, owner: str, ttl: float) -> bool:
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("DELETE FROM cache_locks WHERE key = ? AND expires_at <= ?", (key, now))
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO cache_locks (key, owner, expires_at) VALUES (?, ?, ?)",
+                (key, owner, now + ttl)
+            )
+            conn.execute("COMMIT")
+            return cursor.rowcount == 1
+        except BaseException:
+            # BEGIN itself may have failed (database locked) - nothing to roll back then
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def unlock(self, key: str, owner: str):
+        conn = self._connect()
+        try:
+            conn.execute("DELETE FROM cache_locks WHERE key = ? AND owner = ?", (key, owner))
+        finally:
+            conn.close()
+
+
+_backend: Optional[CacheBackend] = None
+_backend_lock = threading.Lock()
+
+
+def get_cache_backend() -> CacheBackend:
+    """Process-wide backend selected by CACHE_BACKEND"""
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            if CACHE_BACKEND == "sqlite":
+                _backend = SQLiteBackend(CACHE_DB_PATH)
+            else:
+                _backend = MemoryBackend()
+        return _backend
@@ -0,0 +1,114 @@
+"""
+Snapshot store
+Local SQLite file the background collector writes to and the pages read from
+"""
+
+import json
+import os
+import sqlite3
+import time
+from datetime import date, datetime
+from typing import Any, Dict, Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+# Store location - pages only read snapshots when this is set
+SNAPSHOT_DB_PATH = os.getenv("SNAPSHOT_DB_PATH")
+# Snapshots kept per kind
+SNAPSHOT_RETENTION = int(os.getenv("SNAPSHOT_RETENTION", "50"))
+# Snapshots older than this are flagged as outdated on the pages (seconds)
+SNAPSHOT_MAX_AGE = float(os.getenv("SNAPSHOT_MAX_AGE", "600"))
+
+SCHEMA = """
+    CREATE TABLE IF NOT EXISTS snapshots (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        kind TEXT NOT NULL,
+        collected_at REAL NOT NULL,
+        payload TEXT NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS snapshots_kind_id ON snapshots (kind, id);
+"""
+
+
+def _json_default(value: Any) -> str:
+    """Serialize dates (and anything else unknown) as strings"""
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    return str(value)
+
+
+class SnapshotStore:
+    """Append-only snapshot log with per-kind retention"""
+
+    def __init__(self, path: str):
+        self.path = path
+        conn = self._connect()
+        try:
+            conn.executescript(SCHEMA)
+        finally:
+            conn.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=5)
+        # Readers never block the collector and vice versa
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def save(self, kind: str, payload: Any) -> float:
+        """Store a new snapshot and prune old ones, returns its timestamp"""
+        collected_at = time.time()
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute(
+                    "INSERT INTO snapshots (kind, collected_at, payload) VALUES (?, ?, ?)",
+                    (kind, collected_at, json.dumps(payload, default=_json_default))
+                )
+                conn.execute(
+                    """
+                    DELETE FROM snapshots
+                    WHERE kind = ? AND id NOT IN (
+                        SELECT id FROM snapshots WHERE kind = ? ORDER BY id DESC LIMIT ?
+                    )
+                    """,
+                    (kind, kind, SNAPSHOT_RETENTION)
+                )
+        finally:
+            conn.close()
+        return collected_at
+
+    def latest(self, kind: str) -> Optional[Dict]:
+        """Latest snapshot of a kind as {"collected_at", "age", "payload"}"""
+        conn = self._connect()
+        try:
+            row = conn.execute(
+                "SELECT collected_at, payload FROM snapshots WHERE kind = ? ORDER BY id DESC LIMIT 1",
+                (kind,)
+            ).fetchone()
+        finally:
+            conn.close()
+
+        if row is None:
+            return None
+
+        collected_at, payload = row
+        return {
+            "collected_at": datetime.fromtimestamp(collected_at),
+            "age": time.time() - collected_at,
+            "payload": json.loads(payload)
+        }
+
+
+_store: Optional[SnapshotStore] = None
+
+
+def get_snapshot_store() -> Optional[SnapshotStore]:
+    """Shared store, or None when SNAPSHOT_DB_PATH is not configured"""
+    global _store
+    if not SNAPSHOT_DB_PATH:
+        return None
+    if _store is None:
+        _store = SnapshotStore(SNAPSHOT_DB_PATH)
+    return _store
@@ -0,0 +1,116 @@
+"""
+Stale-while-revalidate cache
+Serves the last good value immediately and refreshes stale entries in the background
+"""
+
+import threading
+import time
+from concurrent.futures import Executor
+from dataclasses import dataclass, replace
+from typing import Any, Callable, Dict, Optional
+
+
+@dataclass(frozen=True)
+class CacheEntry:
+    """Cached value plus bookkeeping (replaced, never mutated)"""
+    value: Any
+    fetched_at: float  # when `value` was loaded
+    checked_at: float  # when a refresh was last attempted
+    error: Optional[str] = None  # error of the last refresh, if it failed
+
+
+class SWRCache:
+    """Thread-safe TTL cache shared by all sessions in the process"""
+
+    def __init__(self, ttl: float, executor: Executor, error_ttl: float = 30,
+                 error_of: Callable[[Any], Optional[str]] = lambda value: None,
+                 fetched_at_of: Callable[[Any], Optional[float]] = lambda value: None):
+        """
+        ttl           - seconds a good value stays fresh
+        error_ttl     - seconds before a failed refresh is retried
+        error_of      - returns an error message if a loaded value is a failure
+        fetched_at_of - returns when a loaded value was really fetched (e.g. by
+                        another process), None for "just now"
+        """
+        self.ttl = ttl
+        self.error_ttl = error_ttl
+        self._executor = executor
+        self._error_of = error_of
+        self._fetched_at_of = fetched_at_of
+        self._entries: Dict[str, CacheEntry] = {}
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self._load_locks: Dict[str, threading.Lock] = {}
+
+    def _load_lock(self, key: str) -> threading.Lock:
+        with self._lock:
+            return self._load_locks.setdefault(key, threading.Lock())
+
+    def _is_stale(self, entry: CacheEntry) -> bool:
+        max_age = self.error_ttl if entry.error else self.ttl
+        return time.time() - entry.checked_at > max_age
+
+    def peek(self, key: str) -> Optional[CacheEntry]:
+        """Return the cached entry without loading or revalidating"""
+        return self._entries.get(key)
+
+    def get(self, key: str, loader: Callable[[], Any]) -> CacheEntry:
+        """Return the cached entry, loading it synchronously only on a miss"""
+        entry = self._entries.get(key)
+        if entry is None:
+            with self._load_lock(key):
+                # Another caller may have loaded it while we waited
+                entry = self._entries.get(key)
+                if entry is None:
+                    entry = self._load(key, loader)
+        elif self._is_stale(entry):
+            self._revalidate(key, loader)
+        return entry
+
+    def refresh(self, key: str, loader: Callable[[], Any]) -> CacheEntry:
+        """Invalidate and reload one key synchronously"""
+        with self._load_lock(key):
+            return self._load(key, loader)
+
+    def invalidate(self, key: Optional[str] = None):
+        """Drop one key (or everything) from the cache"""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    def _revalidate(self, key: str, loader: Callable[[], Any]):
+        """Schedule a background refresh unless one is already running"""
+        with self._lock:
+            if key in self._refreshing:
+                return
+            self._refreshing.add(key)
+
+        def run():
+            try:
+                with self._load_lock(key):
+                    self._load(key, loader)
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        self._executor.submit(run)
+
+    def _load(self, key: str, loader: Callable[[], Any]) -> CacheEntry:
+        """Call the loader and store the result (keeping the last good value on failure)"""
+        value = loader()
+        now = time.time()
+        error = self._error_of(value)
+        previous = self._entries.get(key)
+
+        if error and previous is not None and not self._error_of(previous.value):
+            entry = replace(previous, checked_at=now, error=error)
+        else:
+            # Values fetched earlier elsewhere go stale when their original fetch does
+            fetched_at = (not error and self._fetched_at_of(value)) or now
+            entry = CacheEntry(value=value, fetched_at=fetched_at, checked_at=fetched_at, error=error)
+
+        with self._lock:
+            self._entries[key] = entry
+        return entry